@@ -0,0 +1,52 @@
+"""
+代理单次请求的准备开销基准：每次请求重新构建图与工具绑定 vs. 复用共享实例
+
+运行：
+    uv run python benchmarks/bench_agent_overhead.py
+"""
+
+import os
+import timeit
+
+# 只构建客户端，不发起网络请求
+os.environ.setdefault("LLM_BASE_URL", "http://127.0.0.1:8100/v1")
+os.environ.setdefault("LLM_API_KEY", "fake")
+os.environ.setdefault("LLM_MODEL", "fake")
+
+from synphora.agent import build_agent_graph, get_agent_graph  # noqa: E402
+from synphora.llm import LlmTask, create_llm_with_tools, get_llm_client  # noqa: E402
+from synphora.prompt import AgentPrompts  # noqa: E402
+from synphora.prompt.renderer import renderer  # noqa: E402
+from synphora.tool import ArticleEvaluatorTool  # noqa: E402
+
+NUMBER = 200
+
+
+def per_request_rebuild():
+    """优化前：每次请求构建图、绑定工具并渲染系统提示词"""
+    build_agent_graph()
+    create_llm_with_tools(ArticleEvaluatorTool.get_tools(), LlmTask.REASON)
+    renderer.render("agent-system-prompt.md")
+
+
+def shared_instances():
+    """优化后：复用编译好的图、共享的工具绑定客户端和缓存的系统提示词"""
+    get_agent_graph()
+    get_llm_client(LlmTask.REASON, ArticleEvaluatorTool.get_tools())
+    AgentPrompts().system()
+
+
+def main():
+    # 预热共享实例，与服务启动时的预热阶段一致
+    shared_instances()
+
+    for name, func in [
+        ("per_request_rebuild", per_request_rebuild),
+        ("shared_instances", shared_instances),
+    ]:
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER
+        print(f"{name:<22} {seconds * 1e6:>12.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
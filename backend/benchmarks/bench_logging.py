@@ -0,0 +1,98 @@
+"""
+一次代理运行的日志开销基准：print 整个状态 vs. 分级、截断、经队列写出的日志
+
+用户在消息中粘贴长文章时，每个节点打印的状态都包含整篇文章。
+
+运行：
+    uv run python benchmarks/bench_logging.py
+"""
+
+import contextlib
+import io
+import logging
+import timeit
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from synphora.agent import AgentRequest
+from synphora.log import configure_logging, stop_logging, truncated
+from synphora.sse import (
+    ArtifactContentCompleteEvent,
+    ArtifactContentStartEvent,
+    RunFinishedEvent,
+    RunStartedEvent,
+)
+
+NUMBER = 50
+
+ARTICLE = next(Path(__file__).parent.parent.glob("tests/data/store/*.txt"))
+
+logger = logging.getLogger("synphora.bench")
+
+
+def long_article_state() -> dict:
+    # 约 100KB 的长文章
+    article = ARTICLE.read_text(encoding="utf-8") * 20
+    request = AgentRequest(message=f"请评价这篇文章：\n{article}")
+    return {
+        "request": request,
+        "original_artifact_id": "a1",
+        "messages": [
+            SystemMessage(content="你是一个专业的文章写作助手。"),
+            HumanMessage(content=request.message),
+            AIMessage(content="我将为你生成文章评价"),
+        ],
+    }
+
+
+STATE = long_article_state()
+EVENTS = [
+    RunStartedEvent.new(),
+    ArtifactContentStartEvent.new(artifact_id="a2", title="评价", artifact_type="c"),
+    ArtifactContentCompleteEvent.new(artifact_id="a2"),
+    RunFinishedEvent.new(),
+]
+
+
+def print_run():
+    """优化前：每个节点打印完整状态，每个非分片事件打印完整事件"""
+    print(f'receive /agent request: {STATE["request"]}')
+    for node in ["start_node", "reason_node", "reason_node", "end_node"]:
+        print(f'{node}, state: {STATE}')
+    for event in EVENTS:
+        print(f'send sse event: {event}')
+
+
+def logging_run():
+    """优化后：INFO 级别只记录摘要，完整状态只在 DEBUG 级别截断后输出"""
+    logger.info('receive /agent request: %s', truncated(STATE["request"]))
+    for node in ["start_node", "reason_node", "reason_node", "end_node"]:
+        logger.info('%s, messages: %d', node, len(STATE["messages"]))
+        logger.debug('%s, state: %s', node, truncated(STATE))
+    for event in EVENTS:
+        logger.info('send sse event: %s', event.type.value)
+        logger.debug('sse event data: %s', truncated(event))
+
+
+def main():
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        seconds = min(timeit.repeat(print_run, number=NUMBER, repeat=3)) / NUMBER
+    print(
+        f"{'print_run':<12} {seconds * 1e6:>10.1f} us/run, {len(sink.getvalue()) // (NUMBER * 3):>8,} bytes/run"
+    )
+
+    for level in ["INFO", "DEBUG"]:
+        sink = io.StringIO()
+        configure_logging(level=level, stream=sink)
+        seconds = min(timeit.repeat(logging_run, number=NUMBER, repeat=3)) / NUMBER
+        stop_logging()
+        name = f"logging_{level.lower()}"
+        print(
+            f"{name:<12} {seconds * 1e6:>10.1f} us/run, {len(sink.getvalue()) // (NUMBER * 3):>8,} bytes/run"
+        )
+
+
+if __name__ == "__main__":
+    main()
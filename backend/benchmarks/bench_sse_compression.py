@@ -0,0 +1,80 @@
+"""
+一次典型代理运行的 SSE 传输字节数：不压缩 vs. 逐帧 flush 的流式压缩
+
+运行：
+    uv run python benchmarks/bench_sse_compression.py
+"""
+
+import uuid
+from pathlib import Path
+
+from synphora.compression import available_encodings
+from synphora.sse import (
+    ArtifactContentChunkEvent,
+    ArtifactContentCompleteEvent,
+    ArtifactContentStartEvent,
+    ArtifactListUpdatedEvent,
+    RunFinishedEvent,
+    RunStartedEvent,
+    TextMessageEvent,
+    format_sse_frame,
+)
+
+ARTICLE = next(Path(__file__).parent.parent.glob("tests/data/store/*.txt"))
+
+# LLM 分片通常只有几个字符
+CHUNK_CHARS = 3
+
+# 30 毫秒合并窗口内大约到达的分片数
+CHUNKS_PER_FRAME = 8
+
+
+def run_events(chunks_per_frame: int):
+    """模拟一次评价：确认消息 + 一个 artifact 的流式内容"""
+    content = ARTICLE.read_text(encoding="utf-8")
+    chunks = [
+        content[i : i + CHUNK_CHARS * chunks_per_frame]
+        for i in range(0, len(content), CHUNK_CHARS * chunks_per_frame)
+    ]
+    message_id, artifact_id = str(uuid.uuid4()), str(uuid.uuid4())
+    yield RunStartedEvent.new()
+    yield TextMessageEvent.new(message_id=message_id, content="我将为你生成文章评价")
+    yield ArtifactContentStartEvent.new(
+        artifact_id=artifact_id, title="文章评价", artifact_type="comment"
+    )
+    for chunk in chunks:
+        yield ArtifactContentChunkEvent.new(artifact_id=artifact_id, content=chunk)
+    yield ArtifactContentCompleteEvent.new(artifact_id=artifact_id)
+    yield ArtifactListUpdatedEvent.new(
+        artifact_id=artifact_id,
+        title="文章评价",
+        artifact_type="comment",
+        role="assistant",
+    )
+    yield RunFinishedEvent.new()
+
+
+def wire_bytes(frames: list[bytes], encoding: str) -> int:
+    encoder = available_encodings()[encoding]()
+    size = sum(len(encoder.compress(frame) + encoder.flush()) for frame in frames)
+    return size + len(encoder.finish())
+
+
+def main():
+    for name, chunks_per_frame in [
+        ("per_chunk", 1),
+        ("coalesced", CHUNKS_PER_FRAME),
+    ]:
+        frames = [
+            format_sse_frame(i, event).encode()
+            for i, event in enumerate(run_events(chunks_per_frame))
+        ]
+        raw = sum(len(frame) for frame in frames)
+        print(f"{name}: {len(frames)} frames, identity {raw:>8,} bytes")
+        for encoding in available_encodings():
+            size = wire_bytes(frames, encoding)
+            print(f"  {encoding:<6} {size:>8,} bytes, saved {1 - size / raw:.0%}")
+
+
+if __name__ == "__main__":
+    main()
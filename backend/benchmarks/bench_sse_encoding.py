@@ -0,0 +1,66 @@
+"""
+高频分片事件的 SSE 创建与编码基准：pydantic 校验 + 通用的 SseEvent 序列化 vs. 快速路径
+
+运行：
+    uv run python benchmarks/bench_sse_encoding.py
+"""
+
+import timeit
+
+from synphora.sse import (
+    ArtifactContentChunkData,
+    ArtifactContentChunkEvent,
+    SseEvent,
+    TextMessageData,
+    TextMessageEvent,
+)
+
+NUMBER = 20000
+
+# 典型的 LLM 分片只有几个字符
+CONTENT = "文章的核心"
+
+
+def validated_events():
+    return [
+        TextMessageEvent(data=TextMessageData(message_id="a1b2c3d4", content=CONTENT)),
+        ArtifactContentChunkEvent(
+            data=ArtifactContentChunkData(artifact_id="a1b2c3d4", content=CONTENT)
+        ),
+    ]
+
+
+def events():
+    return [
+        TextMessageEvent.new(message_id="a1b2c3d4", content=CONTENT),
+        ArtifactContentChunkEvent.new(artifact_id="a1b2c3d4", content=CONTENT),
+    ]
+
+
+def sse_event_path():
+    """优化前：pydantic 校验创建事件，model_dump_json(exclude_none=True) 序列化整个模型"""
+    return [
+        f"id: 1\ndata: {SseEvent.to_data(event)}\n\n" for event in validated_events()
+    ]
+
+
+def fast_path():
+    """优化后：model_construct 创建事件，预先计算的 JSON 前缀 + C 实现的字符串转义"""
+    return [f"id: 1\ndata: {event.to_data()}\n\n" for event in events()]
+
+
+def main():
+    assert sse_event_path() == fast_path()
+
+    results = {}
+    for name, func in [("sse_event_path", sse_event_path), ("fast_path", fast_path)]:
+        # 每次调用创建并编码两个事件
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3)) / (NUMBER * 2)
+        results[name] = 1 / seconds
+        print(f"{name:<16} {results[name]:>12,.0f} events/s")
+    speedup = results["fast_path"] / results["sse_event_path"]
+    print(f"{'speedup':<16} {speedup:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
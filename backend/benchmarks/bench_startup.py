@@ -0,0 +1,84 @@
+"""
+冷启动基准：在新进程中导入服务模块的耗时，以及 -X importtime 的模块耗时分解
+
+导入 synphora.server 时不导入 langchain / langgraph / openai，这部分在服务启动预热时
+导入代理模块才发生；两者分别统计。
+
+运行：
+    uv run python benchmarks/bench_startup.py
+    uv run python benchmarks/bench_startup.py --top 30
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# 导入服务模块（worker 启动、测试收集、dev 重载时的开销），以及启动预热时导入的代理模块
+TARGETS = ["synphora.server", "synphora.agent"]
+
+# 导入 synphora.server 时不应导入的重量级模块
+HEAVY_MODULES = ["langchain_core", "langchain_openai", "langgraph", "openai", "jinja2"]
+
+RUNS = 5
+
+
+def import_wall_time(module: str) -> float:
+    """新进程中导入模块的总耗时（秒），包括解释器启动"""
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - start_time
+
+
+def import_breakdown(module: str) -> dict[str, tuple[int, int]]:
+    """-X importtime 的输出：模块名 -> (自身耗时, 累计耗时)，单位微秒"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    breakdown = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        breakdown[name.strip()] = (int(self_us), int(cumulative_us))
+    return breakdown
+
+
+def top_level(name: str) -> str:
+    return name.split(".")[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动导入耗时")
+    parser.add_argument("--top", type=int, default=15, help="显示累计耗时最多的模块数")
+    args = parser.parse_args()
+
+    server_modules = set(import_breakdown("synphora.server"))
+    heavy = sorted({top_level(name) for name in server_modules} & set(HEAVY_MODULES))
+    print(f"heavy modules imported by synphora.server: {heavy or 'none'}\n")
+
+    for module in TARGETS:
+        wall = statistics.median(import_wall_time(module) for _ in range(RUNS))
+        breakdown = import_breakdown(module)
+        print(
+            f"import {module}: {wall * 1000:.0f} ms wall (median of {RUNS}), "
+            f"{breakdown[module][1] / 1000:.0f} ms importtime"
+        )
+
+        # 按顶层包汇总自身耗时
+        packages: dict[str, int] = {}
+        for name, (self_us, _) in breakdown.items():
+            packages[top_level(name)] = packages.get(top_level(name), 0) + self_us
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[
+            : args.top
+        ]:
+            print(f"  {package:<32} {self_us / 1000:>8.1f} ms")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+微基准测试套件：artifact 存储、SSE 事件编码、提示词渲染、代理图编译和冷启动导入
+
+不访问网络，结果可以保存为 JSON，并与之前保存的基线比较。
+
+运行：
+    uv run python benchmarks/bench_suite.py --output baseline.json
+    uv run python benchmarks/bench_suite.py --baseline baseline.json
+    uv run python benchmarks/bench_suite.py --filter storage --sizes 100,10000
+
+与基线比较时，任一结果比基线慢超过 --threshold（默认 25%）则以非零状态退出。
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+# 只构建客户端，不发起网络请求
+os.environ.setdefault("LLM_BASE_URL", "http://127.0.0.1:8100/v1")
+os.environ.setdefault("LLM_API_KEY", "fake")
+os.environ.setdefault("LLM_MODEL", "fake")
+
+from synphora.agent import build_agent_graph  # noqa: E402
+from synphora.file_storage import FileStorage  # noqa: E402
+from synphora.models import (  # noqa: E402
+    ArtifactData,
+    ArtifactRole,
+    ArtifactType,
+    EvaluateType,
+)
+from synphora.prompt import AgentPrompts, ArticleEvaluatorPrompts  # noqa: E402
+from synphora.sse import (  # noqa: E402
+    ArtifactContentChunkEvent,
+    ArtifactContentCompleteEvent,
+    ArtifactContentStartEvent,
+    ArtifactListUpdatedEvent,
+    EventType,
+    RunFinishedEvent,
+    RunStartedEvent,
+    RunUsageEvent,
+    SseEvent,
+    TextMessageEvent,
+    TokenUsageData,
+    format_sse_frame,
+)
+
+ARTICLE = next(Path(__file__).parent.parent.glob("tests/data/store/*.txt")).read_text(
+    encoding="utf-8"
+)
+
+# 存储基准的 artifact 数量
+STORAGE_SIZES = [100, 10_000, 100_000]
+
+# 提示词渲染基准的文章字符数
+PROMPT_SIZES = [10_000, 100_000, 1_000_000]
+
+# 每个基准至少运行的时间（秒），单次调用超过该时间时只运行一次
+MIN_TIME = 0.2
+
+# 编码基准每次调用编码的事件数
+EVENTS_PER_CALL = 1000
+
+
+def measure(
+    name: str,
+    func: Callable[[], object],
+    params: dict | None = None,
+    ops_per_call: int = 1,
+    max_calls: int | None = None,
+) -> dict:
+    """预热一次后重复调用，直到累计时间达到 MIN_TIME，记录每次调用的耗时"""
+    func()
+    timings = []
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < MIN_TIME or not timings:
+        if max_calls is not None and len(timings) >= max_calls:
+            break
+        call_start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - call_start)
+
+    seconds_per_op = statistics.median(timings) / ops_per_call
+    result = {
+        "name": name,
+        "params": params or {},
+        "calls": len(timings),
+        "seconds_per_op": seconds_per_op,
+        "min_seconds_per_op": min(timings) / ops_per_call,
+        "ops_per_second": 1 / seconds_per_op if seconds_per_op else 0.0,
+    }
+    print(format_result(result), flush=True)
+    return result
+
+
+def format_result(result: dict) -> str:
+    params = ",".join(f"{key}={value}" for key, value in result["params"].items())
+    label = f"{result['name']}[{params}]" if params else result["name"]
+    return (
+        f"{label:<48} {result['seconds_per_op'] * 1e6:>14.2f} us/op "
+        f"{result['ops_per_second']:>14,.1f} ops/s"
+    )
+
+
+def seed_storage(size: int) -> FileStorage:
+    """直接写入数据文件和 metadata.json，避免逐个创建时反复重写元数据"""
+    storage = FileStorage()
+    now = datetime.now().isoformat()
+    metadata = {}
+    content = ARTICLE[:2000]
+    for _ in range(size):
+        artifact_id = str(uuid.uuid4())
+        (storage.storage_path / f"{artifact_id}.txt").write_text(
+            content, encoding="utf-8"
+        )
+        metadata[artifact_id] = {
+            "id": artifact_id,
+            "role": ArtifactRole.USER.value,
+            "type": ArtifactType.ORIGINAL.value,
+            "title": f"{artifact_id}.md",
+            "description": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    with open(storage.metadata_file, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    storage._refresh_metadata()
+    return storage
+
+
+def bench_storage_size(size: int) -> list[dict]:
+    storage = seed_storage(size)
+    existing_ids = list(storage._metadata)
+    created_ids: list[str] = []
+    params = {"artifacts": size}
+    content = ARTICLE[:2000]
+
+    def create():
+        artifact = storage.create_artifact(title="基准测试.md", content=content)
+        created_ids.append(artifact.id)
+
+    def get():
+        storage.get_artifact(existing_ids[len(existing_ids) // 2])
+
+    def update():
+        storage.update_artifact(existing_ids[0], content=content)
+
+    def delete():
+        storage.delete_artifact(created_ids.pop())
+
+    try:
+        return [
+            measure("storage.create", create, params),
+            measure("storage.get", get, params),
+            measure("storage.list", storage.list_artifacts, params),
+            measure("storage.update", update, params),
+            # 只删除 create 基准中新建的 artifact，预热也会删除一个
+            measure("storage.delete", delete, params, max_calls=len(created_ids) - 1),
+        ]
+    finally:
+        storage.cleanup_temp_storage()
+
+
+def bench_storage(sizes: list[int]) -> list[dict]:
+    return [result for size in sizes for result in bench_storage_size(size)]
+
+
+def sample_events() -> dict[EventType, SseEvent]:
+    usage = TokenUsageData(
+        input_tokens=1200, cached_input_tokens=800, output_tokens=300, cost=0.0042
+    )
+    events = {
+        EventType.RUN_STARTED: RunStartedEvent.new(),
+        EventType.RUN_FINISHED: RunFinishedEvent.new(),
+        EventType.TEXT_MESSAGE: TextMessageEvent.new(
+            message_id="a1b2c3d4", content="文章的核心"
+        ),
+        EventType.ARTIFACT_LIST_UPDATED: ArtifactListUpdatedEvent.new(
+            artifact_id="a1b2c3d4",
+            title="候选标题",
+            artifact_type=ArtifactType.COMMENT.value,
+            role=ArtifactRole.ASSISTANT.value,
+        ),
+        EventType.ARTIFACT_CONTENT_START: ArtifactContentStartEvent.new(
+            artifact_id="a1b2c3d4",
+            title="候选标题",
+            artifact_type=ArtifactType.COMMENT.value,
+        ),
+        EventType.ARTIFACT_CONTENT_CHUNK: ArtifactContentChunkEvent.new(
+            artifact_id="a1b2c3d4", content="文章的核心"
+        ),
+        EventType.ARTIFACT_CONTENT_COMPLETE: ArtifactContentCompleteEvent.new(
+            artifact_id="a1b2c3d4"
+        ),
+        EventType.RUN_USAGE: RunUsageEvent.new(
+            total=usage,
+            nodes={"reason": usage},
+            tools={"write_candidate_titles": usage},
+            context_tokens_saved=500,
+        ),
+    }
+    # 新增事件类型时需要在这里补充样例
+    assert set(events) == set(EventType)
+    return events
+
+
+def bench_sse_encoding() -> list[dict]:
+    results = []
+    for event_type, event in sample_events().items():
+
+        def encode(event=event):
+            for event_id in range(EVENTS_PER_CALL):
+                format_sse_frame(event_id, event)
+
+        results.append(
+            measure(
+                "sse.encode",
+                encode,
+                {"event_type": event_type.value},
+                ops_per_call=EVENTS_PER_CALL,
+            )
+        )
+    return results
+
+
+def bench_prompt_rendering() -> list[dict]:
+    results = []
+    for size in PROMPT_SIZES:
+        artifact = ArtifactData(
+            id=str(uuid.uuid4()),
+            role=ArtifactRole.USER,
+            type=ArtifactType.ORIGINAL,
+            title="长文章.md",
+            content=(ARTICLE * (size // len(ARTICLE) + 1))[:size],
+            created_at=datetime.now().isoformat(),
+            updated_at=datetime.now().isoformat(),
+        )
+        results.append(
+            measure(
+                "prompt.evaluator_user",
+                lambda artifact=artifact: ArticleEvaluatorPrompts().user(
+                    artifact=artifact
+                ),
+                {"chars": size},
+            )
+        )
+    results.append(
+        measure(
+            "prompt.evaluator_system",
+            lambda: ArticleEvaluatorPrompts().system(EvaluateType.COMMENT),
+        )
+    )
+    results.append(
+        measure(
+            "prompt.agent_user",
+            lambda: AgentPrompts().user(
+                original_artifact_id=str(uuid.uuid4()), user_message="评价这篇文章"
+            ),
+        )
+    )
+    return results
+
+
+def bench_graph_compile() -> list[dict]:
+    return [measure("graph.compile", build_agent_graph)]
+
+
+def bench_startup() -> list[dict]:
+    """新进程中导入模块的耗时，-X importtime 分解见 bench_startup.py"""
+    return [
+        measure(
+            "startup.import",
+            lambda module=module: subprocess.run(
+                [sys.executable, "-c", f"import {module}"], check=True
+            ),
+            {"module": module},
+        )
+        for module in ["synphora.server", "synphora.agent"]
+    ]
+
+
+BENCHMARKS = {
+    "storage": bench_storage,
+    "sse": bench_sse_encoding,
+    "prompt": bench_prompt_rendering,
+    "graph": bench_graph_compile,
+    "startup": bench_startup,
+}
+
+
+def result_key(result: dict) -> tuple:
+    return result["name"], tuple(sorted(result["params"].items()))
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> bool:
+    """打印与基线的对比，返回是否有超过阈值的退化"""
+    baseline_results = {result_key(r): r for r in baseline["results"]}
+    regressed = False
+    print(f"\ncompared with baseline from {baseline['timestamp']}:")
+    for result in results:
+        base = baseline_results.get(result_key(result))
+        if base is None:
+            print(f"{format_result(result)}  (new)")
+            continue
+        ratio = result["seconds_per_op"] / base["seconds_per_op"]
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  REGRESSION"
+            regressed = True
+        elif ratio < 1 / (1 + threshold):
+            mark = "  faster"
+        print(f"{format_result(result)}  {(ratio - 1) * 100:>+7.1f}%{mark}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--filter",
+        help="只运行指定的基准组，逗号分隔：" + ",".join(BENCHMARKS),
+    )
+    parser.add_argument(
+        "--sizes",
+        help="存储基准的 artifact 数量，逗号分隔，默认 "
+        + ",".join(map(str, STORAGE_SIZES)),
+    )
+    parser.add_argument("--output", type=Path, help="将结果保存为 JSON")
+    parser.add_argument("--baseline", type=Path, help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--threshold", type=float, default=0.25, help="退化阈值")
+    args = parser.parse_args()
+
+    groups = args.filter.split(",") if args.filter else list(BENCHMARKS)
+    sizes = [int(size) for size in args.sizes.split(",")] if args.sizes else None
+
+    results = []
+    for group in groups:
+        if group == "storage":
+            results.extend(bench_storage(sizes or STORAGE_SIZES))
+        else:
+            results.extend(BENCHMARKS[group]())
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\nresults saved to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
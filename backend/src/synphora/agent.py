@@ -1,43 +1,80 @@
+import asyncio
+import json
 import logging
+import os
+import time
 import uuid
 from collections.abc import AsyncGenerator
+from contextlib import AsyncExitStack
 from enum import Enum
+from functools import lru_cache
 from typing import Annotated, TypedDict
+from weakref import WeakValueDictionary
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import ToolNode
-from pydantic import BaseModel
 
 from synphora.artifact_manager import artifact_manager
+from synphora.checkpoint import checkpoint_store
+from synphora.coalesce import SseCoalescer, sse_stats
+from synphora.context import compact_messages, get_context_budget
 from synphora.langgraph_sse import write_sse_event
-from synphora.llm import create_llm_client
+from synphora.llm import LlmTask, create_llm_client, get_llm_client, get_llm_model
+from synphora.log import truncated
+from synphora.metrics import LlmStreamTimer, node_duration_seconds
+from synphora.models import AgentRequest
 from synphora.prompt import AgentPrompts
-from synphora.sse import RunFinishedEvent, RunStartedEvent, SseEvent, TextMessageEvent
+from synphora.router import classify, router_stats
+from synphora.sse import (
+    ArtifactContentCompleteEvent,
+    EventType,
+    RunFinishedEvent,
+    RunStartedEvent,
+    SseEvent,
+    TextMessageEvent,
+)
 from synphora.tool import ArticleEvaluatorTool
+from synphora.tracing import current_span, span, traced
+from synphora.usage import (
+    RunUsage,
+    current_run_usage,
+    record_llm_usage,
+    usage_stats,
+)
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
-# 超时配置
-AGENT_TIMEOUT_SECONDS = 30
-TOOL_TIMEOUT_SECONDS = 60
+# 超时配置：单次运行的总时限（秒），工具调用的时限见 tool.TOOL_TIMEOUT_SECONDS
+AGENT_TIMEOUT_SECONDS = float(os.getenv('SYNPHORA_AGENT_TIMEOUT_SECONDS', '300'))
+
+# 代理图与 SSE 输出之间的队列上限，队列满时代理图等待输出端消费
+SSE_QUEUE_SIZE = int(os.getenv('SYNPHORA_SSE_QUEUE_SIZE', '256'))
+
+# 子指标在导入时绑定，节点运行时只做一次观测
+REASON_NODE_DURATION = node_duration_seconds.labels("reason")
+
+AGENT_TIMEOUT_MESSAGE = (
+    "抱歉，本次处理超时，已停止生成。已完成的内容已保存，请稍后重试。"
+)
 
 
 class NodeType(str, Enum):
     """代理图节点类型"""
 
     FIRST = "start"
+    ROUTE = "route"
     REASON = "reason"
     ACT = "act"
+    REPLY = "reply"
     LAST = "end"
 
 
-class AgentRequest(BaseModel):
-    message: str
-
-
 def generate_id() -> str:
     return str(uuid.uuid4())[:8]
 
@@ -55,8 +92,8 @@ async def generate_llm_message(messages) -> AsyncGenerator[SseEvent]:
     message_id = generate_id()
 
     llm = create_llm_client()
-    print(f'llm request, messages: {messages}')
-    for chunk in llm.stream(messages):
+    logger.debug('llm request, messages: %s', truncated(messages))
+    async for chunk in llm.astream(messages):
         if chunk.content:
             yield TextMessageEvent.new(message_id=message_id, content=chunk.content)
 
@@ -64,33 +101,111 @@ async def generate_llm_message(messages) -> AsyncGenerator[SseEvent]:
 # LangGraph State Schema
 class AgentState(TypedDict):
     request: AgentRequest
+    original_artifact_id: str
     messages: Annotated[list, add_messages]
+    # 是否由路由节点直接分派工具（跳过推理节点）
+    fast_path: bool
 
 
+@traced("node.start")
 def start_node(state: AgentState) -> AgentState:
     """开始节点：发送运行开始事件"""
-    print(f'start_node, state: {state}')
+    logger.info('start_node, messages: %d', len(state.get("messages", ())))
+    logger.debug('start_node, state: %s', truncated(state))
 
     write_sse_event(RunStartedEvent.new())
 
     return state
 
 
-def reason_node(state: AgentState) -> AgentState:
+@traced("node.route")
+def route_node(state: AgentState) -> AgentState:
+    """路由节点：明确的常见请求直接分派到工具，跳过推理节点的 LLM 调用"""
+    decision = classify(state["request"].message)
+    fast_path = decision.is_fast_path()
+    saved_seconds = router_stats.record_decision(fast_path)
+    current_span().set_attributes(
+        {"route.fast_path": fast_path, "route.confidence": decision.confidence}
+    )
+    logger.info(
+        'route_node, decision: %s, fast_path: %s, estimated saved: %.2fs',
+        decision,
+        fast_path,
+        saved_seconds,
+    )
+
+    if not fast_path:
+        return {"fast_path": False}
+
+    content = decision.confirm_message()
+    write_sse_event(TextMessageEvent.new(message_id=generate_id(), content=content))
+
+    ai_message = AIMessage(
+        content=content,
+        tool_calls=[
+            {
+                "name": tool_name,
+                "args": {"original_artifact_id": state["original_artifact_id"]},
+                "id": f"call_{generate_id()}",
+            }
+            for tool_name in decision.tool_names
+        ],
+    )
+    return {"fast_path": True, "messages": [ai_message]}
+
+
+def route_next(state: AgentState) -> NodeType:
+    """路由节点之后：快速路径直接执行工具，否则交给推理节点"""
+    return NodeType.ACT if state["fast_path"] else NodeType.REASON
+
+
+def act_next(state: AgentState) -> NodeType:
+    """工具执行之后：快速路径直接回复，否则回到推理节点"""
+    return NodeType.REPLY if state["fast_path"] else NodeType.REASON
+
+
+@traced("node.reply")
+def reply_node(state: AgentState) -> AgentState:
+    """回复节点：快速路径下工具完成后发送固定的完成消息，代替第二次推理"""
+    content = classify(state["request"].message).finish_message()
+    write_sse_event(TextMessageEvent.new(message_id=generate_id(), content=content))
+
+    return {"messages": [AIMessage(content=content)]}
+
+
+@traced("node.reason")
+async def reason_node(state: AgentState) -> AgentState:
     """推理节点：使用LLM决定调用哪个工具"""
-    print(f'reason_node, state: {state}')
+    logger.info('reason_node, messages: %d', len(state["messages"]))
+    logger.debug('reason_node, state: %s', truncated(state))
+    start_time = time.perf_counter()
 
-    tools = ArticleEvaluatorTool.get_tools()
-    llm = create_llm_client()
-    llm_with_tools = llm.bind_tools(tools)
+    # 共享的工具绑定客户端，只在首次调用时构建
+    llm_with_tools = get_llm_client(LlmTask.REASON, ArticleEvaluatorTool.get_tools())
+
+    # 按模型的上下文预算压缩历史消息，状态中保留完整历史
+    messages, tokens_saved = compact_messages(
+        state["messages"], get_context_budget(get_llm_model(LlmTask.REASON))
+    )
+    current_span().set_attributes(
+        {"llm.messages": len(messages), "context.tokens_saved": tokens_saved}
+    )
+    if tokens_saved:
+        logger.info('context compacted, tokens saved: %d', tokens_saved)
+        run_usage = current_run_usage.get()
+        if run_usage is not None:
+            run_usage.record_context_compaction(tokens_saved)
 
     # 使用分片归并：累积所有chunk，最后合并成完整AIMessage
     message_id = generate_id()
 
     # 用于归并的累加器
     accumulated_chunks = []
+    stream_timer = LlmStreamTimer(LlmTask.REASON.value)
 
-    for chunk in llm_with_tools.stream(state["messages"]):
+    # 使用异步流，运行被取消时可以及时中断上游 LLM 连接
+    async for chunk in llm_with_tools.astream(messages):
+        stream_timer.on_chunk()
         # 累积分片用于最终归并
         accumulated_chunks.append(chunk)
 
@@ -101,6 +216,15 @@ def reason_node(state: AgentState) -> AgentState:
             )
 
     ai_message = merge_chunks(accumulated_chunks)
+    usage = record_llm_usage(
+        LlmTask.REASON,
+        ai_message.usage_metadata,
+        model=ai_message.response_metadata.get("model_name"),
+    )
+    stream_timer.finish(usage.output_tokens)
+    duration = time.perf_counter() - start_time
+    router_stats.record_reason_duration(duration)
+    REASON_NODE_DURATION.observe(duration)
 
     return {"messages": [ai_message]}
 
@@ -132,28 +256,47 @@ def merge_chunks(accumulated_chunks):
     return final_message
 
 
+@traced("node.end")
 def end_node(state: AgentState) -> AgentState:
-    """结束节点：发送运行完成事件"""
-    print(f'end_node, state: {state}')
+    """结束节点：发送本次运行的用量汇总和运行完成事件"""
+    logger.info('end_node, messages: %d', len(state["messages"]))
+    logger.debug('end_node, state: %s', truncated(state))
 
+    run_usage = current_run_usage.get()
+    if run_usage is not None:
+        write_sse_event(run_usage.to_event())
     write_sse_event(RunFinishedEvent.new())
 
     return state
 
 
-def build_agent_graph() -> StateGraph:
-    """构建LangGraph代理图 - 标准 re-act 模式"""
+def build_agent_graph(
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> CompiledStateGraph:
+    """构建LangGraph代理图 - 标准 re-act 模式，前置规则路由的快速路径"""
     graph = StateGraph(AgentState)
 
     # 添加节点
     graph.add_node(NodeType.FIRST, start_node)
+    graph.add_node(NodeType.ROUTE, route_node)
     graph.add_node(NodeType.REASON, reason_node)
     graph.add_node(NodeType.ACT, ToolNode(ArticleEvaluatorTool.get_tools()))
+    graph.add_node(NodeType.REPLY, reply_node)
     graph.add_node(NodeType.LAST, end_node)
 
     # 连接节点 - re-act 模式
     graph.add_edge(START, NodeType.FIRST)
-    graph.add_edge(NodeType.FIRST, NodeType.REASON)
+    graph.add_edge(NodeType.FIRST, NodeType.ROUTE)
+
+    # 路由节点：置信度高的请求直接执行工具，否则进入推理
+    graph.add_conditional_edges(
+        NodeType.ROUTE,
+        route_next,
+        {
+            NodeType.ACT: NodeType.ACT,
+            NodeType.REASON: NodeType.REASON,
+        },
+    )
 
     # 从 reason 节点添加条件边，根据是否有工具调用决定下一步
     graph.add_conditional_edges(
@@ -165,46 +308,236 @@ def build_agent_graph() -> StateGraph:
         },
     )
 
-    # 从 act 节点返回到 reason 节点，形成循环
-    graph.add_edge(NodeType.ACT, NodeType.REASON)
+    # 从 act 节点返回到 reason 节点，形成循环；快速路径则直接回复
+    graph.add_conditional_edges(
+        NodeType.ACT,
+        act_next,
+        {
+            NodeType.REASON: NodeType.REASON,
+            NodeType.REPLY: NodeType.REPLY,
+        },
+    )
+    graph.add_edge(NodeType.REPLY, NodeType.LAST)
     graph.add_edge(NodeType.LAST, END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
-async def generate_agent_response(
-    request: AgentRequest,
-) -> AsyncGenerator[SseEvent]:
+@lru_cache(maxsize=4)
+def _compile_agent_graph(
+    checkpointer: BaseCheckpointSaver | None,
+) -> CompiledStateGraph:
+    return build_agent_graph(checkpointer)
+
+
+def get_agent_graph(checkpointed: bool = False) -> CompiledStateGraph:
     """
-    主要的Agent响应函数，使用LangGraph流式处理
+    获取编译后的代理图。图本身不保存运行状态，所有并发运行共享同一个实例
+
+    checkpointed 为 True 时返回绑定检查点存储的图，用于按线程保存状态的多轮对话
     """
+    return _compile_agent_graph(checkpoint_store.saver if checkpointed else None)
+
+
+# 同一线程的运行依次执行，避免并发写入同一检查点
+_thread_locks: WeakValueDictionary[str, asyncio.Lock] = WeakValueDictionary()
+
+
+def _get_thread_lock(thread_id: str) -> asyncio.Lock:
+    lock = _thread_locks.get(thread_id)
+    if lock is None:
+        lock = _thread_locks[thread_id] = asyncio.Lock()
+    return lock
 
-    graph = build_agent_graph()
 
-    # 创建初始消息
+def _cancelled_tool_messages(messages: list) -> list[ToolMessage]:
+    """被中断的运行可能留下没有结果的工具调用，开始新一轮对话前需要补齐"""
+    last_ai_message = next(
+        (message for message in reversed(messages) if isinstance(message, AIMessage)),
+        None,
+    )
+    if last_ai_message is None:
+        return []
+
+    answered = {
+        message.tool_call_id for message in messages if isinstance(message, ToolMessage)
+    }
+    return [
+        ToolMessage(
+            content=json.dumps({"status": "cancelled"}),
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"],
+        )
+        for tool_call in last_ai_message.tool_calls
+        if tool_call["id"] not in answered
+    ]
+
+
+@traced("agent.prepare_input")
+async def _prepare_graph_input(
+    request: AgentRequest, graph: CompiledStateGraph, config: RunnableConfig | None
+) -> AgentState | None:
+    """
+    构建本轮运行的输入状态
+
+    多轮对话从检查点读取线程的最新状态（只读取最后一个检查点，与历史轮数无关）。
+    历史消息中的工具结果只包含 artifact ID，不内联 artifact 内容。
+    """
     original_artifact = artifact_manager.get_original_artifact()
-    agent_prompts = AgentPrompts()
-    initial_messages = [
-        SystemMessage(content=agent_prompts.system()),
-        HumanMessage(
-            content=agent_prompts.user(
-                original_artifact_id=original_artifact.id, user_message=request.message
+    current_span().set_attribute("artifact.original_id", original_artifact.id)
+    snapshot = await graph.aget_state(config) if config else None
+
+    # 系统消息为稳定前缀，只在线程的第一轮加入；可变的 Artifact ID 与用户请求放在最后
+    with span("prompt.render"):
+        agent_prompts = AgentPrompts()
+        messages = []
+        if snapshot and snapshot.values.get("messages"):
+            messages.extend(_cancelled_tool_messages(snapshot.values["messages"]))
+        else:
+            messages.append(SystemMessage(content=agent_prompts.system()))
+        messages.append(
+            HumanMessage(
+                content=agent_prompts.user(
+                    original_artifact_id=original_artifact.id,
+                    user_message=request.message,
+                )
             )
-        ),
-    ]
+        )
 
-    # 创建初始状态
-    initial_state: AgentState = {
+    return {
         "request": request,
-        "messages": initial_messages,
+        "original_artifact_id": original_artifact.id,
+        "messages": messages,
+        "fast_path": False,
     }
 
-    # 使用LangGraph的流式处理，订阅custom事件来获取SSE事件
-    async for kind, payload in graph.astream(initial_state, stream_mode=["custom"]):
-        if kind == "custom":
-            # 处理自定义事件（SSE事件）
-            channel = payload.get("channel")
-            if channel == "sse":
-                event = payload.get("event")
-                if event:
-                    yield event
+
+@traced("agent.run")
+async def _run_agent_graph(
+    request: AgentRequest, queue: asyncio.Queue[SseEvent | None]
+):
+    """在独立任务中执行代理图，将SSE事件写入队列，结束时写入 None"""
+    thread_id = request.thread_id
+    graph = get_agent_graph(checkpointed=thread_id is not None)
+    config: RunnableConfig | None = (
+        {"configurable": {"thread_id": thread_id}} if thread_id else None
+    )
+    # 已开始但尚未完成流式输出的 artifact，超时时需要通知前端结束
+    streaming_artifact_ids: set[str] = set()
+    # 本任务内的节点和工具共享该用量记录
+    run_usage = RunUsage()
+    current_run_usage.set(run_usage)
+    current_span().set_attributes(
+        {"agent.thread_id": thread_id, "agent.resume": request.resume}
+    )
+
+    try:
+        async with AsyncExitStack() as stack:
+            if thread_id:
+                await stack.enter_async_context(_get_thread_lock(thread_id))
+
+            if request.resume:
+                # 从最后完成的节点继续，开始节点不会重新执行，需要补发运行开始事件
+                await queue.put(RunStartedEvent.new())
+                snapshot = await graph.aget_state(config)
+                if not snapshot.next:
+                    logger.info('thread %s has no interrupted run to resume', thread_id)
+                    await queue.put(RunFinishedEvent.new())
+                    return
+                logger.info('resuming thread %s from: %s', thread_id, snapshot.next)
+                graph_input = None
+            else:
+                graph_input = await _prepare_graph_input(request, graph, config)
+
+            async with asyncio.timeout(AGENT_TIMEOUT_SECONDS):
+                # 使用LangGraph的流式处理，订阅custom事件来获取SSE事件
+                async for kind, payload in graph.astream(
+                    graph_input, config, stream_mode=["custom"]
+                ):
+                    if kind == "custom":
+                        # 处理自定义事件（SSE事件）
+                        channel = payload.get("channel")
+                        if channel == "sse":
+                            event = payload.get("event")
+                            if event:
+                                if event.type == EventType.ARTIFACT_CONTENT_START:
+                                    streaming_artifact_ids.add(event.data.artifact_id)
+                                elif event.type == EventType.ARTIFACT_CONTENT_COMPLETE:
+                                    streaming_artifact_ids.discard(
+                                        event.data.artifact_id
+                                    )
+                                await queue.put(event)
+    except TimeoutError:
+        # 运行超时：已完成的 artifact 保留，进行中的工具调用被取消且不落盘
+        # 多轮对话中，最后完成的节点已写入检查点，可通过 resume 继续
+        logger.warning('agent run timed out after %ss', AGENT_TIMEOUT_SECONDS)
+        for artifact_id in streaming_artifact_ids:
+            await queue.put(ArtifactContentCompleteEvent.new(artifact_id=artifact_id))
+        await queue.put(
+            TextMessageEvent.new(
+                message_id=generate_id(), content=AGENT_TIMEOUT_MESSAGE
+            )
+        )
+        await queue.put(run_usage.to_event())
+        await queue.put(RunFinishedEvent.new())
+    finally:
+        usage_stats.record_run(run_usage)
+        try:
+            queue.put_nowait(None)
+        except asyncio.QueueFull:
+            # 运行被取消时消费方已停止读取，不再发送结束标记，否则会一直等待队列空位
+            if not asyncio.current_task().cancelling():
+                await queue.put(None)
+
+
+async def generate_agent_response(
+    request: AgentRequest,
+) -> AsyncGenerator[SseEvent]:
+    """
+    主要的Agent响应函数，使用LangGraph流式处理
+
+    代理图在独立任务中运行。当调用方停止消费（如客户端断开连接导致生成器被取消或关闭）时，
+    该任务会被取消，正在进行的 LLM 流随之中断，未完成的 artifact 不会被保存。
+    请求带有 thread_id 时，每个节点完成后的状态都写入检查点，被中断的运行可以继续。
+    """
+    queue: asyncio.Queue[SseEvent | None] = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+    run_task = asyncio.create_task(_run_agent_graph(request, queue))
+    max_queue_depth = 0
+    # 合并同一消息或 artifact 的连续分片，缓冲内容最迟在时间窗口结束时发送
+    coalescer = SseCoalescer()
+
+    try:
+        while True:
+            max_queue_depth = max(max_queue_depth, queue.qsize())
+            try:
+                event = await asyncio.wait_for(queue.get(), coalescer.timeout())
+            except TimeoutError:
+                for merged_event in coalescer.flush():
+                    yield merged_event
+                continue
+            if event is None:
+                break
+            for merged_event in coalescer.add(event):
+                yield merged_event
+        for merged_event in coalescer.flush():
+            yield merged_event
+        # 传播代理图中的异常
+        await run_task
+    finally:
+        sse_stats.record_coalesce(coalescer.events_in, coalescer.events_out)
+        sse_stats.record_producer_queue_depth(max_queue_depth)
+        logger.info(
+            'sse events coalesced: %d -> %d, max queue depth: %d',
+            coalescer.events_in,
+            coalescer.events_out,
+            max_queue_depth,
+        )
+        if not run_task.done():
+            logger.info('agent run abandoned by client, cancelling')
+            run_task.cancel()
+            try:
+                await run_task
+            except asyncio.CancelledError:
+                # 消费方自身也被取消时继续传播
+                if asyncio.current_task().cancelling():
+                    raise
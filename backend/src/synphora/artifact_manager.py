@@ -1,4 +1,5 @@
 import os
+import threading
 
 
 from synphora.file_storage import FileStorage
@@ -9,9 +10,23 @@ from synphora.models import ArtifactData, ArtifactRole, ArtifactType
 
 class ArtifactManager:
     def __init__(self):
-        # 从环境变量获取存储路径，默认为 tests/data/store
-        storage_path = os.getenv('SYNPHORA_STORAGE_PATH', 'tests/data/store')
-        self._storage = FileStorage(storage_path)
+        # 存储在服务启动时或首次使用时创建，导入模块时不复制存储目录、不读取元数据
+        self._file_storage: FileStorage | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def _storage(self) -> FileStorage:
+        if self._file_storage is None:
+            self.initialize()
+        return self._file_storage
+
+    def initialize(self):
+        """创建存储，在服务生命周期开始时调用；未调用时在首次使用时创建"""
+        with self._lock:
+            if self._file_storage is None:
+                # 从环境变量获取存储路径，默认为 tests/data/store
+                storage_path = os.getenv('SYNPHORA_STORAGE_PATH', 'tests/data/store')
+                self._file_storage = FileStorage(storage_path)
 
     def generate_artifact_id(self) -> str:
         """生成 artifact ID"""
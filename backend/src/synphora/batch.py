@@ -0,0 +1,294 @@
+# 离线批量文章评价，对大量文章运行 ArticleEvaluator，用于内容积压处理或提示词回归检查
+#
+# 用法：
+#   uv run batch-evaluate articles/ --output results.jsonl
+#   uv run batch-evaluate articles.jsonl --output results.jsonl --types title,introduction
+#
+# 输入可以是目录（读取其中的 .md / .txt 文件）或 JSONL（每行 {"id", "title", "content"}）。
+# 结果逐条追加写入输出 JSONL，重新运行同一命令时跳过已完成的 (文章, 评价类型)。
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from synphora.artifact_manager import artifact_manager
+from synphora.log import configure_logging
+from synphora.models import ArtifactData, ArtifactRole, ArtifactType, EvaluateType
+from synphora.usage import usage_stats
+
+ARTICLE_SUFFIXES = {".md", ".markdown", ".txt"}
+
+
+class BatchArticle(BaseModel):
+    id: str
+    title: str
+    content: str
+
+
+class BatchResult(BaseModel):
+    article_id: str
+    evaluate_type: EvaluateType
+    # completed / timeout / error，只有 completed 在重新运行时会被跳过
+    status: str
+    content: str = ""
+    elapsed_seconds: float
+    # 使用 --save-artifacts 时保存的原文与结果 artifact
+    original_artifact_id: str | None = None
+    artifact_id: str | None = None
+    error: str | None = None
+
+
+def load_articles(path: Path) -> list[BatchArticle]:
+    """读取目录中的文章文件，或 JSONL 中的文章"""
+    if path.is_dir():
+        return [
+            BatchArticle(
+                id=str(file.relative_to(path)),
+                title=file.name,
+                content=file.read_text(encoding='utf-8'),
+            )
+            for file in sorted(path.rglob("*"))
+            if file.is_file() and file.suffix in ARTICLE_SUFFIXES
+        ]
+
+    articles = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            article_id = str(item.get("id") or line_number)
+            articles.append(
+                BatchArticle(
+                    id=article_id,
+                    title=item.get("title") or article_id,
+                    content=item["content"],
+                )
+            )
+    return articles
+
+
+def load_results(output: Path) -> list[BatchResult]:
+    if not output.exists():
+        return []
+    with open(output, encoding='utf-8') as f:
+        return [BatchResult.model_validate_json(line) for line in f if line.strip()]
+
+
+class BatchProgress:
+    """批量运行进度与吞吐统计"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.start_time = time.perf_counter()
+        self._start_output_tokens = self._output_tokens()
+
+    @staticmethod
+    def _output_tokens() -> int:
+        return sum(
+            usage.output_tokens
+            for task, usage in usage_stats.snapshot().items()
+            if task.evaluate_type is not None
+        )
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def throughput(self) -> tuple[float, float]:
+        """(每秒完成的评价数, 每秒生成的词元数)"""
+        elapsed = max(self.elapsed_seconds, 1e-9)
+        output_tokens = self._output_tokens() - self._start_output_tokens
+        return self.done / elapsed, output_tokens / elapsed
+
+    def record(self, result: BatchResult):
+        self.done += 1
+        if result.status != "completed":
+            self.failed += 1
+        jobs_per_second, tokens_per_second = self.throughput()
+        print(
+            f'[{self.done}/{self.total}] {result.article_id} '
+            f'{result.evaluate_type.value}: {result.status} '
+            f'({result.elapsed_seconds:.2f}s) | '
+            f'{jobs_per_second:.2f} jobs/s, {tokens_per_second:.0f} tokens/s'
+        )
+
+    def summary(self) -> str:
+        jobs_per_second, tokens_per_second = self.throughput()
+        return (
+            f'batch finished: {self.done - self.failed}/{self.total} completed, '
+            f'{self.failed} failed, {self.elapsed_seconds:.2f}s, '
+            f'{jobs_per_second:.2f} jobs/s, {tokens_per_second:.0f} tokens/s'
+        )
+
+
+def _in_memory_artifact(article: BatchArticle) -> ArtifactData:
+    now = datetime.now().isoformat()
+    return ArtifactData(
+        id=article.id,
+        role=ArtifactRole.USER,
+        type=ArtifactType.ORIGINAL,
+        title=article.title,
+        content=article.content,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+async def evaluate_article(
+    article: BatchArticle,
+    evaluate_type: EvaluateType,
+    original_artifact_id: str | None = None,
+) -> BatchResult:
+    """
+    对一篇文章运行一种评价
+
+    提供 original_artifact_id 时走与 /agent 相同的流程，结果保存为 artifact；
+    否则只在内存中生成，不写入存储。
+    """
+    # 评价器依赖 langchain，服务端只在运行评价任务时导入
+    from synphora.tool import ArticleEvaluator
+
+    evaluator = ArticleEvaluator(evaluate_type)
+    start_time = time.perf_counter()
+    result = BatchResult(
+        article_id=article.id,
+        evaluate_type=evaluate_type,
+        status="error",
+        elapsed_seconds=0.0,
+        original_artifact_id=original_artifact_id,
+    )
+
+    try:
+        if original_artifact_id:
+            tool_result = json.loads(await evaluator.evaluate(original_artifact_id))
+            result.artifact_id = tool_result["artifact_id"]
+            result.status = tool_result["status"]
+            result.content = artifact_manager.get_artifact(result.artifact_id).content
+        else:
+            content, timed_out = await evaluator.generate(
+                _in_memory_artifact(article), artifact_id=article.id
+            )
+            result.content = content
+            result.status = "timeout" if timed_out else "completed"
+    except Exception as e:
+        result.error = str(e)
+
+    result.elapsed_seconds = time.perf_counter() - start_time
+    return result
+
+
+async def run_batch(
+    articles: list[BatchArticle],
+    evaluate_types: list[EvaluateType],
+    output: Path,
+    concurrency: int = 4,
+    save_artifacts: bool = False,
+) -> BatchProgress:
+    """以有界并发运行批量评价，结果逐条追加到 output"""
+    previous_results = load_results(output)
+    completed = {
+        (result.article_id, result.evaluate_type)
+        for result in previous_results
+        if result.status == "completed"
+    }
+    # 重新运行时复用已保存的原文 artifact
+    original_artifact_ids = {
+        result.article_id: result.original_artifact_id
+        for result in previous_results
+        if result.original_artifact_id
+    }
+
+    jobs: asyncio.Queue[tuple[BatchArticle, EvaluateType]] = asyncio.Queue()
+    for article in articles:
+        for evaluate_type in evaluate_types:
+            if (article.id, evaluate_type) not in completed:
+                jobs.put_nowait((article, evaluate_type))
+
+    skipped = len(articles) * len(evaluate_types) - jobs.qsize()
+    if skipped:
+        print(f'resuming batch, skipping {skipped} completed evaluations')
+    progress = BatchProgress(total=jobs.qsize())
+
+    def get_original_artifact_id(article: BatchArticle) -> str | None:
+        if not save_artifacts:
+            return None
+        if article.id not in original_artifact_ids:
+            original_artifact_ids[article.id] = artifact_manager.create_artifact(
+                title=article.title, content=article.content
+            ).id
+        return original_artifact_ids[article.id]
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "a", encoding='utf-8') as f:
+
+        async def worker():
+            while not jobs.empty():
+                article, evaluate_type = jobs.get_nowait()
+                result = await evaluate_article(
+                    article, evaluate_type, get_original_artifact_id(article)
+                )
+                # 每条结果立即落盘，中断后可以从断点继续
+                f.write(result.model_dump_json() + "\n")
+                f.flush()
+                progress.record(result)
+
+        await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+
+    return progress
+
+
+def parse_evaluate_types(value: str) -> list[EvaluateType]:
+    return [EvaluateType(name.strip()) for name in value.split(",") if name.strip()]
+
+
+def main():
+    """Runs article evaluations in batch."""
+    parser = argparse.ArgumentParser(description="批量运行文章评价")
+    parser.add_argument("input", type=Path, help="文章目录或 JSONL 文件")
+    parser.add_argument(
+        "--output", type=Path, required=True, help="结果 JSONL 文件，同时用于断点续跑"
+    )
+    parser.add_argument(
+        "--types",
+        type=parse_evaluate_types,
+        default=list(EvaluateType),
+        help="逗号分隔的评价类型：comment,title,introduction，默认全部",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="并发评价数")
+    parser.add_argument(
+        "--save-artifacts",
+        action="store_true",
+        help="将原文和评价结果保存为 artifact（SYNPHORA_STORAGE_PATH）",
+    )
+    args = parser.parse_args()
+
+    configure_logging()
+    articles = load_articles(args.input)
+    print(
+        f'batch evaluate, articles: {len(articles)}, '
+        f'types: {[t.value for t in args.types]}, concurrency: {args.concurrency}'
+    )
+    progress = asyncio.run(
+        run_batch(
+            articles,
+            args.types,
+            args.output,
+            concurrency=args.concurrency,
+            save_artifacts=args.save_artifacts,
+        )
+    )
+    print(progress.summary())
+    sys.exit(1 if progress.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
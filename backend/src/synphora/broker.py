@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import AsyncGenerator
+from contextlib import suppress
+from enum import Enum
+from itertools import islice
+
+from synphora.coalesce import merge_events, sse_stats
+from synphora.sse import SseEvent, format_sse_frame
+
+logger = logging.getLogger(__name__)
+
+# 每次运行保留的最近 SSE 帧数，用于断线重连后补发
+REPLAY_BUFFER_SIZE = int(os.getenv('SYNPHORA_SSE_REPLAY_BUFFER_SIZE', '2000'))
+
+# 每个订阅者待发送帧的上限，超过后按背压策略处理
+SUBSCRIBER_BUFFER_SIZE = int(os.getenv('SYNPHORA_SSE_SUBSCRIBER_BUFFER_SIZE', '256'))
+
+
+class BackpressurePolicy(str, Enum):
+    """订阅者缓冲已满时的处理方式"""
+
+    # 运行等待该订阅者消费，超过 SSE_BLOCK_TIMEOUT_SECONDS 后断开
+    BLOCK = "block"
+    # 与缓冲中最后一个同一消息或 artifact 的分片合并，不能合并时断开
+    MERGE = "merge"
+    # 断开订阅者，由客户端带 Last-Event-ID 重连补发
+    DISCONNECT = "disconnect"
+
+
+SSE_BACKPRESSURE_POLICY = BackpressurePolicy(
+    os.getenv('SYNPHORA_SSE_BACKPRESSURE_POLICY', 'merge')
+)
+
+# block 策略下等待单个订阅者的最长时间（秒）
+SSE_BLOCK_TIMEOUT_SECONDS = float(os.getenv('SYNPHORA_SSE_BLOCK_TIMEOUT_SECONDS', '10'))
+
+
+class ReplayUnavailableError(Exception):
+    """请求补发的事件已不在补发缓冲中"""
+
+
+class RunBroker:
+    """
+    运行事件的发布/订阅后端
+
+    每次运行对应一个主题：运行本身是唯一的发布者，订阅者可以有任意多个，
+    LLM 调用只执行一次。默认使用进程内实现，多进程部署时可以替换为基于外部
+    消息系统的实现。
+    """
+
+    def open(self, run_id: str):
+        raise NotImplementedError
+
+    async def publish(self, run_id: str, event_id: int, event: SseEvent, frame: str):
+        """发布一帧；frame 是发送的数据，event 供本地的背压策略合并分片"""
+        raise NotImplementedError
+
+    def close(self, run_id: str):
+        """运行结束，订阅者收完剩余的帧后停止"""
+        raise NotImplementedError
+
+    def remove(self, run_id: str):
+        raise NotImplementedError
+
+    def check_replay(self, run_id: str, last_event_id: int | None):
+        raise NotImplementedError
+
+    def subscribe(
+        self, run_id: str, last_event_id: int | None = None
+    ) -> AsyncGenerator[str]:
+        raise NotImplementedError
+
+    def queue_depths(self, run_id: str) -> list[int]:
+        """各订阅者当前待发送的帧数"""
+        raise NotImplementedError
+
+
+class _Subscriber:
+    def __init__(self):
+        self.pending: deque[tuple[SseEvent, str]] = deque()
+        self.readable = asyncio.Event()
+        self.writable = asyncio.Event()
+        self.lagged = False
+        self.closed = False
+        self.max_queue_depth = 0
+        self.frames_merged = 0
+        self.blocked_seconds = 0.0
+
+    def push(self, event: SseEvent, frame: str):
+        self.pending.append((event, frame))
+        self.max_queue_depth = max(self.max_queue_depth, len(self.pending))
+        self.readable.set()
+
+
+class _Topic:
+    def __init__(self, replay_size: int):
+        self.frames: deque[tuple[int, str]] = deque(maxlen=replay_size)
+        self.next_id = 0
+        self.finished = False
+        self.subscribers: set[_Subscriber] = set()
+
+    @property
+    def first_id(self) -> int:
+        return self.next_id - len(self.frames)
+
+
+class MemoryRunBroker(RunBroker):
+    """进程内的运行事件代理，每个订阅者有独立的有界缓冲"""
+
+    def __init__(
+        self,
+        replay_size: int = REPLAY_BUFFER_SIZE,
+        subscriber_buffer_size: int = SUBSCRIBER_BUFFER_SIZE,
+        policy: BackpressurePolicy = SSE_BACKPRESSURE_POLICY,
+        block_timeout: float = SSE_BLOCK_TIMEOUT_SECONDS,
+    ):
+        self.replay_size = replay_size
+        self.subscriber_buffer_size = subscriber_buffer_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._topics: dict[str, _Topic] = {}
+
+    def open(self, run_id: str):
+        self._topics[run_id] = _Topic(self.replay_size)
+
+    async def publish(self, run_id: str, event_id: int, event: SseEvent, frame: str):
+        topic = self._topics[run_id]
+        topic.frames.append((event_id, frame))
+        topic.next_id = event_id + 1
+        for subscriber in list(topic.subscribers):
+            await self._offer(topic, subscriber, event_id, event, frame)
+
+    async def _offer(
+        self,
+        topic: _Topic,
+        subscriber: _Subscriber,
+        event_id: int,
+        event: SseEvent,
+        frame: str,
+    ):
+        if len(subscriber.pending) < self.subscriber_buffer_size:
+            subscriber.push(event, frame)
+            return
+
+        if self.policy == BackpressurePolicy.BLOCK:
+            start_time = time.monotonic()
+            with suppress(TimeoutError):
+                async with asyncio.timeout(self.block_timeout):
+                    while (
+                        len(subscriber.pending) >= self.subscriber_buffer_size
+                        and subscriber in topic.subscribers
+                    ):
+                        subscriber.writable.clear()
+                        await subscriber.writable.wait()
+            subscriber.blocked_seconds += time.monotonic() - start_time
+            if subscriber not in topic.subscribers:
+                return
+            if len(subscriber.pending) < self.subscriber_buffer_size:
+                subscriber.push(event, frame)
+                return
+
+        if self.policy == BackpressurePolicy.MERGE:
+            last_event, _ = subscriber.pending[-1]
+            merged = merge_events(last_event, event)
+            if merged is not None:
+                # 合并后的帧使用后一个事件的 id，重连时的 Last-Event-ID 仍然正确
+                subscriber.pending[-1] = (merged, format_sse_frame(event_id, merged))
+                subscriber.frames_merged += 1
+                return
+
+        # 慢订阅者不无限占用内存，收完已缓冲的帧后断开
+        subscriber.lagged = True
+        subscriber.readable.set()
+        topic.subscribers.discard(subscriber)
+
+    def close(self, run_id: str):
+        topic = self._topics[run_id]
+        topic.finished = True
+        for subscriber in topic.subscribers:
+            subscriber.closed = True
+            subscriber.readable.set()
+
+    def remove(self, run_id: str):
+        self._topics.pop(run_id, None)
+
+    def check_replay(self, run_id: str, last_event_id: int | None):
+        topic = self._topics[run_id]
+        next_id = 0 if last_event_id is None else last_event_id + 1
+        if next_id < topic.first_id:
+            raise ReplayUnavailableError(
+                f'Event {next_id} is no longer buffered, oldest is {topic.first_id}'
+            )
+
+    async def subscribe(
+        self, run_id: str, last_event_id: int | None = None
+    ) -> AsyncGenerator[str]:
+        self.check_replay(run_id, last_event_id)
+        topic = self._topics[run_id]
+        next_id = 0 if last_event_id is None else last_event_id + 1
+        # 取补发帧和加入订阅者之间没有 await，不会漏掉或重复任何一帧
+        backlog = [
+            frame for _, frame in islice(topic.frames, next_id - topic.first_id, None)
+        ]
+        if topic.finished:
+            for frame in backlog:
+                yield frame
+            return
+
+        subscriber = _Subscriber()
+        topic.subscribers.add(subscriber)
+        try:
+            for frame in backlog:
+                yield frame
+            while True:
+                if subscriber.pending:
+                    _, frame = subscriber.pending.popleft()
+                    subscriber.writable.set()
+                    yield frame
+                elif subscriber.lagged:
+                    logger.warning(
+                        'sse subscriber lagged behind, run_id: %s, '
+                        'disconnecting after %d buffered frames',
+                        run_id,
+                        self.subscriber_buffer_size,
+                    )
+                    return
+                elif subscriber.closed:
+                    return
+                else:
+                    subscriber.readable.clear()
+                    await subscriber.readable.wait()
+        finally:
+            topic.subscribers.discard(subscriber)
+            # 唤醒可能正在等待该订阅者的发布者
+            subscriber.writable.set()
+            sse_stats.record_subscriber(
+                subscriber.max_queue_depth,
+                subscriber.frames_merged,
+                subscriber.lagged,
+                subscriber.blocked_seconds,
+            )
+
+    def queue_depths(self, run_id: str) -> list[int]:
+        topic = self._topics.get(run_id)
+        if not topic:
+            return []
+        return [len(subscriber.pending) for subscriber in topic.subscribers]
@@ -0,0 +1,55 @@
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+
+logger = logging.getLogger(__name__)
+
+# 会话检查点的 SQLite 文件路径；未配置时检查点只保存在进程内存中
+CHECKPOINT_PATH = os.getenv('SYNPHORA_CHECKPOINT_PATH')
+
+
+class CheckpointStore:
+    """多轮会话的检查点存储，按 thread_id 保存代理图每个节点完成后的状态"""
+
+    def __init__(self):
+        self._saver: BaseCheckpointSaver | None = None
+        self._lock = threading.Lock()
+        # SQLite 文件路径，为 None 时使用内存存储
+        self.path = CHECKPOINT_PATH
+
+    @property
+    def saver(self) -> "BaseCheckpointSaver":
+        """当前的检查点存储，未打开持久化存储时为首次使用时创建的内存存储"""
+        if self._saver is None:
+            with self._lock:
+                if self._saver is None:
+                    from langgraph.checkpoint.memory import InMemorySaver
+
+                    self._saver = InMemorySaver()
+        return self._saver
+
+    @asynccontextmanager
+    async def open(self):
+        """在服务生命周期内打开持久化存储，关闭后恢复为内存存储"""
+        if not self.path:
+            yield self.saver
+            return
+
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        async with AsyncSqliteSaver.from_conn_string(self.path) as saver:
+            await saver.setup()
+            previous, self._saver = self._saver, saver
+            logger.info("💾 Opened checkpoint store at: %s", self.path)
+            try:
+                yield saver
+            finally:
+                self._saver = previous
+
+
+checkpoint_store = CheckpointStore()
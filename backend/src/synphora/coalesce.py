@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+
+from synphora.sse import (
+    ArtifactContentChunkEvent,
+    EventType,
+    SseEvent,
+    TextMessageEvent,
+)
+
+# 合并时间窗口（毫秒），为 0 时不合并，每个分片单独发送
+SSE_COALESCE_WINDOW_MS = float(os.getenv('SYNPHORA_SSE_COALESCE_WINDOW_MS', '30'))
+
+# 合并内容达到该字节数时立即发送
+SSE_COALESCE_MAX_BYTES = int(os.getenv('SYNPHORA_SSE_COALESCE_MAX_BYTES', '2048'))
+
+
+def _merge_key(event: SseEvent) -> tuple[EventType, str] | None:
+    if event.type == EventType.TEXT_MESSAGE:
+        return event.type, event.data.message_id
+    if event.type == EventType.ARTIFACT_CONTENT_CHUNK:
+        return event.type, event.data.artifact_id
+    return None
+
+
+def _chunk_event(key: tuple[EventType, str], content: str) -> SseEvent:
+    event_type, id = key
+    if event_type == EventType.TEXT_MESSAGE:
+        return TextMessageEvent.new(message_id=id, content=content)
+    return ArtifactContentChunkEvent.new(artifact_id=id, content=content)
+
+
+def merge_events(first: SseEvent, second: SseEvent) -> SseEvent | None:
+    """合并同一消息或 artifact 的两个连续分片，不能合并时返回 None"""
+    key = _merge_key(first)
+    if key is None or key != _merge_key(second):
+        return None
+    return _chunk_event(key, first.data.content + second.data.content)
+
+
+class SseCoalescer:
+    """
+    合并连续的文本与 artifact 分片事件，减少 SSE 帧数和序列化次数
+
+    同一消息或 artifact 的连续分片在时间窗口内合并为一个事件；遇到其他事件
+    （如 ARTIFACT_CONTENT_START / COMPLETE）时先发送已缓冲的内容，保证事件顺序不变。
+    """
+
+    def __init__(
+        self,
+        window_ms: float = SSE_COALESCE_WINDOW_MS,
+        max_bytes: int = SSE_COALESCE_MAX_BYTES,
+    ):
+        self.window_seconds = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.events_in = 0
+        self.events_out = 0
+        self._key: tuple[EventType, str] | None = None
+        self._parts: list[str] = []
+        self._bytes = 0
+        self._deadline = 0.0
+
+    def timeout(self) -> float | None:
+        """距离缓冲内容必须发送的秒数，没有缓冲内容时返回 None"""
+        if self._key is None:
+            return None
+        return max(self._deadline - time.monotonic(), 0.0)
+
+    def add(self, event: SseEvent) -> list[SseEvent]:
+        """加入一个事件，返回需要立即发送的事件"""
+        self.events_in += 1
+        key = _merge_key(event) if self.window_seconds > 0 else None
+
+        output = []
+        if key is None or key != self._key:
+            output.extend(self.flush())
+        if key is None:
+            output.append(event)
+            self.events_out += 1
+            return output
+
+        if self._key is None:
+            self._key = key
+            self._deadline = time.monotonic() + self.window_seconds
+        self._parts.append(event.data.content)
+        self._bytes += len(event.data.content.encode())
+        if self._bytes >= self.max_bytes:
+            output.extend(self.flush())
+        return output
+
+    def flush(self) -> list[SseEvent]:
+        """发送已缓冲的内容"""
+        if self._key is None:
+            return []
+        event = _chunk_event(self._key, "".join(self._parts))
+        self._key, self._parts, self._bytes = None, [], 0
+        self.events_out += 1
+        return [event]
+
+
+class SseStats:
+    """SSE 输出统计：合并前后的事件数、序列化占用的 CPU 时间，以及背压相关的队列指标"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events_in = 0
+        self.frames_out = 0
+        self.encode_seconds = 0.0
+        # 代理图与 SSE 输出之间队列的最大深度
+        self.max_producer_queue_depth = 0
+        # 单个订阅者待发送帧的最大深度
+        self.max_subscriber_queue_depth = 0
+        self.frames_merged = 0
+        self.subscribers_dropped = 0
+        self.blocked_seconds = 0.0
+
+    def record_coalesce(self, events_in: int, frames_out: int):
+        with self._lock:
+            self.events_in += events_in
+            self.frames_out += frames_out
+
+    def record_encode(self, seconds: float):
+        with self._lock:
+            self.encode_seconds += seconds
+
+    def record_producer_queue_depth(self, depth: int):
+        with self._lock:
+            self.max_producer_queue_depth = max(self.max_producer_queue_depth, depth)
+
+    def record_subscriber(
+        self,
+        max_queue_depth: int,
+        frames_merged: int,
+        dropped: bool,
+        blocked_seconds: float,
+    ):
+        with self._lock:
+            self.max_subscriber_queue_depth = max(
+                self.max_subscriber_queue_depth, max_queue_depth
+            )
+            self.frames_merged += frames_merged
+            self.subscribers_dropped += int(dropped)
+            self.blocked_seconds += blocked_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "events_in": self.events_in,
+                "frames_out": self.frames_out,
+                "encode_seconds": self.encode_seconds,
+                "max_producer_queue_depth": self.max_producer_queue_depth,
+                "max_subscriber_queue_depth": self.max_subscriber_queue_depth,
+                "frames_merged": self.frames_merged,
+                "subscribers_dropped": self.subscribers_dropped,
+                "blocked_seconds": self.blocked_seconds,
+            }
+
+
+sse_stats = SseStats()
@@ -0,0 +1,252 @@
+import logging
+import os
+import threading
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# brotli 和 zstd 为可选依赖，安装后自动启用
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 服务端优先使用的编码顺序，为空时关闭压缩。
+# SSE 逐帧 flush 时 gzip 的每帧额外开销比 zstd 小，实测压缩后更小，因此默认优先
+COMPRESSION_ENCODINGS = [
+    name.strip()
+    for name in os.getenv('SYNPHORA_COMPRESSION_ENCODINGS', 'gzip,br,zstd').split(',')
+    if name.strip()
+]
+
+# 非流式响应超过该字节数时才压缩
+COMPRESSION_MIN_SIZE = int(os.getenv('SYNPHORA_COMPRESSION_MIN_SIZE', '1024'))
+
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+)
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        # 流式场景下更高的质量等级收益很小，CPU 开销却成倍增加
+        self._compressor = brotli.Compressor(quality=4)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> dict[str, type]:
+    encoders = {"gzip": _GzipEncoder}
+    if brotli is not None:
+        encoders["br"] = _BrotliEncoder
+    if zstandard is not None:
+        encoders["zstd"] = _ZstdEncoder
+    return encoders
+
+
+def choose_encoding(accept_encoding: str, preferred: list[str]) -> str | None:
+    """按服务端优先顺序选择客户端接受且本机可用的编码"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    encoders = available_encodings()
+    for name in preferred:
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if name in encoders and quality > 0:
+            return name
+    return None
+
+
+class CompressionStats:
+    """按编码统计压缩前后的字节数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bytes: dict[str, list[int]] = {}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int):
+        with self._lock:
+            totals = self._bytes.setdefault(encoding, [0, 0])
+            totals[0] += bytes_in
+            totals[1] += bytes_out
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {
+                encoding: {"bytes_in": bytes_in, "bytes_out": bytes_out}
+                for encoding, (bytes_in, bytes_out) in self._bytes.items()
+            }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    按 Accept-Encoding 协商压缩响应（gzip / br / zstd）
+
+    SSE 响应使用流式压缩，每一帧之后立即 flush，客户端收到的每个数据块都能
+    解压出完整的帧，不会因为压缩缓冲而增加延迟；其他响应超过大小阈值时压缩。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        encodings: list[str] = COMPRESSION_ENCODINGS,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), self.encodings
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start: Message | None = None
+        self._encoder = None
+        self._passthrough = False
+        self._event_stream = False
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            # 等到第一个数据块再决定是否压缩
+            self._start = message
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._start is not None:
+            start, self._start = self._start, None
+            headers = MutableHeaders(raw=list(start["headers"]))
+            content_type = headers.get("content-type", "")
+            self._event_stream = content_type.startswith("text/event-stream")
+            if (
+                "content-encoding" in headers
+                or not content_type.startswith(_COMPRESSIBLE_TYPES)
+                or (not more_body and len(body) < self._minimum_size)
+            ):
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            self._encoder = available_encodings()[self._encoding]()
+            headers["Content-Encoding"] = self._encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                # 完整的响应体一次压缩，可以给出准确的长度
+                compressed = self._encoder.compress(body) + self._encoder.finish()
+                headers["Content-Length"] = str(len(compressed))
+                start["headers"] = headers.raw
+                await self._send(start)
+                await self._send_body(body, compressed, more_body=False)
+                return
+            start["headers"] = headers.raw
+            await self._send(start)
+
+        chunk = self._encoder.compress(body)
+        if not more_body:
+            chunk += self._encoder.finish()
+        elif self._event_stream:
+            chunk += self._encoder.flush()
+        await self._send_body(body, chunk, more_body)
+
+    async def _send_body(self, body: bytes, chunk: bytes, more_body: bool):
+        self._bytes_in += len(body)
+        self._bytes_out += len(chunk)
+        if chunk or not more_body:
+            await self._send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+        if more_body:
+            return
+
+        compression_stats.record(self._encoding, self._bytes_in, self._bytes_out)
+        if self._event_stream and self._bytes_in:
+            logger.info(
+                'sse compressed (%s): %d -> %d bytes, saved %.0f%%',
+                self._encoding,
+                self._bytes_in,
+                self._bytes_out,
+                (1 - self._bytes_out / self._bytes_in) * 100,
+            )
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+# 默认的上下文预算（输入词元数），超出时在调用推理 LLM 前压缩历史消息
+CONTEXT_BUDGET_TOKENS = int(os.getenv('SYNPHORA_CONTEXT_BUDGET_TOKENS', '32000'))
+
+# 始终完整保留的最近对话轮数（一轮从一条用户消息开始）
+CONTEXT_KEEP_TURNS = int(os.getenv('SYNPHORA_CONTEXT_KEEP_TURNS', '2'))
+
+# 每条消息的格式开销（角色、分隔符等）
+_TOKENS_PER_MESSAGE = 4
+
+# 中日韩字符大多单独成为一个词元，其余字符按约 4 个字符一个词元估算
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+# 省略较早的工具结果时保留的字段，artifact 内容可通过 ID 重新获取
+_KEPT_TOOL_RESULT_FIELDS = ("evaluate_type", "artifact_id", "title", "status")
+
+_ELIDED_TEXT_CHARS = 80
+
+
+@lru_cache(maxsize=1)
+def _get_budget_table() -> dict[str, int]:
+    """
+    读取按模型配置的上下文预算
+
+    SYNPHORA_CONTEXT_BUDGETS 为 JSON 字符串，格式：{"<model>": 64000}
+    """
+    value = os.getenv('SYNPHORA_CONTEXT_BUDGETS', '').strip()
+    return (
+        {model: int(tokens) for model, tokens in json.loads(value).items()}
+        if value
+        else {}
+    )
+
+
+def get_context_budget(model: str | None) -> int:
+    return _get_budget_table().get(model, CONTEXT_BUDGET_TOKENS)
+
+
+def estimate_text_tokens(text: str) -> int:
+    cjk_chars = len(_CJK_PATTERN.findall(text))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def _message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in message.content
+    )
+
+
+def estimate_message_tokens(message: BaseMessage) -> int:
+    """在本地估算消息的词元数，不调用分词服务"""
+    tokens = _TOKENS_PER_MESSAGE + estimate_text_tokens(_message_text(message))
+    if isinstance(message, AIMessage):
+        for tool_call in message.tool_calls:
+            tokens += estimate_text_tokens(
+                tool_call["name"] + json.dumps(tool_call["args"], ensure_ascii=False)
+            )
+    return tokens
+
+
+def estimate_tokens(messages: list[BaseMessage]) -> int:
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+def _elide_tool_result(message: ToolMessage) -> ToolMessage:
+    """将较早的工具结果缩减为引用信息"""
+    text = _message_text(message)
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        result = None
+
+    if isinstance(result, dict):
+        content = json.dumps(
+            {key: result[key] for key in _KEPT_TOOL_RESULT_FIELDS if key in result},
+            ensure_ascii=False,
+        )
+    elif len(text) > _ELIDED_TEXT_CHARS:
+        content = text[:_ELIDED_TEXT_CHARS] + "…（已省略）"
+    else:
+        content = text
+    return message.model_copy(update={"content": content})
+
+
+def _split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """按用户消息切分对话轮次，同一轮内的工具调用与结果不会被拆开"""
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _tool_iterations(messages: list[BaseMessage]) -> list[tuple[int, int]]:
+    """推理与工具调用的每次循环：带工具调用的 AI 消息及紧随其后的工具结果，返回 [start, end)"""
+    iterations: list[tuple[int, int]] = []
+    for index, message in enumerate(messages):
+        if isinstance(message, AIMessage) and message.tool_calls:
+            iterations.append((index, index + 1))
+        elif (
+            isinstance(message, ToolMessage)
+            and iterations
+            and iterations[-1][1] == index
+        ):
+            iterations[-1] = (iterations[-1][0], index + 1)
+    return iterations
+
+
+def compact_messages(
+    messages: list[BaseMessage], budget: int
+) -> tuple[list[BaseMessage], int]:
+    """
+    按词元预算压缩发送给 LLM 的消息，返回 (压缩后的消息, 节省的词元数)
+
+    超出预算时先省略较早轮次中的工具结果，仍超出时从最早的轮次开始整轮丢弃，系统消息和
+    最近 CONTEXT_KEEP_TURNS 轮保持不变。单次运行中推理与工具调用的循环也会使当前轮次
+    超出预算，此时再压缩最近的轮次：除最后一次工具调用外，先省略工具结果，再从最早的
+    一次开始丢弃整次调用。只影响本次调用，不修改代理状态中的历史。
+    """
+    original_tokens = estimate_tokens(messages)
+    if original_tokens <= budget:
+        return messages, 0
+
+    system_count = 0
+    while system_count < len(messages) and isinstance(
+        messages[system_count], SystemMessage
+    ):
+        system_count += 1
+    system, turns = messages[:system_count], _split_turns(messages[system_count:])
+
+    keep_turns = max(CONTEXT_KEEP_TURNS, 1)
+    older, recent = turns[:-keep_turns], turns[-keep_turns:]
+    older = [
+        [
+            _elide_tool_result(message) if isinstance(message, ToolMessage) else message
+            for message in turn
+        ]
+        for turn in older
+    ]
+
+    tokens = estimate_tokens(system) + sum(
+        estimate_tokens(turn) for turn in older + recent
+    )
+    while older and tokens > budget:
+        tokens -= estimate_tokens(older.pop(0))
+
+    compacted = system + [message for turn in older + recent for message in turn]
+    if tokens > budget:
+        compacted, tokens = _compact_tool_iterations(compacted, budget)
+    return compacted, original_tokens - tokens
+
+
+def _compact_tool_iterations(
+    messages: list[BaseMessage], budget: int
+) -> tuple[list[BaseMessage], int]:
+    """压缩除最后一次以外的工具调用，返回 (压缩后的消息, 词元数)"""
+    iterations = _tool_iterations(messages)[:-1]
+    messages = list(messages)
+    for start, end in iterations:
+        for index in range(start + 1, end):
+            messages[index] = _elide_tool_result(messages[index])
+
+    tokens = estimate_tokens(messages)
+    dropped: set[int] = set()
+    for start, end in iterations:
+        if tokens <= budget:
+            break
+        tokens -= estimate_tokens(messages[start:end])
+        dropped.update(range(start, end))
+    return [m for i, m in enumerate(messages) if i not in dropped], tokens
@@ -0,0 +1,371 @@
+# 本地确定性的 OpenAI 兼容 LLM 服务，用于压测和延迟测试
+#
+# 启动：
+#   uv run fake-llm
+# 将代理指向该服务：
+#   LLM_BASE_URL=http://127.0.0.1:8100/v1 LLM_API_KEY=fake LLM_MODEL=fake uv run server
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, model_validator
+
+# 用于拼接回复内容的词元，保证输出可复现
+_FILLER_TOKENS = [
+    "这篇",
+    "文章",
+    "的",
+    "核心",
+    "观点",
+    "清晰",
+    "，",
+    "论证",
+    "结构",
+    "完整",
+    "，",
+    "适合",
+    "目标",
+    "读者",
+    "阅读",
+    "。",
+]
+
+# 前缀缓存最多记录的前缀数量，超过后清空
+_MAX_SEEN_PREFIXES = 100_000
+
+# 工具调用后的总结回复
+_TOOL_RESULT_REPLY = "结果已生成。"
+
+# 发起工具调用前的确认回复
+_TOOL_CALL_REPLY = "好的，我来处理。"
+
+# auto 模式下，根据用户消息中的关键词决定调用哪些工具
+# 代理的用户提示词中，真正的用户请求位于该标记之后
+_USER_REQUEST_MARKER = "用户请求："
+
+_TOOL_KEYWORDS = {
+    "write_comment": ["评价", "点评", "comment"],
+    "write_candidate_titles": ["标题", "title"],
+    "write_introduction": ["介绍", "简介", "introduction"],
+}
+
+
+class FakeLlmConfig(BaseModel):
+    # 首个词元的延迟（毫秒）
+    ttft_ms: float = 200
+    # 每秒生成的词元数，不大于 0 时词元之间没有延迟
+    tokens_per_second: float = 50
+    # 请求返回 500 错误的概率
+    error_rate: float = 0.0
+    # 普通回复的词元数
+    response_tokens: int = 64
+    # 工具调用策略：auto 按关键词匹配，none 不调用，或逗号分隔的工具名列表
+    tool_calls: str = "auto"
+    # 随机种子，相同请求与种子得到相同结果
+    seed: int = 0
+
+    @model_validator(mode="after")
+    def check_ranges(self) -> "FakeLlmConfig":
+        if not math.isfinite(self.ttft_ms) or self.ttft_ms < 0:
+            raise ValueError("ttft_ms must be a non-negative number")
+        if not math.isfinite(self.tokens_per_second):
+            raise ValueError("tokens_per_second must be a finite number")
+        if not 0 <= self.error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        if self.response_tokens < 0:
+            raise ValueError("response_tokens must be non-negative")
+        return self
+
+    @property
+    def token_interval(self) -> float:
+        """相邻词元之间的间隔（秒）"""
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return 1 / self.tokens_per_second
+
+    @classmethod
+    def from_env(cls) -> "FakeLlmConfig":
+        return cls(
+            ttft_ms=float(os.getenv('FAKE_LLM_TTFT_MS', '200')),
+            tokens_per_second=float(os.getenv('FAKE_LLM_TOKENS_PER_SECOND', '50')),
+            error_rate=float(os.getenv('FAKE_LLM_ERROR_RATE', '0')),
+            response_tokens=int(os.getenv('FAKE_LLM_RESPONSE_TOKENS', '64')),
+            tool_calls=os.getenv('FAKE_LLM_TOOL_CALLS', 'auto'),
+            seed=int(os.getenv('FAKE_LLM_SEED', '0')),
+        )
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+def _estimate_tokens(message: dict) -> int:
+    # 粗略估算：每 4 个字符计 1 个词元
+    return len(_message_text(message)) // 4
+
+
+def _pending_user_message(messages: list[dict]) -> str | None:
+    """返回最后一条用户消息；如果其后已有工具结果，则返回 None"""
+    for message in reversed(messages):
+        if message.get("role") == "tool":
+            return None
+        if message.get("role") == "user":
+            return _message_text(message)
+    return None
+
+
+def _tool_arguments(function: dict, user_message: str) -> dict:
+    """根据工具参数定义，从用户消息中提取参数值"""
+    properties = function.get("parameters", {}).get("properties", {})
+    arguments = {}
+    for name in properties:
+        if name.endswith("artifact_id"):
+            pattern = r"Artifact ID[:：]\s*([\w-]+)"
+        else:
+            pattern = rf"{re.escape(name)}[:：=]\s*([\w-]+)"
+        match = re.search(pattern, user_message)
+        arguments[name] = match.group(1) if match else "fake"
+    return arguments
+
+
+class FakeLlm:
+    """根据配置生成确定性的 chat completion 回复"""
+
+    def __init__(self, config: FakeLlmConfig):
+        self.config = config
+        # 错误注入按请求顺序抽样，重试的相同请求不会必然再次失败
+        self._error_rng = random.Random(config.seed)
+        # 已见过的提示词前缀哈希，用于模拟上游的前缀缓存
+        self._seen_prefixes: set[str] = set()
+
+    def _rng(self, body: dict) -> random.Random:
+        digest = hashlib.sha256(
+            json.dumps(body, sort_keys=True, ensure_ascii=False).encode()
+        ).digest()
+        return random.Random(int.from_bytes(digest[:8]) ^ self.config.seed)
+
+    def _decide_tool_calls(self, body: dict, rng: random.Random) -> list[dict]:
+        tools = body.get("tools") or []
+        user_message = _pending_user_message(body.get("messages", []))
+        if not tools or user_message is None or self.config.tool_calls == "none":
+            return []
+
+        functions = {
+            tool["function"]["name"]: tool["function"]
+            for tool in tools
+            if tool.get("type") == "function"
+        }
+        if self.config.tool_calls == "auto":
+            user_request = user_message.rpartition(_USER_REQUEST_MARKER)[2]
+            names = [
+                name
+                for name, keywords in _TOOL_KEYWORDS.items()
+                if name in functions
+                and any(keyword in user_request for keyword in keywords)
+            ]
+        else:
+            names = [
+                name.strip()
+                for name in self.config.tool_calls.split(",")
+                if name.strip() in functions
+            ]
+
+        return [
+            {
+                "id": f"call_{rng.getrandbits(48):012x}",
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "arguments": json.dumps(
+                        _tool_arguments(functions[name], user_message),
+                        ensure_ascii=False,
+                    ),
+                },
+            }
+            for name in names
+        ]
+
+    def _content_tokens(self, body: dict, rng: random.Random, tool_calls) -> list[str]:
+        if tool_calls:
+            return [_TOOL_CALL_REPLY]
+        messages = body.get("messages", [])
+        if messages and messages[-1].get("role") == "tool":
+            return [_TOOL_RESULT_REPLY]
+        offset = rng.randrange(len(_FILLER_TOKENS))
+        return [
+            _FILLER_TOKENS[(offset + i) % len(_FILLER_TOKENS)]
+            for i in range(self.config.response_tokens)
+        ]
+
+    def should_fail(self) -> bool:
+        return self._error_rng.random() < self.config.error_rate
+
+    def plan(self, body: dict) -> tuple[list[str], list[dict]]:
+        """返回 (内容词元列表, 工具调用列表)"""
+        rng = self._rng(body)
+        tool_calls = self._decide_tool_calls(body, rng)
+        return self._content_tokens(body, rng, tool_calls), tool_calls
+
+    def _cached_prompt_tokens(self, body: dict) -> int:
+        """模拟前缀缓存：与之前请求相同的工具定义及消息前缀计为命中缓存"""
+        if len(self._seen_prefixes) > _MAX_SEEN_PREFIXES:
+            self._seen_prefixes.clear()
+
+        hasher = hashlib.sha256(
+            json.dumps(body.get("tools") or [], sort_keys=True).encode()
+        )
+        prefix_tokens = cached_tokens = 0
+        hit = True
+        for message in body.get("messages", []):
+            hasher.update(
+                json.dumps(message, sort_keys=True, ensure_ascii=False).encode()
+            )
+            key = hasher.hexdigest()
+            prefix_tokens += _estimate_tokens(message)
+            hit = hit and key in self._seen_prefixes
+            if hit:
+                cached_tokens = prefix_tokens
+            self._seen_prefixes.add(key)
+        return cached_tokens
+
+    def usage(self, body: dict, completion_tokens: int) -> dict:
+        prompt_tokens = sum(
+            _estimate_tokens(message) for message in body.get("messages", [])
+        )
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {
+                "cached_tokens": self._cached_prompt_tokens(body)
+            },
+        }
+
+    async def stream(self, body: dict):
+        """按配置的首词元延迟和生成速度输出 SSE 分片"""
+        tokens, tool_calls = self.plan(body)
+        usage = self.usage(body, len(tokens))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "fake")
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        # 按绝对时间调度，避免 sleep 误差累积
+        loop = asyncio.get_running_loop()
+        start = loop.time() + self.config.ttft_ms / 1000
+        interval = self.config.token_interval
+
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(max(0.0, start + i * interval - loop.time()))
+            delta = {"content": token}
+            if i == 0:
+                delta["role"] = "assistant"
+            yield chunk(delta)
+
+        for index, tool_call in enumerate(tool_calls):
+            yield chunk({"tool_calls": [{"index": index, **tool_call}]})
+
+        yield chunk({}, "tool_calls" if tool_calls else "stop")
+
+        if (body.get("stream_options") or {}).get("include_usage"):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+
+        yield "data: [DONE]\n\n"
+
+    async def complete(self, body: dict) -> dict:
+        tokens, tool_calls = self.plan(body)
+        await asyncio.sleep(
+            self.config.ttft_ms / 1000
+            + max(0, len(tokens) - 1) * self.config.token_interval
+        )
+        message = {"role": "assistant", "content": "".join(tokens)}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }
+            ],
+            "usage": self.usage(body, len(tokens)),
+        }
+
+
+def create_app(config: FakeLlmConfig | None = None) -> FastAPI:
+    fake_llm = FakeLlm(config or FakeLlmConfig.from_env())
+    app = FastAPI(title="Synphora Fake LLM Server")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+
+        if fake_llm.should_fail():
+            return JSONResponse(
+                status_code=500,
+                content={
+                    "error": {"message": "fake llm error", "type": "server_error"}
+                },
+            )
+
+        if body.get("stream"):
+            return StreamingResponse(
+                fake_llm.stream(body), media_type="text/event-stream"
+            )
+        return await fake_llm.complete(body)
+
+    return app
+
+
+def main():
+    """Starts the fake LLM server."""
+    uvicorn.run(
+        create_app(),
+        host=os.getenv('FAKE_LLM_HOST', '127.0.0.1'),
+        port=int(os.getenv('FAKE_LLM_PORT', '8100')),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
+import fcntl
 import json
+import logging
 import os
 import shutil
 import tempfile
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
-from dotenv import load_dotenv
+from synphora.metrics import storage_operation_duration_seconds, timed
 from synphora.models import ArtifactData, ArtifactRole, ArtifactType
+from synphora.tracing import current_span, traced
+
+logger = logging.getLogger(__name__)
+
+
+def _record_artifact_span(artifact_id: str, content: str | None = None):
+    """在当前存储操作的 span 上记录 artifact ID 和内容字节数"""
+    span = current_span()
+    if span.is_recording:
+        span.set_attribute("artifact.id", artifact_id)
+        if content is not None:
+            span.set_attribute("artifact.bytes", len(content.encode('utf-8')))
 
-load_dotenv()
 
 class FileStorage:
     def __init__(self, storage_path: str = "tests/data/store"):
@@ -18,7 +32,10 @@ class FileStorage:
         self.storage_path = self._create_temp_copy()
         self.metadata_file = self.storage_path / "metadata.json"
         self._ensure_storage_directory()
-        self._metadata: dict[str, dict] = self._load_metadata()
+        # 已加载的元数据文件版本，serve 的多个 worker 共用存储目录时据此发现其他进程的写入
+        self._metadata_version: tuple[int, int] | None = None
+        self._metadata: dict[str, dict] = {}
+        self._refresh_metadata()
 
     def _create_temp_copy(self) -> Path:
         """创建原始存储目录的临时副本"""
@@ -27,11 +44,11 @@ class FileStorage:
 
         # 如果原始目录存在，且 NEXT_PUBLIC_SKIP_WELCOME 为 true，复制其内容
         skip_welcome = os.getenv('NEXT_PUBLIC_SKIP_WELCOME') == 'true'
-        print(f"📁 skip_welcome: {skip_welcome}")
+        logger.info("📁 skip_welcome: %s", skip_welcome)
         if skip_welcome and self.original_storage_path.exists():
             shutil.copytree(self.original_storage_path, temp_dir, dirs_exist_ok=True)
 
-        print(f"📁 Created temporary storage copy at: {temp_dir}")
+        logger.info("📁 Created temporary storage copy at: %s", temp_dir)
         return temp_dir
 
     def _ensure_storage_directory(self):
@@ -48,10 +65,35 @@ class FileStorage:
                 return {}
         return {}
 
+    def _current_metadata_version(self) -> tuple[int, int] | None:
+        try:
+            stat = self.metadata_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _refresh_metadata(self):
+        """元数据文件被其他进程替换过时重新加载"""
+        version = self._current_metadata_version()
+        if version != self._metadata_version:
+            self._metadata = self._load_metadata()
+            self._metadata_version = version
+
+    @contextmanager
+    def _metadata_lock(self):
+        """修改元数据期间持有目录锁，修改前先加载其他进程的写入"""
+        with open(self.storage_path / ".lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh_metadata()
+            yield
+
     def _save_metadata(self):
-        """保存元数据到metadata.json"""
-        with open(self.metadata_file, 'w', encoding='utf-8') as f:
+        """保存元数据到metadata.json，写入临时文件后替换，读取方不会读到写了一半的文件"""
+        temp_file = self.metadata_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(self._metadata, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, self.metadata_file)
+        self._metadata_version = self._current_metadata_version()
 
     def _get_data_file_path(self, artifact_id: str) -> Path:
         """获取数据文件路径"""
@@ -75,6 +117,8 @@ class FileStorage:
             artifact_id, title, content, artifact_type, role, description
         )
 
+    @timed(storage_operation_duration_seconds.labels("create"))
+    @traced("storage.create")
     def create_artifact_with_id(
         self,
         artifact_id: str,
@@ -85,6 +129,7 @@ class FileStorage:
         description: str | None = None,
     ) -> ArtifactData:
         """用户指定 ID 创建新的 artifact"""
+        _record_artifact_span(artifact_id, content)
         now = datetime.now().isoformat()
 
         # 保存内容到数据文件
@@ -103,13 +148,20 @@ class FileStorage:
             "updated_at": now,
         }
 
-        self._metadata[artifact_id] = metadata
-        self._save_metadata()
+        with self._metadata_lock():
+            self._metadata[artifact_id] = metadata
+            self._save_metadata()
 
         return ArtifactData(content=content, **metadata)
 
+    @timed(storage_operation_duration_seconds.labels("get"))
+    @traced("storage.get")
     def get_artifact(self, artifact_id: str) -> ArtifactData | None:
         """根据 ID 获取 artifact"""
+        self._refresh_metadata()
+        return self._read_artifact(artifact_id)
+
+    def _read_artifact(self, artifact_id: str) -> ArtifactData | None:
         metadata = self._metadata.get(artifact_id)
         if not metadata:
             return None
@@ -122,20 +174,27 @@ class FileStorage:
         try:
             with open(data_file, encoding='utf-8') as f:
                 content = f.read()
+            _record_artifact_span(artifact_id, content)
 
             return ArtifactData(content=content, **metadata)
         except OSError:
             return None
 
+    @timed(storage_operation_duration_seconds.labels("list"))
+    @traced("storage.list")
     def list_artifacts(self) -> list[ArtifactData]:
         """获取所有 artifacts"""
+        self._refresh_metadata()
         artifacts = []
         for artifact_id in self._metadata:
-            artifact = self.get_artifact(artifact_id)
+            artifact = self._read_artifact(artifact_id)
             if artifact:
                 artifacts.append(artifact)
+        current_span().set_attribute("artifact.count", len(artifacts))
         return artifacts
 
+    @timed(storage_operation_duration_seconds.labels("update"))
+    @traced("storage.update")
     def update_artifact(
         self,
         artifact_id: str,
@@ -144,60 +203,69 @@ class FileStorage:
         description: str | None = None,
     ) -> ArtifactData | None:
         """更新 artifact"""
-        metadata = self._metadata.get(artifact_id)
-        if not metadata:
-            return None
-
-        now = datetime.now().isoformat()
-
-        # 更新元数据
-        if title is not None:
-            metadata['title'] = title
-        if description is not None:
-            metadata['description'] = description
-        metadata['updated_at'] = now
-
-        # 更新内容文件
-        if content is not None:
-            data_file = self._get_data_file_path(artifact_id)
-            with open(data_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-
-        self._metadata[artifact_id] = metadata
-        self._save_metadata()
-
-        return self.get_artifact(artifact_id)
-
+        _record_artifact_span(artifact_id, content)
+        with self._metadata_lock():
+            metadata = self._metadata.get(artifact_id)
+            if not metadata:
+                return None
+
+            now = datetime.now().isoformat()
+
+            # 更新元数据
+            if title is not None:
+                metadata['title'] = title
+            if description is not None:
+                metadata['description'] = description
+            metadata['updated_at'] = now
+
+            # 更新内容文件
+            if content is not None:
+                data_file = self._get_data_file_path(artifact_id)
+                with open(data_file, 'w', encoding='utf-8') as f:
+                    f.write(content)
+
+            self._metadata[artifact_id] = metadata
+            self._save_metadata()
+
+        return self._read_artifact(artifact_id)
+
+    @timed(storage_operation_duration_seconds.labels("delete"))
+    @traced("storage.delete")
     def delete_artifact(self, artifact_id: str) -> bool:
         """删除 artifact"""
-        if artifact_id not in self._metadata:
-            return False
+        _record_artifact_span(artifact_id)
+        with self._metadata_lock():
+            if artifact_id not in self._metadata:
+                return False
 
-        # 删除数据文件
-        data_file = self._get_data_file_path(artifact_id)
-        if data_file.exists():
-            data_file.unlink()
+            # 删除数据文件
+            data_file = self._get_data_file_path(artifact_id)
+            if data_file.exists():
+                data_file.unlink()
 
-        # 删除元数据
-        del self._metadata[artifact_id]
-        self._save_metadata()
+            # 删除元数据
+            del self._metadata[artifact_id]
+            self._save_metadata()
 
         return True
 
+    @timed(storage_operation_duration_seconds.labels("clear"))
+    @traced("storage.clear")
     def clear_all(self):
         """清空所有 artifacts（主要用于测试）"""
-        # 删除所有数据文件
-        for artifact_id in self._metadata:
-            data_file = self._get_data_file_path(artifact_id)
-            if data_file.exists():
-                data_file.unlink()
+        with self._metadata_lock():
+            # 删除所有数据文件
+            for artifact_id in self._metadata:
+                data_file = self._get_data_file_path(artifact_id)
+                if data_file.exists():
+                    data_file.unlink()
 
-        # 清空元数据
-        self._metadata.clear()
-        self._save_metadata()
+            # 清空元数据
+            self._metadata.clear()
+            self._save_metadata()
 
     def cleanup_temp_storage(self):
         """清理临时存储目录（可选）"""
         if self.storage_path.exists() and str(self.storage_path).startswith("/tmp"):
             shutil.rmtree(self.storage_path)
-            print(f"🗑️ Cleaned up temporary storage: {self.storage_path}")
+            logger.info("🗑️ Cleaned up temporary storage: %s", self.storage_path)
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import uuid
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import suppress
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# 后台任务的并发数
+JOB_WORKERS = int(os.getenv('SYNPHORA_JOB_WORKERS', '2'))
+
+# 等待执行的任务上限，队列满时拒绝新任务
+JOB_QUEUE_SIZE = int(os.getenv('SYNPHORA_JOB_QUEUE_SIZE', '100'))
+
+# 任务持久化文件路径；配置后未完成的任务在进程重启后重新执行
+JOB_STORE_PATH = os.getenv('SYNPHORA_JOB_STORE_PATH')
+
+# 保留的已结束任务数量，超过后丢弃最早的
+_MAX_FINISHED_JOBS = 1000
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    @property
+    def finished(self) -> bool:
+        return self in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    params: dict
+    status: JobStatus = JobStatus.PENDING
+    # 0 到 1 之间的进度
+    progress: float = 0.0
+    message: str | None = None
+    result: dict | None = None
+    error: str | None = None
+    # 客户端提供的幂等键，重试提交时返回已有任务而不是重复执行
+    idempotency_key: str | None = None
+    created_at: str
+    updated_at: str
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class JobContext:
+    """传给任务处理函数，用于汇报进度"""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self._manager = manager
+        self.job = job
+
+    def report(self, progress: float, message: str | None = None):
+        self.job.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.job.message = message
+        self._manager._update(self.job, persist=False)
+
+
+JobHandler = Callable[[dict, JobContext], Awaitable[dict]]
+
+
+class JobManager:
+    """
+    进程内的后台任务队列
+
+    长时间运行的操作提交为任务后立即返回任务 ID，由固定数量的 worker 依次执行，
+    客户端可以轮询任务状态或订阅进度事件流。
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE,
+        store_path: str | None = JOB_STORE_PATH,
+    ):
+        self._workers = workers
+        self._queue_size = queue_size
+        self._store_path = Path(store_path) if store_path else None
+        self._handlers: dict[str, JobHandler] = {}
+        self._jobs: dict[str, Job] = {}
+        self._subscribers: dict[str, set[asyncio.Queue[Job]]] = {}
+        self._queue: asyncio.Queue[str] | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    async def start(self):
+        """启动 worker；启用持久化时恢复未完成的任务"""
+        # 恢复的任务不受队列上限限制，上限只在提交新任务时检查
+        self._queue = asyncio.Queue()
+        for job in self._load():
+            self._jobs[job.id] = job
+            if not job.status.finished:
+                # 重启前正在执行的任务从头开始
+                job.status = JobStatus.PENDING
+                job.progress = 0.0
+                self._queue.put_nowait(job.id)
+        if self._queue.qsize():
+            logger.info('🔁 Restored %d unfinished jobs', self._queue.qsize())
+
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self._workers)
+        ]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        for task in self._worker_tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._worker_tasks = []
+
+    def submit(
+        self, kind: str, params: dict, idempotency_key: str | None = None
+    ) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f'Unsupported job kind: {kind}')
+        if idempotency_key:
+            for job in self._jobs.values():
+                if job.idempotency_key == idempotency_key and job.kind == kind:
+                    return job
+        if self._queue is None or self._queue.qsize() >= self._queue_size:
+            raise JobQueueFullError('Job queue is full')
+
+        now = datetime.now().isoformat()
+        job = Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            params=params,
+            idempotency_key=idempotency_key,
+            created_at=now,
+            updated_at=now,
+        )
+        self._jobs[job.id] = job
+        self._save()
+        self._queue.put_nowait(job.id)
+        logger.info('job submitted, id: %s, kind: %s', job.id, kind)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> Job | None:
+        """等待任务结束并返回最终状态，任务不存在时返回 None"""
+        async for job in self.subscribe(job_id):
+            if job.status.finished:
+                return job
+        return None
+
+    async def subscribe(self, job_id: str) -> AsyncGenerator[Job]:
+        """
+        依次产出任务的当前状态和后续每次更新，任务结束后停止
+
+        任务不存在（或已结束并被清理）时不产出任何状态。
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        queue: asyncio.Queue[Job] = asyncio.Queue()
+        subscribers = self._subscribers.setdefault(job_id, set())
+        subscribers.add(queue)
+        try:
+            current = job.model_copy()
+            yield current
+            while not current.status.finished:
+                current = await queue.get()
+                yield current
+        finally:
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def _update(self, job: Job, persist: bool = True):
+        job.updated_at = datetime.now().isoformat()
+        if persist:
+            self._save()
+        for queue in self._subscribers.get(job.id, ()):
+            queue.put_nowait(job.model_copy())
+
+    async def _worker(self):
+        while True:
+            job = self._jobs[await self._queue.get()]
+            job.status = JobStatus.RUNNING
+            self._update(job)
+            try:
+                handler = self._handlers[job.kind]
+                job.result = await handler(job.params, JobContext(self, job))
+                job.status = JobStatus.SUCCEEDED
+                job.progress = 1.0
+            except asyncio.CancelledError:
+                # 服务关闭：保留为运行中，启用持久化时下次启动重新执行
+                self._save()
+                raise
+            except Exception as e:
+                logger.exception(
+                    '❌ job failed, id: %s, kind: %s, error: %s', job.id, job.kind, e
+                )
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+            self._prune()
+            self._update(job)
+
+    def _prune(self):
+        finished = [job.id for job in self._jobs.values() if job.status.finished]
+        for job_id in finished[: max(len(finished) - _MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def _load(self) -> list[Job]:
+        if not self._store_path or not self._store_path.exists():
+            return []
+        try:
+            with open(self._store_path, encoding='utf-8') as f:
+                return [Job(**data) for data in json.load(f)]
+        except (OSError, json.JSONDecodeError):
+            return []
+
+    def _save(self):
+        """原子地写入任务文件，避免进程中断时留下不完整的文件"""
+        if not self._store_path:
+            return
+        self._store_path.parent.mkdir(parents=True, exist_ok=True)
+        data = [job.model_dump(mode="json") for job in self._jobs.values()]
+        with tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', dir=self._store_path.parent, delete=False
+        ) as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(f.name, self._store_path)
+
+
+job_manager = JobManager()
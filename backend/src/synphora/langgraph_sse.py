@@ -4,6 +4,10 @@ from synphora.sse import SseEvent
 
 
 def write_sse_event(event: SseEvent):
-    writer = get_stream_writer()
+    """在代理图中运行时发送SSE事件；在图外调用（如批量评价）时忽略"""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
     if writer:
         writer({"channel": "sse", "type": event.type.value, "event": event})
@@ -1,56 +1,233 @@
+import asyncio
+import logging
 import os
+import threading
+from enum import Enum
 from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langchain_core.tools import Tool
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, SecretStr
 
+from synphora.models import EvaluateType
+
+# langchain_openai 连带导入 openai，只在首次创建客户端时导入
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+    from langchain_core.tools import Tool
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
 # 加载 .env 文件
 load_dotenv()
 
 
+# 默认 profile 的名称，可在 fallback 链和任务映射中引用
+DEFAULT_PROFILE = "default"
+
+
+class LlmTask(str, Enum):
+    """需要调用 LLM 的任务，每个任务可以配置独立的模型 profile"""
+
+    REASON = "reason"
+    EVALUATE_COMMENT = "evaluate_comment"
+    EVALUATE_TITLE = "evaluate_title"
+    EVALUATE_INTRODUCTION = "evaluate_introduction"
+    SAMPLE = "sample"
+
+    @classmethod
+    def evaluate(cls, evaluate_type: EvaluateType) -> "LlmTask":
+        return cls(f"evaluate_{evaluate_type.value}")
+
+    @property
+    def evaluate_type(self) -> EvaluateType | None:
+        """评价任务对应的评价类型，其他任务返回 None"""
+        prefix, _, value = self.value.partition("_")
+        return EvaluateType(value) if prefix == "evaluate" else None
+
+
 class LlmConfig(BaseModel):
     base_url: str
     api_key: SecretStr
     model: str
+    max_tokens: int | None = None
+    temperature: float | None = None
+    # 单次请求超时（秒），超时后按 fallbacks 依次尝试
+    timeout: float | None = None
+    max_retries: int | None = None
+    # 主模型出错或超时时依次尝试的 profile 名称
+    fallbacks: list[str] = []
+
+
+def _getenv_float(name: str) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def _getenv_int(name: str) -> int | None:
+    value = os.getenv(name)
+    return int(value) if value else None
 
 
 @lru_cache(maxsize=32)
-def _get_llm_config() -> LlmConfig:
+def _get_llm_config(profile: str | None = None) -> LlmConfig:
+    """
+    读取模型 profile 配置
+
+    默认 profile 使用 LLM_BASE_URL / LLM_API_KEY / LLM_MODEL 等变量；
+    命名 profile 使用 LLM_PROFILE_<NAME>_* 变量，未配置的字段继承默认 profile。
+    """
+    if profile == DEFAULT_PROFILE:
+        profile = None
+    prefix = f"LLM_PROFILE_{profile.upper()}_" if profile else "LLM_"
+    default = _get_llm_config() if profile else None
+
+    def get(field: str, parse=os.getenv):
+        value = parse(f"{prefix}{field}")
+        if value is None and default is not None:
+            return getattr(default, field.lower())
+        return value
+
+    fallbacks = os.getenv(f"{prefix}FALLBACKS", "")
     return LlmConfig(
-        base_url=os.getenv("LLM_BASE_URL"),
-        api_key=os.getenv("LLM_API_KEY"),
-        model=os.getenv("LLM_MODEL"),
+        base_url=get("BASE_URL"),
+        api_key=(
+            os.getenv(f"{prefix}API_KEY")
+            or (default.api_key.get_secret_value() if default else None)
+        ),
+        model=get("MODEL"),
+        max_tokens=get("MAX_TOKENS", _getenv_int),
+        temperature=get("TEMPERATURE", _getenv_float),
+        timeout=get("TIMEOUT", _getenv_float),
+        max_retries=get("MAX_RETRIES", _getenv_int),
+        fallbacks=[name.strip() for name in fallbacks.split(",") if name.strip()],
     )
 
 
-def create_llm_client() -> ChatOpenAI:
-    llm_config = _get_llm_config()
+def _get_task_profile(task: LlmTask | None) -> str | None:
+    """任务对应的 profile 名称，由 LLM_TASK_<TASK> 配置，未配置时使用默认 profile"""
+    if task is None:
+        return None
+    return os.getenv(f"LLM_TASK_{task.value.upper()}") or None
+
 
+def get_llm_model(task: LlmTask | None = None) -> str:
+    """任务主模型的名称"""
+    return _get_llm_config(_get_task_profile(task)).model
+
+
+def _create_chat_model(llm_config: LlmConfig) -> "ChatOpenAI":
+    from langchain_openai import ChatOpenAI
+
+    options = {
+        "max_tokens": llm_config.max_tokens,
+        "temperature": llm_config.temperature,
+        "timeout": llm_config.timeout,
+        "max_retries": llm_config.max_retries,
+    }
     return ChatOpenAI(
         base_url=llm_config.base_url,
         api_key=llm_config.api_key.get_secret_value(),
         model=llm_config.model,
+        # 流式调用时也返回用量（包括命中前缀缓存的词元数）
+        stream_usage=True,
+        # 仅覆盖显式配置的参数，其余使用 ChatOpenAI 默认值
+        **{key: value for key, value in options.items() if value is not None},
     )
 
 
-def create_llm_with_tools(tools: list[Tool]) -> ChatOpenAI:
-    """创建绑定工具的LLM客户端"""
-    llm_config = _get_llm_config()
+def _create_chat_models(task: LlmTask | None) -> list["ChatOpenAI"]:
+    """任务的主模型及其 fallback 链"""
+    llm_config = _get_llm_config(_get_task_profile(task))
+    return [_create_chat_model(llm_config)] + [
+        _create_chat_model(_get_llm_config(profile)) for profile in llm_config.fallbacks
+    ]
 
-    llm = ChatOpenAI(
-        base_url=llm_config.base_url,
-        api_key=llm_config.api_key.get_secret_value(),
-        model=llm_config.model,
-    )
 
-    return llm.bind_tools(tools) if tools else llm
+def create_llm_client(task: LlmTask | None = None) -> "BaseChatModel | Runnable":
+    """创建任务对应的 LLM 客户端，配置了 fallback 时返回带回退链的 Runnable"""
+    primary, *fallbacks = _create_chat_models(task)
+    return primary.with_fallbacks(fallbacks) if fallbacks else primary
+
+
+def create_llm_with_tools(
+    tools: list["Tool"], task: LlmTask | None = None
+) -> "BaseChatModel | Runnable":
+    """创建绑定工具的LLM客户端"""
+    primary, *fallbacks = [
+        llm.bind_tools(tools) if tools else llm for llm in _create_chat_models(task)
+    ]
+    return primary.with_fallbacks(fallbacks) if fallbacks else primary
+
+
+# 共享的 LLM 客户端，按 (任务, 绑定的工具名) 缓存。
+# 客户端不保存会话状态，可以在并发运行之间安全复用，避免每次调用重新构建和绑定工具。
+_shared_clients: dict[tuple, "BaseChatModel | Runnable"] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_llm_client(
+    task: LlmTask | None = None, tools: list["Tool"] | None = None
+) -> "BaseChatModel | Runnable":
+    """获取任务对应的共享 LLM 客户端，首次调用时创建"""
+    key = (task, tuple(tool.name for tool in tools or []))
+    client = _shared_clients.get(key)
+    if client is None:
+        with _shared_clients_lock:
+            client = _shared_clients.get(key)
+            if client is None:
+                client = (
+                    create_llm_with_tools(tools, task)
+                    if tools
+                    else create_llm_client(task)
+                )
+                _shared_clients[key] = client
+    return client
+
+
+def clear_llm_cache():
+    """清空配置和共享客户端缓存，配置变化后调用（主要用于测试）"""
+    _get_llm_config.cache_clear()
+    with _shared_clients_lock:
+        _shared_clients.clear()
+
+
+async def warm_up_llm_connections(timeout: float = 5.0):
+    """预先建立到各任务上游服务的连接，失败时仅打印日志"""
+    warmed = set()
+    for task in LlmTask:
+        try:
+            llms = _create_chat_models(task)
+        except Exception as e:
+            logger.warning(
+                'llm connection warm-up skipped, task: %s, error: %s', task.value, e
+            )
+            continue
+
+        for llm in llms:
+            key = (llm.openai_api_base, llm.request_timeout)
+            if key in warmed:
+                continue
+            warmed.add(key)
+            try:
+                await asyncio.wait_for(llm.root_async_client.models.list(), timeout)
+                logger.info(
+                    'llm connection warmed up, base_url: %s', llm.openai_api_base
+                )
+            except Exception as e:
+                logger.warning(
+                    'llm connection warm-up failed, base_url: %s, error: %s',
+                    llm.openai_api_base,
+                    e,
+                )
 
 
 # 测试
 if __name__ == "__main__":
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
     llm_client = create_llm_client()
 
     # 简单对话
@@ -0,0 +1,549 @@
+# 端到端压测：并发打开多个 /agent SSE 流，同时产生后台 artifact 增删查流量
+#
+# 默认在本地启动 fake LLM 服务和代理服务（各自独立的进程），压测客户端只负责发请求
+# 和解析事件流；也可以用 --url 指向已经启动的服务。
+#
+# 用法：
+#   uv run load-test --stages 10:30,50:60:20 --crud-rate 5
+#   uv run load-test --users 20 --duration 30 --slo first_token.p95=1.5 --slo error_rate=0.01
+#
+# 阶段格式为 用户数:持续秒数[:爬升秒数]，爬升期间线性增加用户。每个阶段分别报告
+# 首个事件延迟、首个内容分片延迟、分片间隔、运行耗时和错误率的 p50/p95/p99，
+# 任一阶段违反 --slo 时以非零状态退出。
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from pydantic import BaseModel
+
+from synphora.fake_llm import FakeLlmConfig
+from synphora.sse import EventType
+
+# 默认的用户请求，fake LLM 按关键词决定调用候选标题工具
+DEFAULT_MESSAGE = "我刚写完这篇文章，准备发到公众号上，麻烦帮我想几个吸引人的候选标题"
+
+# 本地启动时上传的原文
+SAMPLE_ARTICLE = next(
+    (Path(__file__).parent.parent.parent / "tests/data/store").glob("*.txt"), None
+)
+
+# 计入分片间隔的内容事件
+CONTENT_EVENTS = {
+    EventType.TEXT_MESSAGE.value,
+    EventType.ARTIFACT_CONTENT_CHUNK.value,
+}
+
+# 报告与 SLO 中可用的延迟指标
+LATENCY_METRICS = ["first_event", "first_token", "chunk_gap", "duration", "crud"]
+
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99}
+
+# 本地服务启动的最长等待时间（秒）
+STARTUP_TIMEOUT = 60
+
+
+class LoadStage(BaseModel):
+    users: int
+    duration: float
+    # 阶段开始后在该时间内线性增加到目标用户数
+    ramp_up: float = 0
+
+
+class SloThreshold(BaseModel):
+    # first_event / first_token / chunk_gap / duration / crud，或 error_rate
+    metric: str
+    # p50 / p95 / p99，error_rate 时为空
+    percentile: str | None = None
+    limit: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.metric}.{self.percentile}" if self.percentile else self.metric
+
+
+def parse_stages(value: str) -> list[LoadStage]:
+    """解析 用户数:持续秒数[:爬升秒数]，多个阶段以逗号分隔"""
+    stages = []
+    for item in value.split(","):
+        parts = [float(part) for part in item.strip().split(":")]
+        if len(parts) not in (2, 3):
+            raise argparse.ArgumentTypeError(f"invalid stage: {item}")
+        stages.append(
+            LoadStage(
+                users=int(parts[0]),
+                duration=parts[1],
+                ramp_up=parts[2] if len(parts) == 3 else 0,
+            )
+        )
+    return stages
+
+
+def parse_slo(value: str) -> list[SloThreshold]:
+    """解析 指标.分位=上限，如 first_token.p95=1.5 或 error_rate=0.01，多个以逗号分隔"""
+    thresholds = []
+    for item in value.split(","):
+        key, sep, limit = item.strip().partition("=")
+        metric, _, percentile = key.partition(".")
+        valid = (
+            metric == "error_rate"
+            and not percentile
+            or metric in LATENCY_METRICS
+            and percentile in PERCENTILES
+        )
+        if not sep or not valid:
+            raise argparse.ArgumentTypeError(f"invalid slo: {item}")
+        thresholds.append(
+            SloThreshold(
+                metric=metric, percentile=percentile or None, limit=float(limit)
+            )
+        )
+    return thresholds
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """线性插值的分位数，没有样本时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class StageStats:
+    """一个阶段内开始的会话与 CRUD 请求的统计，延迟单位为秒"""
+
+    def __init__(self, stage: LoadStage):
+        self.stage = stage
+        self.latencies: dict[str, list[float]] = {
+            metric: [] for metric in LATENCY_METRICS
+        }
+        self.runs = 0
+        self.run_errors = 0
+        self.crud_requests = 0
+        self.crud_errors = 0
+        self.errors: dict[str, int] = {}
+
+    def record_error(self, reason: str):
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    @property
+    def error_rate(self) -> float:
+        total = self.runs + self.crud_requests
+        return (self.run_errors + self.crud_errors) / total if total else 0.0
+
+    def value(self, threshold: SloThreshold) -> float | None:
+        if threshold.metric == "error_rate":
+            return self.error_rate
+        return percentile(
+            self.latencies[threshold.metric], PERCENTILES[threshold.percentile]
+        )
+
+    def summary(self) -> dict:
+        return {
+            "users": self.stage.users,
+            "duration": self.stage.duration,
+            "runs": self.runs,
+            "run_errors": self.run_errors,
+            "crud_requests": self.crud_requests,
+            "crud_errors": self.crud_errors,
+            "error_rate": self.error_rate,
+            "errors": self.errors,
+            "latencies": {
+                metric: {
+                    "count": len(values),
+                    **{name: percentile(values, q) for name, q in PERCENTILES.items()},
+                }
+                for metric, values in self.latencies.items()
+            },
+        }
+
+
+def format_summary(index: int, summary: dict) -> str:
+    lines = [
+        f"stage {index + 1}: {summary['users']} users, {summary['duration']:g}s, "
+        f"{summary['runs']} runs ({summary['run_errors']} failed), "
+        f"{summary['crud_requests']} crud ({summary['crud_errors']} failed), "
+        f"error rate {summary['error_rate']:.2%}"
+    ]
+    for metric, stats in summary["latencies"].items():
+        if not stats["count"]:
+            continue
+        values = "  ".join(
+            f"{name} {stats[name] * 1000:>9.1f}ms" for name in PERCENTILES
+        )
+        lines.append(f"  {metric:<12} n={stats['count']:<7} {values}")
+    for reason, count in summary["errors"].items():
+        lines.append(f"  error {reason}: {count}")
+    return "\n".join(lines)
+
+
+def check_slos(
+    summaries: list[dict], stats: list[StageStats], thresholds: list[SloThreshold]
+) -> list[str]:
+    """返回违反 SLO 的描述，没有样本的指标不检查"""
+    violations = []
+    for index, stage_stats in enumerate(stats):
+        for threshold in thresholds:
+            value = stage_stats.value(threshold)
+            if value is not None and value > threshold.limit:
+                violations.append(
+                    f"stage {index + 1} ({summaries[index]['users']} users): "
+                    f"{threshold.name} {value:.4g} > {threshold.limit:g}"
+                )
+    return violations
+
+
+async def run_session(client: httpx.AsyncClient, message: str, stats: StageStats):
+    """发起一次 /agent 运行并读完事件流"""
+    stats.runs += 1
+    start_time = time.perf_counter()
+    first_event = first_token = last_chunk = None
+    finished = False
+    try:
+        async with client.stream(
+            "POST", "/agent", json={"message": message}
+        ) as response:
+            if response.status_code != 200:
+                stats.run_errors += 1
+                stats.record_error(f"agent status {response.status_code}")
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                now = time.perf_counter()
+                event_type = json.loads(line.removeprefix("data: "))["type"]
+                if first_event is None:
+                    first_event = now
+                    stats.latencies["first_event"].append(now - start_time)
+                if event_type in CONTENT_EVENTS:
+                    if first_token is None:
+                        first_token = now
+                        stats.latencies["first_token"].append(now - start_time)
+                    else:
+                        stats.latencies["chunk_gap"].append(now - last_chunk)
+                    last_chunk = now
+                elif event_type == EventType.RUN_FINISHED.value:
+                    finished = True
+    except httpx.HTTPError as e:
+        stats.run_errors += 1
+        stats.record_error(type(e).__name__)
+        return
+
+    if finished:
+        stats.latencies["duration"].append(time.perf_counter() - start_time)
+    else:
+        stats.run_errors += 1
+        stats.record_error("stream ended before RUN_FINISHED")
+
+
+async def crud_request(
+    client: httpx.AsyncClient, stats: StageStats, method: str, url: str, **kwargs
+) -> httpx.Response | None:
+    stats.crud_requests += 1
+    start_time = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        stats.crud_errors += 1
+        stats.record_error(type(e).__name__)
+        return None
+    stats.latencies["crud"].append(time.perf_counter() - start_time)
+    if response.status_code != 200:
+        stats.crud_errors += 1
+        stats.record_error(f"crud {method} status {response.status_code}")
+        return None
+    return response
+
+
+class LoadRunner:
+    """按阶段调度虚拟用户和后台 CRUD 流量"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        stages: list[LoadStage],
+        message: str = DEFAULT_MESSAGE,
+        crud_rate: float = 0,
+    ):
+        self.client = client
+        self.stages = stages
+        self.message = message
+        self.crud_rate = crud_rate
+        self.stats = [StageStats(stage) for stage in stages]
+        self._current = self.stats[0]
+        # 每个虚拟用户的停止标记
+        self._users: list[asyncio.Event] = []
+        self._tasks: list[asyncio.Task] = []
+
+    async def _user(self, stop: asyncio.Event):
+        # 会话计入其开始时所在的阶段
+        while not stop.is_set():
+            await run_session(self.client, self.message, self._current)
+
+    async def _crud(self, stop: asyncio.Event):
+        """按固定速率循环：创建、读取、列出、删除一个 artifact"""
+        content = SAMPLE_ARTICLE.read_text(encoding="utf-8") if SAMPLE_ARTICLE else ""
+        interval = 1 / self.crud_rate
+        next_time = time.perf_counter()
+
+        async def request(stats: StageStats, method: str, url: str, **kwargs):
+            nonlocal next_time
+            # 按绝对时间调度，请求变慢时不累积误差
+            next_time += interval
+            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+            return await crud_request(self.client, stats, method, url, **kwargs)
+
+        while not stop.is_set():
+            stats = self._current
+            response = await request(
+                stats,
+                "POST",
+                "/artifacts",
+                json={"title": "压测文章.md", "content": content},
+            )
+            await request(stats, "GET", "/artifacts")
+            if response is not None:
+                artifact_url = f"/artifacts/{response.json()['id']}"
+                await request(stats, "GET", artifact_url)
+                await request(stats, "DELETE", artifact_url)
+
+    def _scale(self, users: int):
+        while len(self._users) < users:
+            stop = asyncio.Event()
+            self._users.append(stop)
+            self._tasks.append(asyncio.create_task(self._user(stop)))
+        while len(self._users) > users:
+            self._users.pop().set()
+
+    async def run(self) -> list[StageStats]:
+        crud_stop = asyncio.Event()
+        if self.crud_rate > 0:
+            self._tasks.append(asyncio.create_task(self._crud(crud_stop)))
+
+        for stage, stats in zip(self.stages, self.stats, strict=True):
+            self._current = stats
+            stage_start = time.perf_counter()
+            start_users = len(self._users)
+            print(f"stage: {stage.users} users for {stage.duration:g}s", flush=True)
+            while (elapsed := time.perf_counter() - stage_start) < stage.duration:
+                if stage.ramp_up > 0 and elapsed < stage.ramp_up:
+                    progress = elapsed / stage.ramp_up
+                    users = round(start_users + (stage.users - start_users) * progress)
+                else:
+                    users = stage.users
+                self._scale(users)
+                await asyncio.sleep(min(0.1, stage.duration - elapsed))
+
+        # 停止产生新会话，等待进行中的会话结束
+        self._scale(0)
+        crud_stop.set()
+        await asyncio.gather(*self._tasks)
+        return self.stats
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalStack:
+    """在独立进程中启动 fake LLM 服务和代理服务，压测客户端不与服务争抢 CPU"""
+
+    def __init__(self, fake_llm_config: FakeLlmConfig):
+        self.fake_llm_config = fake_llm_config
+        self.llm_port = _free_port()
+        self.server_port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.server_port}"
+        self._processes: list[subprocess.Popen] = []
+
+    def _spawn(self, args: list[str], env: dict[str, str]):
+        self._processes.append(
+            subprocess.Popen([sys.executable, *args], env={**os.environ, **env})
+        )
+
+    async def _wait_ready(self, url: str):
+        deadline = time.perf_counter() + STARTUP_TIMEOUT
+        async with httpx.AsyncClient() as client:
+            while time.perf_counter() < deadline:
+                if any(process.poll() is not None for process in self._processes):
+                    raise RuntimeError("local server exited during start-up")
+                try:
+                    # 代理服务预热完成前健康检查返回 503
+                    if (await client.get(url)).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        raise RuntimeError(f"timed out waiting for {url}")
+
+    async def start(self):
+        config = self.fake_llm_config
+        self._spawn(
+            [
+                "-m",
+                "uvicorn",
+                "synphora.fake_llm:create_app",
+                "--factory",
+                "--port",
+                str(self.llm_port),
+                "--log-level",
+                "warning",
+            ],
+            {
+                "FAKE_LLM_TTFT_MS": str(config.ttft_ms),
+                "FAKE_LLM_TOKENS_PER_SECOND": str(config.tokens_per_second),
+                "FAKE_LLM_ERROR_RATE": str(config.error_rate),
+                "FAKE_LLM_RESPONSE_TOKENS": str(config.response_tokens),
+                "FAKE_LLM_TOOL_CALLS": config.tool_calls,
+                "FAKE_LLM_SEED": str(config.seed),
+            },
+        )
+        await self._wait_ready(f"http://127.0.0.1:{self.llm_port}/v1/models")
+
+        self._spawn(
+            [
+                "-m",
+                "uvicorn",
+                "synphora.server:app",
+                "--port",
+                str(self.server_port),
+                "--log-level",
+                "warning",
+            ],
+            {
+                "LLM_BASE_URL": f"http://127.0.0.1:{self.llm_port}/v1",
+                "LLM_API_KEY": "fake",
+                "LLM_MODEL": "fake",
+                "SYNPHORA_LOG_LEVEL": os.getenv("SYNPHORA_LOG_LEVEL", "WARNING"),
+            },
+        )
+        await self._wait_ready(f"{self.base_url}/health")
+
+    def stop(self):
+        for process in reversed(self._processes):
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_load_test(args: argparse.Namespace) -> list[StageStats]:
+    stack = None
+    base_url = args.url
+    if base_url is None:
+        stack = LocalStack(
+            FakeLlmConfig(
+                ttft_ms=args.ttft_ms,
+                tokens_per_second=args.tokens_per_second,
+                error_rate=args.llm_error_rate,
+            )
+        )
+        await stack.start()
+        base_url = stack.base_url
+
+    try:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(
+            base_url=base_url, limits=limits, timeout=httpx.Timeout(args.timeout)
+        ) as client:
+            # 代理需要至少一篇原文
+            if stack is not None and SAMPLE_ARTICLE is not None:
+                await client.post(
+                    "/artifacts",
+                    json={
+                        "title": "压测文章.md",
+                        "content": SAMPLE_ARTICLE.read_text(encoding="utf-8"),
+                    },
+                )
+            runner = LoadRunner(client, args.stages, args.message, args.crud_rate)
+            return await runner.run()
+    finally:
+        if stack is not None:
+            stack.stop()
+
+
+def main():
+    """Runs the end-to-end load test."""
+    parser = argparse.ArgumentParser(description="并发 /agent SSE 流的端到端压测")
+    parser.add_argument(
+        "--url", help="已启动的代理服务地址，不指定时在本地启动服务和 fake LLM"
+    )
+    parser.add_argument(
+        "--stages",
+        type=parse_stages,
+        help="用户数:持续秒数[:爬升秒数]，逗号分隔，如 10:30,50:60:20",
+    )
+    parser.add_argument("--users", type=int, default=10, help="未指定阶段时的用户数")
+    parser.add_argument(
+        "--duration", type=float, default=30, help="未指定阶段时的持续秒数"
+    )
+    parser.add_argument(
+        "--ramp-up", type=float, default=0, help="未指定阶段时的爬升秒数"
+    )
+    parser.add_argument("--message", default=DEFAULT_MESSAGE, help="发送给代理的请求")
+    parser.add_argument(
+        "--crud-rate", type=float, default=0, help="后台 artifact CRUD 每秒请求数"
+    )
+    parser.add_argument(
+        "--slo",
+        type=parse_slo,
+        action="extend",
+        default=[],
+        help="指标.分位=上限（秒），或 error_rate=上限，如 first_token.p95=1.5；"
+        f"指标：{','.join(LATENCY_METRICS)}",
+    )
+    parser.add_argument("--timeout", type=float, default=300, help="单个请求的超时")
+    parser.add_argument("--output", type=Path, help="将各阶段结果保存为 JSON")
+    parser.add_argument(
+        "--ttft-ms", type=float, default=200, help="本地 fake LLM 的首词元延迟"
+    )
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=50,
+        help="本地 fake LLM 的生成速度",
+    )
+    parser.add_argument(
+        "--llm-error-rate", type=float, default=0, help="本地 fake LLM 的错误率"
+    )
+    args = parser.parse_args()
+    if args.stages is None:
+        args.stages = [
+            LoadStage(users=args.users, duration=args.duration, ramp_up=args.ramp_up)
+        ]
+
+    stats = asyncio.run(run_load_test(args))
+    summaries = [stage_stats.summary() for stage_stats in stats]
+    print()
+    for index, summary in enumerate(summaries):
+        print(format_summary(index, summary))
+
+    if args.output:
+        args.output.write_text(
+            json.dumps({"stages": summaries}, indent=2, ensure_ascii=False)
+        )
+        print(f"\nresults saved to {args.output}")
+
+    violations = check_slos(summaries, stats, args.slo)
+    if violations:
+        print("\nSLO violated:")
+        for violation in violations:
+            print(f"  {violation}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
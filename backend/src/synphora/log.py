@@ -0,0 +1,162 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import reprlib
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from pydantic import BaseModel
+
+# 日志级别：DEBUG / INFO / WARNING / ERROR
+LOG_LEVEL = os.getenv('SYNPHORA_LOG_LEVEL', 'INFO').upper()
+
+# 输出格式：text 为可读的单行文本，json 为每行一个 JSON 对象，便于日志系统采集
+LOG_FORMAT = os.getenv('SYNPHORA_LOG_FORMAT', 'text')
+
+# 单个日志参数的最大字符数，超出部分截断
+LOG_MAX_CHARS = int(os.getenv('SYNPHORA_LOG_MAX_CHARS', '500'))
+
+# LogRecord 自带的属性，其余属性来自 extra，作为结构化字段输出
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: QueueListener | None = None
+
+
+class _LogRepr(reprlib.Repr):
+    def repr_instance(self, x, level) -> str:
+        # pydantic 模型（包括 LangChain 消息）按字段截断，不先生成完整的 repr
+        if isinstance(x, BaseModel):
+            if level <= 0:
+                return f'{type(x).__name__}(...)'
+            fields = ', '.join(
+                f'{name}={self.repr1(value, level - 1)}'
+                for name, value in list(x)[: self.maxdict]
+            )
+            return f'{type(x).__name__}({fields})'
+        return super().repr_instance(x, level)
+
+
+class Truncated:
+    """
+    日志参数的截断包装，只有日志真正输出时才格式化
+
+    字符串和容器只格式化前 max_chars 个字符所需的部分，避免为了一行日志
+    把整篇文章或整段对话历史转换成字符串。
+    """
+
+    def __init__(self, value, max_chars: int | None = None):
+        self.value = value
+        self.max_chars = max_chars or LOG_MAX_CHARS
+
+    def __str__(self) -> str:
+        if isinstance(self.value, str):
+            text = self.value[: self.max_chars + 1]
+        else:
+            formatter = _LogRepr(
+                maxlevel=3,
+                maxstring=self.max_chars,
+                maxother=self.max_chars,
+                maxlist=20,
+                maxdict=20,
+            )
+            text = formatter.repr(self.value)
+        if len(text) > self.max_chars:
+            return f'{text[: self.max_chars]}...'
+        return text
+
+
+def truncated(value, max_chars: int | None = None) -> Truncated:
+    return Truncated(value, max_chars)
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {
+        key: value
+        for key, value in vars(record).items()
+        if key not in _RECORD_ATTRIBUTES and not key.startswith("_")
+    }
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging(
+    level: str = LOG_LEVEL, log_format: str = LOG_FORMAT, stream=None
+):
+    """
+    配置 synphora 日志：按级别过滤，经队列交给后台线程格式化并写出
+
+    调用方只在日志级别满足时做消息插值，然后放入队列立即返回，写入 stderr
+    等慢速 I/O 不会阻塞事件循环。重复调用会替换之前的配置。
+    """
+    global _listener
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+
+    logger = logging.getLogger("synphora")
+    logger.setLevel(level)
+    for existing in list(logger.handlers):
+        if isinstance(existing, QueueHandler):
+            logger.removeHandler(existing)
+    logger.addHandler(QueueHandler(log_queue))
+
+
+def stop_logging():
+    """写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def _stop_listener_before_fork():
+    """fork 时不应有其他线程持有锁，写出线程在 fork 前停止，父子进程中各自重新启动"""
+    if _listener is not None:
+        _listener.stop()
+
+
+def _start_listener_after_fork():
+    if _listener is not None:
+        _listener.start()
+
+
+os.register_at_fork(
+    before=_stop_listener_before_fork,
+    after_in_parent=_start_listener_after_fork,
+    after_in_child=_start_listener_after_fork,
+)
@@ -0,0 +1,436 @@
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from functools import wraps
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from synphora.coalesce import sse_stats
+from synphora.compression import compression_stats
+from synphora.router import router_stats
+from synphora.tracing import current_span
+from synphora.usage import usage_stats
+
+# 请求与存储操作的耗时分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# LLM 与工具调用的耗时分桶（秒）
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+# 生成速度分桶（词元/秒）
+TOKENS_PER_SECOND_BUCKETS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return f'{{{pairs}}}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        # 最后一个计数对应 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: dict[tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        取得一组标签值对应的子指标
+
+        热路径上应在循环外取得子指标并复用，每次观测不再查找或分配对象。
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+            *self._samples(),
+        ]
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}{labels} {_format_value(child.value)}'
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        bucket_labelnames = (*self.labelnames, "le")
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts, strict=True):
+                cumulative += count
+                labels = _format_labels(bucket_labelnames, (*key, _format_value(bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+# 采集时调用，返回 Prometheus 文本格式的若干行，用于导出已有的统计对象
+Collector = Callable[[], Iterable[str]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Collector] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        parts = [metric.render() for metric in self._metrics]
+        for collector in self._collectors:
+            parts.extend(collector())
+        return '\n'.join(parts) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def timed(histogram_child: _HistogramChild):
+    """记录函数耗时的装饰器，子指标在装饰时绑定"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram_child.observe(time.perf_counter() - start_time)
+
+        return wrapper
+
+    return decorator
+
+
+http_requests_total = Counter(
+    "synphora_http_requests_total",
+    "HTTP requests by method, route and status code.",
+    ["method", "route", "status"],
+)
+http_request_duration_seconds = Histogram(
+    "synphora_http_request_duration_seconds",
+    "HTTP request duration, including the whole body for streaming responses.",
+    ["method", "route"],
+)
+sse_active_connections = Gauge(
+    "synphora_sse_active_connections",
+    "SSE connections currently subscribed to agent runs.",
+)
+llm_time_to_first_token_seconds = Histogram(
+    "synphora_llm_time_to_first_token_seconds",
+    "Time from sending an LLM request to receiving the first streamed chunk.",
+    ["task"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+llm_output_tokens_per_second = Histogram(
+    "synphora_llm_output_tokens_per_second",
+    "Output tokens per second of an LLM stream, measured after the first chunk.",
+    ["task"],
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+node_duration_seconds = Histogram(
+    "synphora_node_duration_seconds",
+    "Agent graph node duration.",
+    ["node"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+tool_duration_seconds = Histogram(
+    "synphora_tool_duration_seconds",
+    "Article evaluation tool call duration by evaluate type and status.",
+    ["evaluate_type", "status"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+storage_operation_duration_seconds = Histogram(
+    "synphora_storage_operation_duration_seconds",
+    "Artifact file storage operation duration.",
+    ["operation"],
+)
+
+
+def format_metric(
+    name: str,
+    metric_type: str,
+    documentation: str,
+    samples: Iterable[tuple[dict[str, str], float]],
+) -> str:
+    """把采集时得到的样本格式化为一个指标"""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        label_text = _format_labels(tuple(labels), tuple(labels.values()))
+        lines.append(f'{name}{label_text} {_format_value(value)}')
+    return '\n'.join(lines)
+
+
+def collect_stats() -> list[str]:
+    """导出路由、用量、SSE 与压缩的累计统计"""
+    router = router_stats.snapshot()
+    usage = usage_stats.snapshot()
+    sse = sse_stats.snapshot()
+    compression = compression_stats.snapshot()
+    return [
+        format_metric(
+            "synphora_router_decisions_total",
+            "counter",
+            "Routing decisions by path.",
+            [
+                ({"path": "fast_path"}, router["fast_path"]),
+                ({"path": "fallback"}, router["fallback"]),
+            ],
+        ),
+        format_metric(
+            "synphora_router_saved_seconds_total",
+            "counter",
+            "Estimated seconds saved by the fast path.",
+            [({}, router["saved_seconds"])],
+        ),
+        format_metric(
+            "synphora_llm_tokens_total",
+            "counter",
+            "LLM tokens by task and kind.",
+            [
+                ({"task": task.value, "kind": kind}, getattr(task_usage, field))
+                for task, task_usage in usage.items()
+                for kind, field in [
+                    ("input", "input_tokens"),
+                    ("cached_input", "cached_input_tokens"),
+                    ("output", "output_tokens"),
+                ]
+            ],
+        ),
+        format_metric(
+            "synphora_llm_cost_total",
+            "counter",
+            "Estimated LLM cost by task.",
+            [
+                ({"task": task.value}, task_usage.cost)
+                for task, task_usage in usage.items()
+            ],
+        ),
+        *(
+            format_metric(
+                f"synphora_sse_{key}_total", "counter", documentation, [({}, sse[key])]
+            )
+            for key, documentation in [
+                ("events_in", "SSE events produced by agent runs."),
+                ("frames_out", "SSE frames sent after coalescing."),
+                ("encode_seconds", "Seconds spent encoding SSE frames."),
+                ("frames_merged", "SSE frames merged for slow subscribers."),
+                ("subscribers_dropped", "SSE subscribers disconnected for lagging."),
+                ("blocked_seconds", "Seconds runs spent blocked on slow subscribers."),
+            ]
+        ),
+        *(
+            format_metric(
+                f"synphora_sse_{key}", "gauge", documentation, [({}, sse[key])]
+            )
+            for key, documentation in [
+                ("max_producer_queue_depth", "Maximum SSE producer queue depth."),
+                ("max_subscriber_queue_depth", "Maximum SSE subscriber queue depth."),
+            ]
+        ),
+        format_metric(
+            "synphora_compression_bytes_total",
+            "counter",
+            "Response bytes before and after compression by encoding.",
+            [
+                (
+                    {"encoding": encoding, "direction": direction},
+                    counts[f"bytes_{direction}"],
+                )
+                for encoding, counts in compression.items()
+                for direction in ["in", "out"]
+            ],
+        ),
+    ]
+
+
+registry.register_collector(collect_stats)
+
+
+class LlmStreamTimer:
+    """记录一次 LLM 流式调用的首个分片延迟和生成速度，同时写入当前 span 的属性"""
+
+    def __init__(self, task: str):
+        self._time_to_first_token = llm_time_to_first_token_seconds.labels(task)
+        self._tokens_per_second = llm_output_tokens_per_second.labels(task)
+        self._start_time = time.perf_counter()
+        self._first_chunk_time: float | None = None
+
+    def on_chunk(self):
+        if self._first_chunk_time is None:
+            self._first_chunk_time = time.perf_counter()
+            time_to_first_token = self._first_chunk_time - self._start_time
+            self._time_to_first_token.observe(time_to_first_token)
+            current_span().set_attribute(
+                "llm.time_to_first_token_ms", round(time_to_first_token * 1000, 1)
+            )
+
+    def finish(self, output_tokens: int):
+        if self._first_chunk_time is None or not output_tokens:
+            return
+        elapsed = time.perf_counter() - self._first_chunk_time
+        if elapsed > 0:
+            tokens_per_second = output_tokens / elapsed
+            self._tokens_per_second.observe(tokens_per_second)
+            current_span().set_attribute(
+                "llm.tokens_per_second", round(tokens_per_second, 1)
+            )
+
+
+class MetricsMiddleware:
+    """按路由模板统计请求数和耗时，未匹配路由的请求归为 unmatched，避免标签基数膨胀"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_requests_total.labels(method, route_path, status).inc()
+            http_request_duration_seconds.labels(method, route_path).observe(
+                time.perf_counter() - start_time
+            )
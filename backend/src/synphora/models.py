@@ -1,6 +1,6 @@
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
 
 class ArtifactType(str, Enum):
@@ -28,3 +28,19 @@ class EvaluateType(str, Enum):
     COMMENT = "comment"
     TITLE = "title"
     INTRODUCTION = "introduction"
+
+
+class AgentRequest(BaseModel):
+    message: str = ""
+    # 会话线程 ID，提供时基于检查点进行多轮对话，否则为无状态的单次运行
+    thread_id: str | None = None
+    # 从线程最后完成的节点继续被中断的运行，此时忽略 message
+    resume: bool = False
+
+    @model_validator(mode="after")
+    def check_resume(self) -> "AgentRequest":
+        if self.resume and not self.thread_id:
+            raise ValueError("resume requires thread_id")
+        if not self.resume and not self.message:
+            raise ValueError("message is required")
+        return self
@@ -0,0 +1,293 @@
+# 按需对单个请求做性能剖析
+#
+# 需要通过 SYNPHORA_PROFILING_ENABLED 启用。启用后，带 X-Synphora-Profile 请求头的
+# 请求，或通过 POST /profiles/arm 预约的之后若干个请求，会在处理期间（包括流式响应、
+# 代理图运行和存储操作）被剖析，结果写入 SYNPHORA_PROFILE_DIR：
+#
+# - cprofile：确定性剖析，输出 pstats 文件（.prof），可用 snakeviz 等工具查看
+# - sample：采样剖析，输出 speedscope JSON（.speedscope.json），可在 speedscope.app 打开
+#
+# 剖析在事件循环线程上进行，同一时间段内并发处理的其他请求也会出现在结果中；
+# 同一时间只剖析一个请求。未启用时不安装中间件，没有任何开销。
+
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+
+from pydantic import BaseModel
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv('SYNPHORA_PROFILING_ENABLED', 'false') == 'true'
+
+PROFILE_DIR = Path(
+    os.getenv(
+        'SYNPHORA_PROFILE_DIR',
+        os.path.join(tempfile.gettempdir(), 'synphora_profiles'),
+    )
+)
+
+# 采样剖析的采样间隔（毫秒）
+PROFILE_SAMPLE_INTERVAL_MS = float(
+    os.getenv('SYNPHORA_PROFILE_SAMPLE_INTERVAL_MS', '5')
+)
+
+# 目录中保留的剖析文件数，超出时删除最早的文件
+PROFILE_MAX_FILES = int(os.getenv('SYNPHORA_PROFILE_MAX_FILES', '50'))
+
+PROFILE_HEADER = b"x-synphora-profile"
+PROFILE_ID_HEADER = "X-Synphora-Profile-Id"
+
+_PROFILE_NAME_PATTERN = re.compile(r'^[\w.-]+\.(prof|speedscope\.json)$')
+
+
+class ProfileMode(str, Enum):
+    CPROFILE = "cprofile"
+    SAMPLE = "sample"
+
+
+class ProfileInfo(BaseModel):
+    name: str
+    size: int
+    created_at: str
+
+
+class _Sampler:
+    """后台线程定期采集目标线程的调用栈，输出 speedscope 的 sampled 格式"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames: list[dict] = []
+        self._frame_index: dict[tuple[str, str, int], int] = {}
+        self.samples: list[list[int]] = []
+        self.weights: list[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="synphora-profile-sampler", daemon=True
+        )
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": key[0], "file": key[1], "line": key[2]})
+        return index
+
+    def _run(self):
+        last_time = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples.append(stack)
+                self.weights.append(now - last_time)
+            last_time = now
+
+    def to_speedscope(self, name: str) -> dict:
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.end_time - self.start_time,
+                    "samples": self.samples,
+                    "weights": self.weights,
+                }
+            ],
+            "name": name,
+            "exporter": "synphora",
+        }
+
+
+class ProfileManager:
+    """剖析文件的目录、预约的剖析次数，以及同一时间只剖析一个请求的限制"""
+
+    def __init__(self, directory: Path = PROFILE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self._armed_mode: ProfileMode | None = None
+        self._armed_count = 0
+
+    def arm(self, mode: ProfileMode, count: int):
+        """预约剖析之后的 count 个请求"""
+        with self._lock:
+            self._armed_mode = mode
+            self._armed_count = max(count, 0)
+
+    def armed(self) -> tuple[ProfileMode | None, int]:
+        with self._lock:
+            return self._armed_mode, self._armed_count
+
+    def _take_armed(self) -> ProfileMode | None:
+        with self._lock:
+            if not self._armed_count:
+                return None
+            self._armed_count -= 1
+            return self._armed_mode
+
+    def acquire(self, requested: str | None) -> ProfileMode | None:
+        """决定是否剖析当前请求，返回剖析模式；已有请求正在剖析时不剖析"""
+        if requested:
+            try:
+                mode = ProfileMode(requested.strip().lower() or ProfileMode.CPROFILE)
+            except ValueError:
+                mode = ProfileMode.CPROFILE
+        else:
+            mode = self._take_armed()
+        if mode is None:
+            return None
+        if not self._active.acquire(blocking=False):
+            logger.warning('another request is being profiled, skipping')
+            return None
+        return mode
+
+    def release(self):
+        self._active.release()
+
+    def new_name(self, scope: Scope, mode: ProfileMode) -> str:
+        path = re.sub(r'[^\w]+', '_', scope["path"]).strip('_') or 'root'
+        timestamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        suffix = 'prof' if mode == ProfileMode.CPROFILE else 'speedscope.json'
+        return f'{timestamp}-{scope["method"]}-{path}-{uuid.uuid4().hex[:8]}.{suffix}'
+
+    def save_cprofile(self, name: str, profile: cProfile.Profile):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(self.directory / name)
+        self._prune()
+
+    def save_speedscope(self, name: str, sampler: _Sampler):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / name, 'w', encoding='utf-8') as f:
+            json.dump(sampler.to_speedscope(name), f)
+        self._prune()
+
+    def _files(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return sorted(
+            (
+                path
+                for path in self.directory.iterdir()
+                if _PROFILE_NAME_PATTERN.match(path.name)
+            ),
+            key=lambda path: path.stat().st_mtime,
+        )
+
+    def _prune(self):
+        files = self._files()
+        for path in files[: max(len(files) - PROFILE_MAX_FILES, 0)]:
+            path.unlink(missing_ok=True)
+
+    def list_profiles(self) -> list[ProfileInfo]:
+        """最近的剖析在前"""
+        profiles = []
+        for path in reversed(self._files()):
+            stat = path.stat()
+            profiles.append(
+                ProfileInfo(
+                    name=path.name,
+                    size=stat.st_size,
+                    created_at=datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                )
+            )
+        return profiles
+
+    def get_path(self, name: str) -> Path | None:
+        """剖析文件的路径，只接受本目录下的剖析文件名"""
+        if not _PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+
+profile_manager = ProfileManager()
+
+
+class ProfilingMiddleware:
+    """剖析带 X-Synphora-Profile 请求头或已预约的请求，直到响应的最后一帧发送完毕"""
+
+    def __init__(self, app: ASGIApp, manager: ProfileManager = profile_manager):
+        self.app = app
+        self.manager = manager
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith("/profiles"):
+            await self.app(scope, receive, send)
+            return
+
+        requested = None
+        for key, value in scope["headers"]:
+            if key == PROFILE_HEADER:
+                requested = value.decode("latin-1")
+                break
+        mode = self.manager.acquire(requested)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        name = self.manager.new_name(scope, mode)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = name
+            await send(message)
+
+        profile = sampler = None
+        try:
+            if mode == ProfileMode.CPROFILE:
+                profile = cProfile.Profile()
+                profile.enable()
+            else:
+                sampler = _Sampler(
+                    threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000
+                )
+                sampler.start()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            try:
+                if profile is not None:
+                    profile.disable()
+                    self.manager.save_cprofile(name, profile)
+                elif sampler is not None:
+                    sampler.stop()
+                    self.manager.save_speedscope(name, sampler)
+                logger.info(
+                    'request profiled, path: %s, profile: %s', scope["path"], name
+                )
+            except Exception:
+                logger.exception('failed to save profile %s', name)
+            finally:
+                self.manager.release()
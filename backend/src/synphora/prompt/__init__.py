@@ -1,6 +1,7 @@
-from .prompts import AgentPrompts, ArticleEvaluatorPrompts
+from .prompts import AgentPrompts, ArticleEvaluatorPrompts, warm_up_prompts
 
 __all__ = [
     "AgentPrompts",
     "ArticleEvaluatorPrompts",
+    "warm_up_prompts",
 ]
@@ -1,11 +1,23 @@
+from functools import cache
+
 from synphora.models import ArtifactData, EvaluateType
 
 from .renderer import renderer
 
+# 提示词按「稳定前缀 + 可变内容」组织：系统消息只包含固定的角色设定和任务说明，
+# 文章、Artifact ID、用户请求等可变内容放在最后一条用户消息中，
+# 使不同请求的前缀字节级一致，命中上游服务的提示词前缀缓存。
+
+
+@cache
+def _render_static(*template_names: str) -> str:
+    """渲染不含变量的模板并缓存结果，多个模板以空行拼接"""
+    return "\n\n".join(renderer.render(name) for name in template_names)
+
 
 class AgentPrompts:
     def system(self) -> str:
-        return renderer.render("agent-system-prompt.md")
+        return _render_static("agent-system-prompt.md")
 
     def user(self, original_artifact_id: str, user_message: str) -> str:
         return renderer.render(
@@ -15,10 +27,17 @@ class AgentPrompts:
         )
 
 
-class ArticleEvaluatorPrompts:
-    def system(self) -> str:
-        return renderer.render("article-evaluator-system-prompt.md")
+def warm_up_prompts():
+    """预先渲染所有静态提示词"""
+    AgentPrompts().system()
+    for evaluate_type in EvaluateType:
+        ArticleEvaluatorPrompts().system(evaluate_type)
+
 
-    def user(self, type: EvaluateType, artifact: ArtifactData) -> str:
+class ArticleEvaluatorPrompts:
+    def system(self, type: EvaluateType) -> str:
         file_name = f"article-evaluator-{type.value.lower()}-prompt.md"
-        return renderer.render(file_name, artifact=artifact)
+        return _render_static("article-evaluator-system-prompt.md", file_name)
+
+    def user(self, artifact: ArtifactData) -> str:
+        return renderer.render("article-evaluator-article-prompt.md", artifact=artifact)
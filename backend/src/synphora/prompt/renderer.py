@@ -1,7 +1,5 @@
 from pathlib import Path
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-
 
 class PromptRenderer:
     """Jinja2-based prompt template renderer that loads templates from files."""
@@ -12,11 +10,13 @@ class PromptRenderer:
             template_dir = Path(__file__).parent / "templates"
 
         self.template_dir = Path(template_dir)
+        # Created on first render, so importing the module does not import jinja2
         self.env = None
-        self._setup()
 
     def _setup(self):
         """Setup the Jinja2 environment with file system loader."""
+        from jinja2 import Environment, FileSystemLoader, select_autoescape
+
         if not self.template_dir.exists():
             raise FileNotFoundError(
                 f"Template directory not found: {self.template_dir}"
@@ -33,7 +33,7 @@ class PromptRenderer:
     def render(self, template_name: str, **kwargs) -> str:
         """Render a template with the given context."""
         if self.env is None:
-            raise RuntimeError("PromptRenderer not initialized properly.")
+            self._setup()
 
         # Add .md extension if not present
         if not template_name.endswith('.md'):
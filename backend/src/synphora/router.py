@@ -0,0 +1,174 @@
+import os
+import re
+import threading
+
+from pydantic import BaseModel
+
+# 是否启用快速路径路由
+FAST_PATH_ENABLED = os.getenv('SYNPHORA_FAST_PATH_ENABLED', 'true') == 'true'
+
+# 置信度不低于该阈值时走快速路径，否则交给 LLM 推理
+FAST_PATH_THRESHOLD = float(os.getenv('SYNPHORA_FAST_PATH_THRESHOLD', '0.8'))
+
+# 工具名 -> (触发关键词, 结果名称)
+_TOOL_INTENTS: dict[str, tuple[list[str], str]] = {
+    "write_comment": (["评价", "点评", "评估", "打分"], "文章评价"),
+    "write_candidate_titles": (["标题", "起名", "取名"], "候选标题"),
+    "write_introduction": (["介绍语", "介绍", "简介", "导语"], "介绍语"),
+}
+
+# 工具名 -> 明确的祈使请求：动作和对象，如“评价”“起几个标题”“写一段介绍语”
+_TOOL_ACTIONS: dict[str, str] = {
+    "write_comment": r"(?:写|做|给出?|来)?(?:一?[个份段])?(?:评价|点评|评估|打分)",
+    "write_candidate_titles": (
+        r"(?:起|取|想|拟|写|撰写|生成|来)(?:一?[几些个]个?)?(?:候选|新的?)?标题"
+        r"|[起取]个?名字?"
+    ),
+    "write_introduction": (
+        r"(?:写|撰写|生成|来|拟)(?:一?[段个份篇])?(?:介绍语|简介|导语|介绍)"
+    ),
+}
+
+# 动作前的礼貌用语和对象，如“请”“麻烦帮我”“给这篇文章”
+_REQUEST_PREFIX = (
+    r"(?:请|麻烦|劳烦)?你?(?:帮我|给我|为我|帮忙|帮)?(?:给|为)?"
+    r"(?:这篇|本篇|我的)?(?:文章)?"
+)
+
+# 动作后的补充，如“一下”“这篇文章”“吧”
+_REQUEST_SUFFIX = r"(?:一下|下)?(?:这篇|本篇|我的)?(?:文章)?吧?"
+
+_REQUEST_CLAUSE = re.compile(
+    _REQUEST_PREFIX
+    + "(?:"
+    + "|".join(f"(?P<{name}>{action})" for name, action in _TOOL_ACTIONS.items())
+    + ")"
+    + _REQUEST_SUFFIX
+)
+
+_CLAUSE_SEPARATOR = re.compile(r"(?:[，,、；;]|和|并且|并|再|然后|以及|还有|顺便)+")
+
+# 出现这些词时说明请求需要理解上下文或超出工具能力，交给 LLM
+# “别”不匹配“特别”“分别”等词中的字
+_FALLBACK_PATTERNS = re.compile(
+    r"不要|不用|不需要|(?<![特分区类级差识告离派性辨鉴])别|除了|修改|改写|润色|翻译"
+    r"|为什么|怎么|如何|[?？]"
+)
+
+_TRAILING_PUNCTUATION = "。！!，,.~ "
+
+
+class RouteDecision(BaseModel):
+    # 需要直接调用的工具，按用户请求中的顺序
+    tool_names: list[str]
+    confidence: float
+
+    def is_fast_path(self) -> bool:
+        return (
+            FAST_PATH_ENABLED
+            and bool(self.tool_names)
+            and self.confidence >= FAST_PATH_THRESHOLD
+        )
+
+    def labels(self) -> list[str]:
+        return [_TOOL_INTENTS[name][1] for name in self.tool_names]
+
+    def confirm_message(self) -> str:
+        return f"我将为你生成{'、'.join(self.labels())}。"
+
+    def finish_message(self) -> str:
+        return f"{'、'.join(self.labels())}已生成。"
+
+
+def _requested_tools(text: str) -> list[str] | None:
+    """请求完全由明确的祈使句组成时，按顺序返回要调用的工具，否则返回 None"""
+    tool_names: list[str] = []
+    pos = 0
+    while True:
+        clause = _REQUEST_CLAUSE.match(text, pos)
+        if clause is None:
+            return None
+        if clause.lastgroup not in tool_names:
+            tool_names.append(clause.lastgroup)
+        pos = clause.end()
+        separator = _CLAUSE_SEPARATOR.match(text, pos)
+        if separator is None:
+            break
+        pos = separator.end()
+    return tool_names if pos == len(text) else None
+
+
+def classify(message: str) -> RouteDecision:
+    """
+    基于规则判断用户请求对应的工具及置信度
+
+    只有明确要求生成评价、标题或介绍语的祈使请求走快速路径；提到这些词的闲聊、
+    提问或带额外要求的请求交给 LLM 推理。
+    """
+    text = message.strip().rstrip(_TRAILING_PUNCTUATION)
+
+    if _FALLBACK_PATTERNS.search(text):
+        return RouteDecision(tool_names=[], confidence=0.0)
+
+    requested = _requested_tools(text)
+    if requested:
+        return RouteDecision(tool_names=requested, confidence=0.9)
+
+    # 提到了工具相关的词，但不是明确的请求
+    positions = {}
+    for name, (keywords, _) in _TOOL_INTENTS.items():
+        found = [text.find(keyword) for keyword in keywords if keyword in text]
+        if found:
+            positions[name] = min(found)
+    tool_names = sorted(positions, key=positions.get)
+    return RouteDecision(tool_names=tool_names, confidence=0.5 if tool_names else 0.0)
+
+
+class RouterStats:
+    """快速路径统计：命中次数，以及按推理节点平均耗时估算的节省时间"""
+
+    # 推理节点耗时的指数移动平均系数
+    _EWMA_ALPHA = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.fast_path = 0
+        self.fallback = 0
+        self.saved_seconds = 0.0
+        self.reason_seconds_ewma: float | None = None
+
+    def record_reason_duration(self, seconds: float):
+        with self._lock:
+            if self.reason_seconds_ewma is None:
+                self.reason_seconds_ewma = seconds
+            else:
+                self.reason_seconds_ewma += self._EWMA_ALPHA * (
+                    seconds - self.reason_seconds_ewma
+                )
+
+    def record_decision(self, fast_path: bool) -> float:
+        """记录一次路由决策，返回估算节省的秒数"""
+        with self._lock:
+            self.total += 1
+            if not fast_path:
+                self.fallback += 1
+                return 0.0
+            self.fast_path += 1
+            # 快速路径省去了工具调用前后两次推理节点的 LLM 调用
+            saved = 2 * (self.reason_seconds_ewma or 0.0)
+            self.saved_seconds += saved
+            return saved
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total,
+                "fast_path": self.fast_path,
+                "fallback": self.fallback,
+                "fast_path_ratio": self.fast_path / self.total if self.total else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+router_stats = RouterStats()
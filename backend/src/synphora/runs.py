@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections.abc import AsyncGenerator
+from contextlib import aclosing, suppress
+
+from pydantic import BaseModel
+
+from synphora.broker import MemoryRunBroker, RunBroker
+from synphora.coalesce import sse_stats
+from synphora.log import truncated
+from synphora.metrics import sse_active_connections
+from synphora.sse import (
+    EventType,
+    RunFinishedEvent,
+    SseEvent,
+    TextMessageEvent,
+    format_sse_frame,
+)
+
+logger = logging.getLogger(__name__)
+
+# 运行结束后仍可重连补发的时间（秒）
+RUN_RETENTION_SECONDS = float(os.getenv('SYNPHORA_RUN_RETENTION_SECONDS', '120'))
+
+# 没有客户端连接时，运行继续执行的时间（秒），超过后取消运行
+RUN_DETACHED_TIMEOUT_SECONDS = float(
+    os.getenv('SYNPHORA_RUN_DETACHED_TIMEOUT_SECONDS', '60')
+)
+
+# 运行出错时发送给客户端的提示
+RUN_ERROR_MESSAGE = "抱歉，处理过程中出现错误，已停止生成。请稍后重试。"
+
+# 服务停止时等待进行中的运行结束的时间（秒），超过后取消
+DRAIN_TIMEOUT_SECONDS = float(os.getenv('SYNPHORA_DRAIN_TIMEOUT_SECONDS', '30'))
+
+
+class RunRegistryDrainingError(Exception):
+    """服务正在停止，不再接受新的运行"""
+
+
+class AgentRunInfo(BaseModel):
+    run_id: str
+    finished: bool
+    # 已产生的帧数
+    events: int
+    subscribers: int
+    # 各订阅者待发送的帧数
+    queue_depths: list[int]
+
+
+class AgentRun:
+    """
+    一次代理运行的事件流，与发起请求的 HTTP 连接解耦
+
+    运行在独立任务中执行，产生的 SSE 帧带有递增的 id 并发布到代理（broker），
+    任意多个客户端可以同时订阅同一次运行。客户端断线后可以带上 Last-Event-ID
+    重新订阅，从下一帧继续接收。
+    """
+
+    def __init__(
+        self,
+        events: AsyncGenerator[SseEvent],
+        run_id: str | None = None,
+        broker: RunBroker | None = None,
+    ):
+        self.id = run_id or str(uuid.uuid4())
+        self.finished_at: float | None = None
+        self._broker = broker or MemoryRunBroker()
+        self._broker.open(self.id)
+        self._next_id = 0
+        self._subscribers = 0
+        self._detached_handle: asyncio.TimerHandle | None = None
+        self._task = asyncio.create_task(self._produce(events))
+        # 客户端可能在开始订阅之前就断开，或者从未订阅
+        self._start_detached_timer()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def info(self) -> AgentRunInfo:
+        return AgentRunInfo(
+            run_id=self.id,
+            finished=self.finished,
+            events=self._next_id,
+            subscribers=self._subscribers,
+            queue_depths=self._broker.queue_depths(self.id),
+        )
+
+    def _start_detached_timer(self):
+        """没有订阅者时，超过 RUN_DETACHED_TIMEOUT_SECONDS 后取消运行"""
+        self._detached_handle = asyncio.get_running_loop().call_later(
+            RUN_DETACHED_TIMEOUT_SECONDS, self.cancel
+        )
+
+    def _stop_detached_timer(self):
+        if self._detached_handle:
+            self._detached_handle.cancel()
+            self._detached_handle = None
+
+    async def _produce(self, events: AsyncGenerator[SseEvent]):
+        frames = 0
+        encode_seconds = 0.0
+
+        async def publish(event: SseEvent):
+            nonlocal frames, encode_seconds
+            start_time = time.thread_time()
+            frame = format_sse_frame(self._next_id, event)
+            encode_seconds += time.thread_time() - start_time
+            frames += 1
+            await self._broker.publish(self.id, self._next_id, event, frame)
+            self._next_id += 1
+
+        try:
+            async with aclosing(events):
+                async for event in events:
+                    if event.type not in (
+                        EventType.TEXT_MESSAGE,
+                        EventType.ARTIFACT_CONTENT_CHUNK,
+                    ):
+                        logger.info('send sse event: %s', event.type.value)
+                        logger.debug('sse event data: %s', truncated(event))
+                    await publish(event)
+        except asyncio.CancelledError:
+            logger.info('agent run cancelled, run_id: %s', self.id)
+            raise
+        except Exception as e:
+            logger.exception('❌ agent run failed, run_id: %s, error: %s', self.id, e)
+            # 通知客户端运行已结束，而不是让事件流直接中断
+            await publish(
+                TextMessageEvent.new(
+                    message_id=str(uuid.uuid4())[:8], content=RUN_ERROR_MESSAGE
+                )
+            )
+            await publish(RunFinishedEvent.new())
+        finally:
+            sse_stats.record_encode(encode_seconds)
+            logger.info(
+                'sse stream finished, run_id: %s, frames: %d, encode cpu: %.2fms',
+                self.id,
+                frames,
+                encode_seconds * 1000,
+            )
+            self.finished_at = time.monotonic()
+            self._stop_detached_timer()
+            self._broker.close(self.id)
+
+    def cancel(self):
+        self._task.cancel()
+
+    async def wait(self):
+        with suppress(asyncio.CancelledError):
+            await self._task
+
+    def check_replay(self, last_event_id: int | None):
+        self._broker.check_replay(self.id, last_event_id)
+
+    async def subscribe(self, last_event_id: int | None = None) -> AsyncGenerator[str]:
+        """依次产出 last_event_id 之后的 SSE 帧，运行结束且全部发送后停止"""
+        frames = self._broker.subscribe(self.id, last_event_id)
+        self._subscribers += 1
+        sse_active_connections.inc()
+        self._stop_detached_timer()
+        try:
+            async with aclosing(frames):
+                async for frame in frames:
+                    yield frame
+        finally:
+            self._subscribers -= 1
+            sse_active_connections.dec()
+            if not self._subscribers and not self.finished:
+                logger.info(
+                    'agent run detached, run_id: %s, cancelling in %ss '
+                    'unless a client reconnects',
+                    self.id,
+                    RUN_DETACHED_TIMEOUT_SECONDS,
+                )
+                self._start_detached_timer()
+
+
+class RunRegistry:
+    """进行中和最近结束的代理运行，供多个客户端订阅和断线重连查找"""
+
+    def __init__(self, broker: RunBroker | None = None):
+        self.broker = broker or MemoryRunBroker()
+        self._runs: dict[str, AgentRun] = {}
+        # 开始停止的时间，之后不再接受新的运行
+        self.draining_since: float | None = None
+        self.drain_timeout = DRAIN_TIMEOUT_SECONDS
+
+    def _cleanup(self):
+        now = time.monotonic()
+        for run_id, run in list(self._runs.items()):
+            if run.finished and now - run.finished_at > RUN_RETENTION_SECONDS:
+                del self._runs[run_id]
+                self.broker.remove(run_id)
+
+    @property
+    def draining(self) -> bool:
+        return self.draining_since is not None
+
+    def start(self, events: AsyncGenerator[SseEvent]) -> AgentRun:
+        if self.draining:
+            raise RunRegistryDrainingError('Server is shutting down')
+        self._cleanup()
+        run = AgentRun(events, broker=self.broker)
+        self._runs[run.id] = run
+        return run
+
+    def get(self, run_id: str) -> AgentRun | None:
+        self._cleanup()
+        return self._runs.get(run_id)
+
+    def start_draining(self):
+        """不再接受新的运行；可以在信号处理函数中调用"""
+        if self.draining_since is None:
+            self.draining_since = time.monotonic()
+
+    async def drain(self, timeout: float | None = None):
+        """停止接受新的运行，等待进行中的运行结束，从开始停止起超过 timeout 后取消其余运行"""
+        if timeout is None:
+            timeout = self.drain_timeout
+        self.start_draining()
+        active = [run._task for run in self._runs.values() if not run.finished]
+        if active:
+            remaining = self.draining_since + timeout - time.monotonic()
+            logger.info(
+                'draining %d agent runs, timeout: %.1fs', len(active), remaining
+            )
+            if remaining > 0:
+                await asyncio.wait(active, timeout=remaining)
+            unfinished = sum(not task.done() for task in active)
+            if unfinished:
+                logger.warning(
+                    'drain timeout exceeded, cancelling %d agent runs', unfinished
+                )
+        await self.shutdown()
+
+    async def shutdown(self):
+        for run in self._runs.values():
+            run.cancel()
+        for run in self._runs.values():
+            await run.wait()
+            self.broker.remove(run.id)
+        self._runs.clear()
+
+
+run_registry = RunRegistry()
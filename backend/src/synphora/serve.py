@@ -0,0 +1,258 @@
+"""
+生产服务：父进程预加载应用、绑定端口后 fork 出 worker 监听 socket
+
+预加载在 fork 之前导入服务和代理模块、渲染静态提示词、编译代理图、创建存储目录，
+worker 重启时不必重复冷启动；LLM 客户端和检查点存储在 worker 的 lifespan 中创建。
+父进程只负责监督：worker 异常退出时重新启动，收到 SIGTERM / SIGINT 时通知 worker
+停止，等待它处理完进行中的请求。
+
+代理运行和后台任务保存在 worker 的内存中，后续的重连和查询请求必须落到同一个进程，
+因此目前只支持一个 worker。
+
+运行：
+    uv run serve
+    uv run serve --port 8000 --drain-timeout 60
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+from uvicorn.config import STARTUP_FAILURE
+
+from synphora.runs import DRAIN_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SERVE_HOST = os.getenv('SYNPHORA_HOST', '0.0.0.0')
+
+SERVE_PORT = int(os.getenv('SYNPHORA_PORT', '8000'))
+
+# worker 进程数：代理运行和后台任务保存在进程内存中，多个 worker 共享端口时
+# 重连和任务查询会落到其他 worker 而找不到，因此最多一个
+SERVE_WORKERS = int(os.getenv('SYNPHORA_WORKERS', '1'))
+
+_MAX_WORKERS = 1
+
+# worker 在 drain_timeout 之后还需要停止 lifespan、写出日志，超过此余量后强制结束
+_KILL_MARGIN_SECONDS = 5
+
+_SUPERVISE_INTERVAL_SECONDS = 0.5
+
+
+class WorkerServer(uvicorn.Server):
+    """收到停止信号时立即进入 draining 状态：健康检查报告 503，不再接受新的运行"""
+
+    def handle_exit(self, sig, frame):
+        from synphora.runs import run_registry
+
+        run_registry.start_draining()
+        super().handle_exit(sig, frame)
+
+
+def preload():
+    """fork 之前完成与 worker 无关的预热，返回 ASGI 应用"""
+    start_time = time.perf_counter()
+
+    # 代理模块和 LLM 客户端的依赖在服务模块中延迟导入，这里提前导入让 worker 共享；
+    # 客户端持有连接池，在每个 worker 中创建
+    import langchain_openai  # noqa: F401
+
+    from synphora.agent import get_agent_graph
+    from synphora.artifact_manager import artifact_manager
+    from synphora.prompt import warm_up_prompts
+    from synphora.server import app
+
+    warm_up_prompts()
+    # 所有 worker 使用同一个存储目录
+    artifact_manager.initialize()
+    # 绑定检查点存储的图在 worker 打开存储后编译
+    get_agent_graph()
+    logger.info("preloaded in %.2fs", time.perf_counter() - start_time)
+    return app
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    return sock
+
+
+def log_event_loop(loop: str, http: str):
+    """记录 auto 模式下 uvicorn 实际使用的事件循环和 HTTP 解析器"""
+    if loop == "auto":
+        loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    if http == "auto":
+        http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    logger.info("event loop: %s, http parser: %s", loop, http)
+    if loop == "asyncio" or http == "h11":
+        logger.info("install uvloop and httptools for faster event loop and parsing")
+
+
+def run_worker(app, sock: socket.socket, args: argparse.Namespace) -> int:
+    """在 fork 出的子进程中运行 uvicorn，返回退出码"""
+    from synphora.log import stop_logging
+    from synphora.runs import run_registry
+    from synphora.tracing import stop_tracing
+
+    # uvicorn 结束时会把捕获的信号交给原来的处理函数重新触发，子进程应当忽略
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    run_registry.drain_timeout = args.drain_timeout
+    config = uvicorn.Config(
+        app,
+        loop=args.loop,
+        http=args.http,
+        lifespan="on",
+        timeout_graceful_shutdown=args.drain_timeout,
+    )
+    exit_code = 0
+    try:
+        WorkerServer(config).run(sockets=[sock])
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        logger.exception("worker %d crashed", os.getpid())
+        exit_code = 1
+    finally:
+        stop_tracing()
+        stop_logging()
+    return exit_code
+
+
+class Supervisor:
+    """维护固定数量的 worker 进程"""
+
+    def __init__(self, app, sock: socket.socket, args: argparse.Namespace):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: set[int] = set()
+        self.stopping = False
+        # worker 启动失败（例如 lifespan 预热出错），重启也无济于事
+        self.startup_failed = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                exit_code = run_worker(self.app, self.sock, self.args)
+            finally:
+                os._exit(exit_code)
+        self.workers.add(pid)
+        logger.info("started worker %d", pid)
+
+    def reap(self):
+        """回收已退出的 worker"""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            self.workers.discard(pid)
+            exit_code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                logger.info("worker %d exited: %d", pid, exit_code)
+            elif exit_code == STARTUP_FAILURE:
+                logger.error("worker %d failed to start", pid)
+                self.startup_failed = True
+            else:
+                logger.warning("worker %d exited unexpectedly: %d", pid, exit_code)
+
+    def handle_signal(self, sig, frame):
+        self.stopping = True
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+
+        while not self.stopping and not self.startup_failed:
+            while len(self.workers) < self.args.workers:
+                self.spawn()
+            time.sleep(_SUPERVISE_INTERVAL_SECONDS)
+            self.reap()
+
+        self.stop()
+        return 1 if self.startup_failed else 0
+
+    def stop(self):
+        """通知 worker 停止，等待进行中的请求结束，超时后强制结束"""
+        self.stopping = True
+        # worker 也会关闭各自的副本，之后新连接被拒绝，而不是排队等到超时
+        self.sock.close()
+        logger.info("stopping %d workers", len(self.workers))
+        for pid in self.workers:
+            self.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.args.drain_timeout + _KILL_MARGIN_SECONDS
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+
+        for pid in self.workers:
+            logger.warning("worker %d did not stop in time, killing", pid)
+            self.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    @staticmethod
+    def kill(pid: int, sig: signal.Signals):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生产服务：预加载应用后启动 worker")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=DRAIN_TIMEOUT_SECONDS,
+        help="停止时等待进行中的请求和运行结束的秒数",
+    )
+    parser.add_argument(
+        "--loop",
+        default="auto",
+        help="事件循环：auto（有 uvloop 时使用）/ asyncio / uvloop",
+    )
+    parser.add_argument(
+        "--http",
+        default="auto",
+        help="HTTP 解析器：auto（有 httptools 时使用）/ h11 / httptools",
+    )
+    args = parser.parse_args()
+    if not 1 <= args.workers <= _MAX_WORKERS:
+        parser.error(
+            f"--workers must be between 1 and {_MAX_WORKERS}: agent runs and jobs "
+            "are kept in worker memory, follow-up requests must reach the same worker"
+        )
+
+    app = preload()
+    log_event_loop(args.loop, args.http)
+    sock = bind_socket(args.host, args.port)
+    logger.info(
+        "serving on http://%s:%d with %d workers", args.host, args.port, args.workers
+    )
+    sys.exit(Supervisor(app, sock, args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,78 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, Header, HTTPException, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from synphora.agent import AgentRequest, generate_agent_response
 from synphora.artifact_manager import artifact_manager
-from synphora.llm import create_llm_client
-from synphora.models import ArtifactData, ArtifactRole, ArtifactType
-from synphora.sse import EventType, SseEvent
-
-app = FastAPI(title="Synphora Agent Server", version="1.0.0")
+from synphora.batch import BatchArticle, evaluate_article
+from synphora.broker import ReplayUnavailableError
+from synphora.checkpoint import checkpoint_store
+from synphora.compression import CompressionMiddleware
+from synphora.jobs import Job, JobContext, JobQueueFullError, JobStatus, job_manager
+from synphora.llm import LlmTask, get_llm_client, warm_up_llm_connections
+from synphora.log import configure_logging, truncated
+from synphora.metrics import LlmStreamTimer, MetricsMiddleware, registry
+from synphora.models import (
+    AgentRequest,
+    ArtifactData,
+    ArtifactRole,
+    ArtifactType,
+    EvaluateType,
+)
+from synphora.profiling import (
+    PROFILE_ID_HEADER,
+    PROFILING_ENABLED,
+    ProfileInfo,
+    ProfileMode,
+    ProfilingMiddleware,
+    profile_manager,
+)
+from synphora.prompt import warm_up_prompts
+from synphora.runs import AgentRunInfo, RunRegistryDrainingError, run_registry
+from synphora.tracing import TracingMiddleware, configure_tracing
+from synphora.usage import record_llm_usage
+
+configure_logging()
+configure_tracing()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动预热：渲染静态提示词、编译代理图、建立上游连接，完成后健康检查才报告就绪"""
+    app.state.ready = False
+    # 同一进程中再次启动（例如测试）时重新接受运行
+    run_registry.draining_since = None
+    start_time = time.perf_counter()
+
+    # 代理图依赖 langgraph / langchain，在启动时而不是导入本模块时导入
+    from synphora.agent import get_agent_graph
+
+    artifact_manager.initialize()
+    async with checkpoint_store.open():
+        warm_up_prompts()
+        get_agent_graph()
+        get_agent_graph(checkpointed=True)
+        await warm_up_llm_connections()
+
+        await job_manager.start()
+        app.state.ready = True
+        logger.info("🔥 warm-up completed in %.2fs", time.perf_counter() - start_time)
+        try:
+            yield
+        finally:
+            # 等待进行中的运行结束（最多 drain_timeout 秒），之后取消
+            await run_registry.drain()
+            await job_manager.stop()
+
+
+app = FastAPI(title="Synphora Agent Server", version="1.0.0", lifespan=lifespan)
 
 # 添加 CORS 中间件
 app.add_middleware(
@@ -23,8 +84,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 允许所有 HTTP 方法
     allow_headers=["*"],  # 允许所有头部
+    # 断线重连时需要运行 ID，追踪与剖析结果通过响应头中的 ID 查找
+    expose_headers=["X-Run-Id", "traceparent", PROFILE_ID_HEADER],
 )
 
+# 按需剖析单个请求，未启用时不安装
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# 按 Accept-Encoding 压缩响应，SSE 逐帧 flush
+app.add_middleware(CompressionMiddleware)
+
+# 最外层统计请求数和耗时，包含压缩的开销
+app.add_middleware(MetricsMiddleware)
+
+# 每个请求的根 span，运行任务、代理图节点和工具继承其追踪上下文
+app.add_middleware(TracingMiddleware)
+
 
 class HealthResponse(BaseModel):
     status: str
@@ -46,56 +122,149 @@ class GenerateSampleArticleRequest(BaseModel):
     topic: str | None = None
 
 
+class ArmProfilingRequest(BaseModel):
+    mode: ProfileMode = ProfileMode.CPROFILE
+    count: int = 1
+
+
+class ArmProfilingResponse(BaseModel):
+    mode: ProfileMode | None
+    count: int
+
+
+class EvaluateJobRequest(BaseModel):
+    artifact_ids: list[str]
+    types: list[EvaluateType] = list(EvaluateType)
+    concurrency: int = 2
+
+
 @app.get("/health", response_model=HealthResponse)
-async def api_health():
-    """Health check endpoint"""
+async def api_health(response: Response):
+    """Health check endpoint, reports 503 while warming up or draining"""
+    ready = getattr(app.state, "ready", False)
+    if run_registry.draining:
+        status = "draining"
+    else:
+        status = "healthy" if ready else "starting"
+    if status != "healthy":
+        response.status_code = 503
     return HealthResponse(
-        status="healthy", timestamp=datetime.now().isoformat(), version="1.0.0"
+        status=status,
+        timestamp=datetime.now().isoformat(),
+        version="1.0.0",
     )
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def require_profiling():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+
+@app.post("/profiles/arm", response_model=ArmProfilingResponse)
+async def arm_profiling(request: ArmProfilingRequest):
+    """Profile the next `count` requests, count 0 cancels"""
+    require_profiling()
+    profile_manager.arm(request.mode, request.count)
+    mode, count = profile_manager.armed()
+    return ArmProfilingResponse(mode=mode, count=count)
+
+
+@app.get("/profiles", response_model=list[ProfileInfo])
+async def list_profiles():
+    """List saved request profiles, most recent first"""
+    require_profiling()
+    return profile_manager.list_profiles()
+
+
+@app.get("/profiles/{name}")
+async def download_profile(name: str):
+    """Download a profile as pstats (.prof) or speedscope JSON"""
+    require_profiling()
+    path = profile_manager.get_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name)
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Content-Type": "text/event-stream",
+}
+
+
 @app.post("/agent")
 async def api_agent(request: AgentRequest):
-    """Streaming agent endpoint"""
+    """Streaming agent endpoint, the run keeps going if the client disconnects"""
 
-    print(f'receive /agent request: {request}')
+    from synphora.agent import generate_agent_response
 
-    def format_sse_event(event: SseEvent) -> str:
-        return f"data: {event.to_data()}\n\n"
+    logger.info('receive /agent request: %s', truncated(request))
 
-    async def generate_sse():
-        async for event in generate_agent_response(request):
-            if event.type not in (
-                EventType.TEXT_MESSAGE,
-                EventType.ARTIFACT_CONTENT_CHUNK,
-            ):
-                print(f'send sse event: {event}')
-            yield format_sse_event(event)
+    try:
+        run = run_registry.start(generate_agent_response(request))
+    except RunRegistryDrainingError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "1"}
+        ) from e
+    return StreamingResponse(
+        run.subscribe(),
+        media_type="text/plain",
+        headers={**SSE_HEADERS, "X-Run-Id": run.id},
+    )
 
+
+@app.get("/agent/runs/{run_id}", response_model=AgentRunInfo)
+async def api_agent_run(run_id: str):
+    """Get the status and subscriber count of an agent run"""
+    run = run_registry.get(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    return run.info()
+
+
+@app.get("/agent/runs/{run_id}/events")
+async def api_agent_run_events(
+    run_id: str, last_event_id: int | None = Header(default=None)
+):
+    """Subscribe to an agent run, resuming after Last-Event-ID if given"""
+    run = run_registry.get(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    try:
+        run.check_replay(last_event_id)
+    except ReplayUnavailableError as e:
+        raise HTTPException(status_code=410, detail=str(e)) from e
+
+    logger.info('subscribe to agent run: %s, last_event_id: %s', run_id, last_event_id)
     return StreamingResponse(
-        generate_sse(),
+        run.subscribe(last_event_id),
         media_type="text/plain",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream",
-        },
+        headers={**SSE_HEADERS, "X-Run-Id": run.id},
     )
 
 
 @app.get("/artifacts", response_model=ArtifactListResponse)
 async def get_artifacts():
     """Get all artifacts"""
-    print("📋 Starting get_artifacts operation")
+    logger.info("📋 Starting get_artifacts operation")
     artifacts = artifact_manager.list_artifacts()
-    print(f"✅ get_artifacts completed, found {len(artifacts)} artifacts")
+    logger.info("✅ get_artifacts completed, found %d artifacts", len(artifacts))
     return ArtifactListResponse(artifacts=artifacts)
 
 
 @app.post("/artifacts", response_model=ArtifactData)
 async def create_artifact(request: CreateArtifactRequest):
     """Create a new artifact"""
-    print(f"📝 Starting create_artifact operation for title '{request.title}'")
+    logger.info("📝 Starting create_artifact operation for title '%s'", request.title)
     artifact = artifact_manager.create_artifact(
         title=request.title,
         content=request.content,
@@ -103,14 +272,14 @@ async def create_artifact(request: CreateArtifactRequest):
         role=ArtifactRole.USER,
         artifact_type=ArtifactType.ORIGINAL,
     )
-    print(f"✅ create_artifact completed, artifact ID: {artifact.id}")
+    logger.info("✅ create_artifact completed, artifact ID: %s", artifact.id)
     return artifact
 
 
 @app.post("/artifacts/upload", response_model=ArtifactData)
 async def upload_artifact(file: UploadFile = File(...)):
     """Upload a file as an artifact"""
-    print(f"📤 Starting upload_artifact operation for file '{file.filename}'")
+    logger.info("📤 Starting upload_artifact operation for file '%s'", file.filename)
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
@@ -123,8 +292,10 @@ async def upload_artifact(file: UploadFile = File(...)):
         role=ArtifactRole.USER,
         artifact_type=ArtifactType.ORIGINAL,
     )
-    print(
-        f"✅ upload_artifact completed, file '{file.filename}' saved as artifact ID: {artifact.id}"
+    logger.info(
+        "✅ upload_artifact completed, file '%s' saved as artifact ID: %s",
+        file.filename,
+        artifact.id,
     )
     return artifact
 
@@ -132,37 +303,32 @@ async def upload_artifact(file: UploadFile = File(...)):
 @app.get("/artifacts/{artifact_id}", response_model=ArtifactData)
 async def get_artifact(artifact_id: str):
     """Get a specific artifact by ID"""
-    print(f"🔍 Starting get_artifact operation for ID '{artifact_id}'")
+    logger.info("🔍 Starting get_artifact operation for ID '%s'", artifact_id)
     artifact = artifact_manager.get_artifact(artifact_id)
     if not artifact:
-        print(f"❌ get_artifact failed, artifact ID '{artifact_id}' not found")
+        logger.warning(
+            "❌ get_artifact failed, artifact ID '%s' not found", artifact_id
+        )
         raise HTTPException(status_code=404, detail="Artifact not found")
-    print(f"✅ get_artifact completed, found artifact '{artifact.title}'")
+    logger.info("✅ get_artifact completed, found artifact '%s'", artifact.title)
     return artifact
 
 
 @app.delete("/artifacts/{artifact_id}")
 async def delete_artifact(artifact_id: str):
     """Delete an artifact"""
-    print(f"🗑️ Starting delete_artifact operation for ID '{artifact_id}'")
+    logger.info("🗑️ Starting delete_artifact operation for ID '%s'", artifact_id)
     success = artifact_manager.delete_artifact(artifact_id)
     if not success:
-        print(f"❌ delete_artifact failed, artifact ID '{artifact_id}' not found")
+        logger.warning(
+            "❌ delete_artifact failed, artifact ID '%s' not found", artifact_id
+        )
         raise HTTPException(status_code=404, detail="Artifact not found")
-    print(f"✅ delete_artifact completed, artifact ID '{artifact_id}' deleted")
+    logger.info("✅ delete_artifact completed, artifact ID '%s' deleted", artifact_id)
     return {"message": "Artifact deleted successfully"}
 
 
-@app.post("/artifacts/generate-sample", response_model=ArtifactData)
-async def generate_sample_article(request: GenerateSampleArticleRequest):
-    """Generate a sample article and create it as an artifact"""
-    print(f"🤖 Starting generate_sample_article operation with topic: {request.topic}")
-
-    try:
-        # 创建 LLM 客户端
-        llm = create_llm_client()
-
-        prompt = """请生成一篇关于"生成式 AI 将会如何改变我们的生活"的中文文章，要求如下：
+SAMPLE_ARTICLE_PROMPT = """请生成一篇关于"生成式 AI 将会如何改变我们的生活"的中文文章，要求如下：
 1. 文件格式：Markdown 格式，带有 h1 的标题，其他为正文
 2. 文章长度：500-800字
 3. 文章结构：包含引言、主体（3个论点）和结论，共 5 段。三个论点段开头有一句加粗的概括句。
@@ -170,26 +336,177 @@ async def generate_sample_article(request: GenerateSampleArticleRequest):
 5. 只返回文章内容，不要包含标题或其他额外说明
 """
 
-        # 调用 LLM 生成文章
-        print("🔄 Generating article content with LLM...")
-        response = llm.invoke(prompt)
-        generated_content = response.content
-
-        if not generated_content:
-            raise HTTPException(status_code=500, detail="Failed to generate article content")
-
-        # 创建 artifact
-        title = "示例文章.md"
-        artifact = artifact_manager.create_artifact(
-            title=title,
-            content=generated_content,
-            role=ArtifactRole.ASSISTANT,
-            artifact_type=ArtifactType.ORIGINAL,
-        )
+# 示例文章的预期字数，用于估算生成进度
+SAMPLE_ARTICLE_EXPECTED_CHARS = 800
+
+
+async def run_generate_sample_job(params: dict, context: JobContext) -> dict:
+    """后台任务：流式生成示例文章，按已生成的字数汇报进度"""
+    from langchain_core.messages.ai import add_usage
+
+    llm = get_llm_client(LlmTask.SAMPLE)
+    stream_timer = LlmStreamTimer(LlmTask.SAMPLE.value)
+
+    logger.info("🔄 Generating article content with LLM...")
+    generated_content = ''
+    usage_metadata = None
+    model_name = None
+    async for chunk in llm.astream(SAMPLE_ARTICLE_PROMPT):
+        stream_timer.on_chunk()
+        model_name = chunk.response_metadata.get("model_name", model_name)
+        if chunk.usage_metadata:
+            usage_metadata = add_usage(usage_metadata, chunk.usage_metadata)
+        if chunk.content:
+            generated_content += chunk.content
+            context.report(
+                min(len(generated_content) / SAMPLE_ARTICLE_EXPECTED_CHARS, 0.95),
+                "正在生成示例文章",
+            )
+    usage = record_llm_usage(LlmTask.SAMPLE, usage_metadata, model=model_name)
+    stream_timer.finish(usage.output_tokens)
+
+    if not generated_content:
+        raise ValueError("Failed to generate article content")
+
+    # 创建 artifact
+    artifact = artifact_manager.create_artifact(
+        title="示例文章.md",
+        content=generated_content,
+        role=ArtifactRole.ASSISTANT,
+        artifact_type=ArtifactType.ORIGINAL,
+    )
+    logger.info(
+        "✅ generate_sample_article completed, created artifact ID: %s", artifact.id
+    )
+    return {"artifact_id": artifact.id}
+
+
+async def run_evaluate_job(params: dict, context: JobContext) -> dict:
+    """后台任务：对多篇文章批量运行评价，结果保存为 artifact"""
+    request = EvaluateJobRequest(**params)
+    artifacts = []
+    missing_artifact_ids = []
+    for artifact_id in request.artifact_ids:
+        if artifact := artifact_manager.get_artifact(artifact_id):
+            artifacts.append(artifact)
+        else:
+            missing_artifact_ids.append(artifact_id)
+    if missing_artifact_ids:
+        logger.warning("evaluate job, artifacts not found: %s", missing_artifact_ids)
+    if not artifacts:
+        raise ValueError(f"Artifacts not found: {', '.join(missing_artifact_ids)}")
+    jobs = [
+        (artifact, evaluate_type)
+        for artifact in artifacts
+        for evaluate_type in request.types
+    ]
+    semaphore = asyncio.Semaphore(max(request.concurrency, 1))
+    results = []
+
+    async def evaluate(artifact: ArtifactData, evaluate_type: EvaluateType):
+        async with semaphore:
+            article = BatchArticle(
+                id=artifact.id, title=artifact.title, content=artifact.content
+            )
+            result = await evaluate_article(
+                article, evaluate_type, original_artifact_id=artifact.id
+            )
+        results.append(result)
+        context.report(len(results) / len(jobs), f"已完成 {len(results)}/{len(jobs)}")
+
+    await asyncio.gather(*(evaluate(*job) for job in jobs))
+    return {
+        "results": [
+            result.model_dump(mode="json", exclude={"content"}) for result in results
+        ],
+        "missing_artifact_ids": missing_artifact_ids,
+    }
+
+
+job_manager.register("generate_sample", run_generate_sample_job)
+job_manager.register("evaluate", run_evaluate_job)
+
+
+def submit_job(kind: str, params: dict, idempotency_key: str | None) -> Job:
+    try:
+        return job_manager.submit(kind, params, idempotency_key=idempotency_key)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+
+@app.post("/jobs/generate-sample", response_model=Job, status_code=202)
+async def create_generate_sample_job(
+    request: GenerateSampleArticleRequest,
+    idempotency_key: str | None = Header(default=None),
+):
+    """Submit a sample article generation job"""
+    return submit_job("generate_sample", request.model_dump(), idempotency_key)
+
+
+@app.post("/jobs/evaluate", response_model=Job, status_code=202)
+async def create_evaluate_job(
+    request: EvaluateJobRequest,
+    idempotency_key: str | None = Header(default=None),
+):
+    """Submit a bulk article evaluation job"""
+    return submit_job("evaluate", request.model_dump(mode="json"), idempotency_key)
 
-        print(f"✅ generate_sample_article completed, created artifact ID: {artifact.id}")
-        return artifact
 
-    except Exception as e:
-        print(f"❌ generate_sample_article failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate sample article: {str(e)}")
+@app.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    """Get job status"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """Stream job progress as SSE until the job finishes"""
+    if not job_manager.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def generate_sse():
+        async for job in job_manager.subscribe(job_id):
+            yield f"data: {job.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        generate_sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@app.post("/artifacts/generate-sample", response_model=ArtifactData, deprecated=True)
+async def generate_sample_article(
+    request: GenerateSampleArticleRequest,
+    idempotency_key: str | None = Header(default=None),
+):
+    """
+    Generate a sample article and create it as an artifact, waiting for the job
+
+    Deprecated compatibility shim: the request is held until generation finishes.
+    Use POST /jobs/generate-sample and GET /jobs/{job_id}/events instead.
+    """
+    logger.info(
+        "🤖 Starting generate_sample_article operation with topic: %s", request.topic
+    )
+
+    job = submit_job("generate_sample", request.model_dump(), idempotency_key)
+    job = await job_manager.wait(job.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JobStatus.SUCCEEDED:
+        logger.error("❌ generate_sample_article failed: %s", job.error)
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate sample article: {job.error}"
+        )
+    artifact = artifact_manager.get_artifact(job.result["artifact_id"])
+    if artifact is None:
+        logger.warning(
+            "❌ generate_sample_article failed, artifact ID '%s' not found",
+            job.result["artifact_id"],
+        )
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return artifact
@@ -1,4 +1,5 @@
 from enum import Enum
+from json.encoder import encode_basestring
 
 from pydantic import BaseModel
 
@@ -11,6 +12,7 @@ class EventType(Enum):
     ARTIFACT_CONTENT_START = "ARTIFACT_CONTENT_START"
     ARTIFACT_CONTENT_CHUNK = "ARTIFACT_CONTENT_CHUNK"
     ARTIFACT_CONTENT_COMPLETE = "ARTIFACT_CONTENT_COMPLETE"
+    RUN_USAGE = "RUN_USAGE"
 
 
 class SseEvent(BaseModel):
@@ -20,6 +22,24 @@ class SseEvent(BaseModel):
         return self.model_dump_json(exclude_none=True)
 
 
+def _construct(cls: type[BaseModel], values: dict):
+    """
+    不经过 pydantic 校验创建模型实例，只用于字段均为必填字符串的高频分片事件
+
+    pydantic 的 model_construct 需要逐个字段处理默认值，比直接校验还慢。
+    """
+    model = object.__new__(cls)
+    object.__setattr__(model, "__dict__", values)
+    object.__setattr__(model, "__pydantic_fields_set__", set(values))
+    object.__setattr__(model, "__pydantic_extra__", None)
+    object.__setattr__(model, "__pydantic_private__", None)
+    return model
+
+
+def format_sse_frame(event_id: int, event: SseEvent) -> str:
+    return f"id: {event_id}\ndata: {event.to_data()}\n\n"
+
+
 class RunStartedEvent(SseEvent):
     def __init__(self):
         super().__init__(type=EventType.RUN_STARTED)
@@ -43,6 +63,13 @@ class TextMessageData(BaseModel):
     content: str
 
 
+# 高频分片事件的 JSON 前缀，与 model_dump_json 的输出逐字节一致
+_TEXT_MESSAGE_PREFIX = '{"type":"TEXT_MESSAGE","data":{"message_id":'
+_ARTIFACT_CONTENT_CHUNK_PREFIX = (
+    '{"type":"ARTIFACT_CONTENT_CHUNK","data":{"artifact_id":'
+)
+
+
 class TextMessageEvent(SseEvent):
     data: TextMessageData
 
@@ -51,7 +78,18 @@ class TextMessageEvent(SseEvent):
 
     @classmethod
     def new(cls, message_id: str, content: str) -> "TextMessageEvent":
-        return cls(data=TextMessageData(message_id=message_id, content=content))
+        # 每个分片都会创建事件，参数类型由调用方保证，跳过 pydantic 校验
+        data = _construct(
+            TextMessageData, {"message_id": message_id, "content": content}
+        )
+        return _construct(cls, {"type": EventType.TEXT_MESSAGE, "data": data})
+
+    def to_data(self) -> str:
+        # 直接拼接 JSON，避免每个分片都经过 pydantic 序列化
+        return (
+            f'{_TEXT_MESSAGE_PREFIX}{encode_basestring(self.data.message_id)}'
+            f',"content":{encode_basestring(self.data.content)}}}}}'
+        )
 
 
 class ArtifactListUpdatedData(BaseModel):
@@ -117,8 +155,17 @@ class ArtifactContentChunkEvent(SseEvent):
 
     @classmethod
     def new(cls, artifact_id: str, content: str) -> "ArtifactContentChunkEvent":
-        return cls(
-            data=ArtifactContentChunkData(artifact_id=artifact_id, content=content)
+        # 每个分片都会创建事件，参数类型由调用方保证，跳过 pydantic 校验
+        data = _construct(
+            ArtifactContentChunkData, {"artifact_id": artifact_id, "content": content}
+        )
+        return _construct(cls, {"type": EventType.ARTIFACT_CONTENT_CHUNK, "data": data})
+
+    def to_data(self) -> str:
+        # 直接拼接 JSON，避免每个分片都经过 pydantic 序列化
+        return (
+            f'{_ARTIFACT_CONTENT_CHUNK_PREFIX}{encode_basestring(self.data.artifact_id)}'
+            f',"content":{encode_basestring(self.data.content)}}}}}'
         )
 
 
@@ -135,3 +182,42 @@ class ArtifactContentCompleteEvent(SseEvent):
     @classmethod
     def new(cls, artifact_id: str) -> "ArtifactContentCompleteEvent":
         return cls(data=ArtifactContentCompleteData(artifact_id=artifact_id))
+
+
+class TokenUsageData(BaseModel):
+    input_tokens: int
+    cached_input_tokens: int
+    output_tokens: int
+    cost: float
+
+
+class RunUsageData(BaseModel):
+    total: TokenUsageData
+    nodes: dict[str, TokenUsageData]
+    tools: dict[str, TokenUsageData]
+    # 上下文压缩在本次运行中少发送的输入词元数
+    context_tokens_saved: int = 0
+
+
+class RunUsageEvent(SseEvent):
+    data: RunUsageData
+
+    def __init__(self, **kwargs):
+        super().__init__(type=EventType.RUN_USAGE, **kwargs)
+
+    @classmethod
+    def new(
+        cls,
+        total: TokenUsageData,
+        nodes: dict[str, TokenUsageData],
+        tools: dict[str, TokenUsageData],
+        context_tokens_saved: int = 0,
+    ) -> "RunUsageEvent":
+        return cls(
+            data=RunUsageData(
+                total=total,
+                nodes=nodes,
+                tools=tools,
+                context_tokens_saved=context_tokens_saved,
+            )
+        )
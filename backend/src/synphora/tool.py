@@ -1,12 +1,18 @@
+import asyncio
 import json
+import logging
+import os
+import time
 
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages.ai import add_usage
 from langchain_core.tools import Tool, tool
 
 from synphora.artifact_manager import artifact_manager
 from synphora.langgraph_sse import write_sse_event
-from synphora.llm import create_llm_client
-from synphora.models import ArtifactRole, ArtifactType, EvaluateType
+from synphora.llm import LlmTask, get_llm_client
+from synphora.metrics import LlmStreamTimer, tool_duration_seconds
+from synphora.models import ArtifactData, ArtifactRole, ArtifactType, EvaluateType
 from synphora.prompt import ArticleEvaluatorPrompts
 from synphora.sse import (
     ArtifactContentChunkEvent,
@@ -14,38 +20,132 @@ from synphora.sse import (
     ArtifactContentStartEvent,
     ArtifactListUpdatedEvent,
 )
+from synphora.tracing import current_span, traced
+from synphora.usage import record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+# 单次工具调用（一次文章评价的 LLM 流式生成）的时限（秒）
+TOOL_TIMEOUT_SECONDS = float(os.getenv('SYNPHORA_TOOL_TIMEOUT_SECONDS', '60'))
+
+# 工具调用超时时，已生成的部分内容仍会保存，并在描述中注明
+PARTIAL_ARTIFACT_DESCRIPTION = "生成超时，内容不完整"
 
 
 class ArticleEvaluator:
     def __init__(self, evaluate_type: EvaluateType):
         self.evaluate_type = evaluate_type
 
-    def evaluate(self, original_artifact_id: str) -> str:
-        print(
-            f'evaluate_article, evaluate_type: {self.evaluate_type}, original_artifact_id: {original_artifact_id}'
-        )
-
+    @property
+    def artifact_title(self) -> str:
         if self.evaluate_type == EvaluateType.COMMENT:
-            artifact_title = "文章评价"
-            artifact_type = ArtifactType.COMMENT
+            return "文章评价"
         elif self.evaluate_type == EvaluateType.TITLE:
-            artifact_title = "候选标题"
-            artifact_type = ArtifactType.COMMENT
+            return "候选标题"
         elif self.evaluate_type == EvaluateType.INTRODUCTION:
-            artifact_title = "介绍语"
-            artifact_type = ArtifactType.COMMENT
+            return "介绍语"
         else:
             raise ValueError(f'Unsupported evaluate type: {self.evaluate_type}')
 
+    @traced("llm.generate")
+    async def generate(
+        self, original_artifact: ArtifactData, artifact_id: str
+    ) -> tuple[str, bool]:
+        """
+        流式生成评价内容，返回 (内容, 是否超时)
+
+        在代理图中运行时，每个分片以 ARTIFACT_CONTENT_CHUNK 事件发送给前端。
+        """
         article_evaluator_prompts = ArticleEvaluatorPrompts()
-        original_artifact = artifact_manager.get_artifact(original_artifact_id)
-        system_prompt = article_evaluator_prompts.system()
-        user_prompt = article_evaluator_prompts.user(
-            type=self.evaluate_type, artifact=original_artifact
+        # 系统提示词与任务说明在前（同一评价类型的请求前缀一致），文章内容在后
+        messages = [
+            SystemMessage(
+                content=article_evaluator_prompts.system(type=self.evaluate_type)
+            ),
+            HumanMessage(
+                content=article_evaluator_prompts.user(artifact=original_artifact)
+            ),
+        ]
+
+        llm_task = LlmTask.evaluate(self.evaluate_type)
+        llm = get_llm_client(llm_task)
+        stream_timer = LlmStreamTimer(llm_task.value)
+        llm_result_content = ''
+        usage_metadata = None
+        model_name = None
+        timed_out = False
+
+        try:
+            async with asyncio.timeout(TOOL_TIMEOUT_SECONDS):
+                async for chunk in llm.astream(messages):
+                    stream_timer.on_chunk()
+                    model_name = chunk.response_metadata.get("model_name", model_name)
+                    if chunk.usage_metadata:
+                        usage_metadata = add_usage(usage_metadata, chunk.usage_metadata)
+                    if chunk.content:
+                        write_sse_event(
+                            ArtifactContentChunkEvent.new(
+                                artifact_id=artifact_id,
+                                content=chunk.content,
+                            )
+                        )
+                        llm_result_content += chunk.content
+        except TimeoutError:
+            logger.warning(
+                'evaluate_article timed out after %ss, evaluate_type: %s, '
+                'saving partial content',
+                TOOL_TIMEOUT_SECONDS,
+                self.evaluate_type,
+            )
+            timed_out = True
+
+        usage = record_llm_usage(llm_task, usage_metadata, model=model_name)
+        stream_timer.finish(usage.output_tokens)
+        return llm_result_content, timed_out
+
+    async def evaluate(self, original_artifact_id: str) -> str:
+        """
+        流式生成评价内容并保存为 artifact
+
+        - 超过 TOOL_TIMEOUT_SECONDS 时停止生成，保存已生成的部分内容，结果中 status 为 timeout
+        - 运行被取消（客户端断开或运行超时）时直接中断，不保存任何内容
+        """
+        start_time = time.perf_counter()
+        status = "error"
+        try:
+            result = await self._evaluate(original_artifact_id)
+            status = json.loads(result)["status"]
+            return result
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            tool_duration_seconds.labels(self.evaluate_type.value, status).observe(
+                time.perf_counter() - start_time
+            )
+
+    @traced("tool.evaluate")
+    async def _evaluate(self, original_artifact_id: str) -> str:
+        logger.info(
+            'evaluate_article, evaluate_type: %s, original_artifact_id: %s',
+            self.evaluate_type,
+            original_artifact_id,
         )
 
+        artifact_title = self.artifact_title
+        artifact_type = ArtifactType.COMMENT
+        original_artifact = artifact_manager.get_artifact(original_artifact_id)
+
         # 1. 发送ARTIFACT_CONTENT_START事件
         generated_artifact_id = artifact_manager.generate_artifact_id()
+        tool_span = current_span()
+        tool_span.set_attributes(
+            {
+                "tool.evaluate_type": self.evaluate_type.value,
+                "artifact.original_id": original_artifact_id,
+                "artifact.id": generated_artifact_id,
+            }
+        )
 
         write_sse_event(
             ArtifactContentStartEvent.new(
@@ -55,32 +155,17 @@ class ArticleEvaluator:
             )
         )
 
-        # 2. 准备评价prompt
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt),
-        ]
-
-        # 3. 调用LLM并流式生成内容
-        llm = create_llm_client()
-        llm_result_content = ''
+        # 2. 调用LLM并流式发送ARTIFACT_CONTENT_CHUNK事件
+        llm_result_content, timed_out = await self.generate(
+            original_artifact, generated_artifact_id
+        )
 
-        # 4. 流式发送ARTIFACT_CONTENT_CHUNK事件 - 实时流式处理
-        for chunk in llm.stream(messages):
-            if chunk.content:
-                write_sse_event(
-                    ArtifactContentChunkEvent.new(
-                        artifact_id=generated_artifact_id, content=chunk.content
-                    )
-                )
-                llm_result_content += chunk.content
-
-        # 5. 发送ARTIFACT_CONTENT_COMPLETE事件
+        # 3. 发送ARTIFACT_CONTENT_COMPLETE事件
         write_sse_event(
             ArtifactContentCompleteEvent.new(artifact_id=generated_artifact_id)
         )
 
-        # 6. 创建artifact并发送ARTIFACT_LIST_UPDATED事件
+        # 4. 创建artifact并发送ARTIFACT_LIST_UPDATED事件
         # 保证artifact_id与生成的一致，避免前端显示错误
         artifact = artifact_manager.create_artifact_with_id(
             artifact_id=generated_artifact_id,
@@ -88,6 +173,7 @@ class ArticleEvaluator:
             content=llm_result_content,
             artifact_type=artifact_type,
             role=ArtifactRole.ASSISTANT,
+            description=PARTIAL_ARTIFACT_DESCRIPTION if timed_out else None,
         )
 
         write_sse_event(
@@ -99,11 +185,13 @@ class ArticleEvaluator:
             )
         )
 
+        tool_span.set_attribute("tool.status", "timeout" if timed_out else "completed")
         return json.dumps(
             {
                 "evaluate_type": self.evaluate_type.value,
                 "artifact_id": artifact.id,
                 "title": artifact.title,
+                "status": "timeout" if timed_out else "completed",
             }
         )
 
@@ -121,7 +209,7 @@ class ArticleEvaluatorTool:
 
     @staticmethod
     @tool
-    def write_comment(original_artifact_id: str) -> str:
+    async def write_comment(original_artifact_id: str) -> str:
         """
         评价这篇文章的质量，包括读者画像分析和六大维度评估
 
@@ -132,13 +220,13 @@ class ArticleEvaluatorTool:
             str: 评价结果的元数据
         """
         evaluator = ArticleEvaluator(EvaluateType.COMMENT)
-        result = evaluator.evaluate(original_artifact_id)
-        print(f'tool call finished, tool name: write_comment, result: {result}')
+        result = await evaluator.evaluate(original_artifact_id)
+        logger.info('tool call finished, tool name: write_comment, result: %s', result)
         return result
 
     @staticmethod
     @tool
-    def write_candidate_titles(original_artifact_id: str) -> str:
+    async def write_candidate_titles(original_artifact_id: str) -> str:
         """
         根据文章内容，撰写三个候选标题
 
@@ -149,15 +237,15 @@ class ArticleEvaluatorTool:
             str: 候选标题的元数据
         """
         evaluator = ArticleEvaluator(EvaluateType.TITLE)
-        result = evaluator.evaluate(original_artifact_id)
-        print(
-            f'tool call finished, tool name: write_candidate_titles, result: {result}'
+        result = await evaluator.evaluate(original_artifact_id)
+        logger.info(
+            'tool call finished, tool name: write_candidate_titles, result: %s', result
         )
         return result
 
     @staticmethod
     @tool
-    def write_introduction(original_artifact_id: str) -> str:
+    async def write_introduction(original_artifact_id: str) -> str:
         """
         根据文章内容，撰写一篇介绍语
         Args:
@@ -167,6 +255,8 @@ class ArticleEvaluatorTool:
             str: 介绍语的元数据
         """
         evaluator = ArticleEvaluator(EvaluateType.INTRODUCTION)
-        result = evaluator.evaluate(original_artifact_id)
-        print(f'tool call finished, tool name: write_introduction, result: {result}')
+        result = await evaluator.evaluate(original_artifact_id)
+        logger.info(
+            'tool call finished, tool name: write_introduction, result: %s', result
+        )
         return result
@@ -0,0 +1,523 @@
+# 进程内的分布式追踪：HTTP 请求、代理图节点、工具调用与存储操作的 span
+#
+# span 通过 contextvars 传递，FastAPI 请求中创建的运行任务、LangGraph 节点和工具
+# 都继承请求的追踪上下文。结束的 span 由后台线程按 OTLP/JSON 格式导出到文件或
+# OTLP/HTTP 采集端，未配置导出时 span() 不记录任何数据。
+#
+# 查看一次运行的瀑布图：
+#   uv run trace-view traces.jsonl
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from pathlib import Path
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# span 导出文件（JSONL，每行一个 OTLP ExportTraceServiceRequest），未配置时不写文件
+TRACE_PATH = os.getenv('SYNPHORA_TRACE_PATH')
+
+# OTLP/HTTP JSON 采集端，如 http://127.0.0.1:4318/v1/traces，未配置时不发送
+TRACE_OTLP_ENDPOINT = os.getenv('SYNPHORA_TRACE_OTLP_ENDPOINT')
+
+SERVICE_NAME = os.getenv('SYNPHORA_SERVICE_NAME', 'synphora')
+
+# 后台线程每次导出的最大 span 数
+EXPORT_BATCH_SIZE = 512
+
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+_SPAN_KIND_INTERNAL = 1
+_SPAN_KIND_SERVER = 2
+
+
+class Span:
+    """一个已开始的 span，结束后交给导出线程"""
+
+    is_recording = True
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        kind: int = _SPAN_KIND_INTERNAL,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes: dict[str, str | int | float | bool] = {}
+        self.error: str | None = None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException):
+        self.error = f'{type(error).__name__}: {error}'
+
+    @property
+    def traceparent(self) -> str:
+        """W3C Trace Context 请求头"""
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def to_otlp(self) -> dict:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": _STATUS_ERROR, "message": self.error}
+            if self.error
+            else {"code": _STATUS_OK},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+class _NonRecordingSpan:
+    """未启用追踪时的 span，所有操作都是空操作"""
+
+    is_recording = False
+    trace_id = None
+    traceparent = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def set_attributes(self, attributes: dict):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+
+# 当前上下文中的 span，也可以是来自请求头的远程父 span（只有 trace_id 和 span_id）
+_current_span: ContextVar[Span | None] = ContextVar('current_span', default=None)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+def _parse_traceparent(header: str) -> tuple[str, str] | None:
+    parts = header.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None
+    return parts[1], parts[2]
+
+
+class SpanExporter:
+    """span 导出目标，在后台线程中按批调用"""
+
+    def export(self, spans: list[Span]):
+        raise NotImplementedError
+
+
+def _export_request(spans: list[Span]) -> dict:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": SERVICE_NAME})
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "synphora"},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class FileSpanExporter(SpanExporter):
+    """追加写入 JSONL 文件，格式与 OpenTelemetry Collector 的 file exporter 一致"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def export(self, spans: list[Span]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(_export_request(spans), ensure_ascii=False) + '\n')
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """以 OTLP/HTTP JSON 发送到采集端"""
+
+    def __init__(self, endpoint: str, timeout: float = 5):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: list[Span]):
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(_export_request(spans)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class _SpanProcessor:
+    """结束的 span 放入队列，由后台线程批量导出，不阻塞事件循环"""
+
+    def __init__(self, exporters: list[SpanExporter]):
+        self.exporters = exporters
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run, name="synphora-tracing", daemon=True
+        )
+        self._thread.start()
+
+    def on_end(self, span: Span):
+        self._queue.put(span)
+
+    def _export(self, spans: list[Span]):
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception:
+                logger.exception('failed to export %d spans', len(spans))
+
+    def _run(self):
+        while True:
+            spans: list[Span] = []
+            item = self._queue.get()
+            # 队列中已有的 span 合并为一批，遇到 flush / 停止标记时先导出已取出的部分
+            while isinstance(item, Span):
+                spans.append(item)
+                if len(spans) >= EXPORT_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+                    break
+            if spans:
+                self._export(spans)
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    def flush(self, timeout: float = 5):
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def shutdown(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+
+_STOP = object()
+
+_processor: _SpanProcessor | None = None
+
+
+def configure_tracing(
+    path: str | None = TRACE_PATH,
+    endpoint: str | None = TRACE_OTLP_ENDPOINT,
+    exporters: list[SpanExporter] | None = None,
+):
+    """
+    按配置启用追踪，path 和 endpoint 都未配置且没有传入 exporters 时关闭追踪
+
+    重复调用会先导出之前的 span 再替换配置。
+    """
+    global _processor
+
+    exporters = list(exporters or [])
+    if path:
+        exporters.append(FileSpanExporter(path))
+    if endpoint:
+        exporters.append(OtlpHttpSpanExporter(endpoint))
+
+    stop_tracing()
+    if exporters:
+        _processor = _SpanProcessor(exporters)
+
+
+def flush_tracing():
+    """等待已结束的 span 全部导出"""
+    if _processor is not None:
+        _processor.flush()
+
+
+def stop_tracing():
+    global _processor
+    if _processor is not None:
+        _processor.shutdown()
+        _processor = None
+
+
+atexit.register(stop_tracing)
+
+
+def _stop_tracing_before_fork():
+    """导出线程在 fork 前停止，父子进程（serve 的 worker）中各自以相同的导出目标重新启动"""
+    if _processor is not None:
+        _processor.shutdown()
+
+
+def _restart_tracing_after_fork():
+    global _processor
+    if _processor is not None:
+        _processor = _SpanProcessor(_processor.exporters)
+
+
+os.register_at_fork(
+    before=_stop_tracing_before_fork,
+    after_in_parent=_restart_tracing_after_fork,
+    after_in_child=_restart_tracing_after_fork,
+)
+
+
+def current_span() -> Span | _NonRecordingSpan:
+    span = _current_span.get()
+    return span if isinstance(span, Span) else NON_RECORDING_SPAN
+
+
+@contextmanager
+def span(
+    name: str, attributes: dict | None = None, kind: int = _SPAN_KIND_INTERNAL
+) -> Iterator[Span | _NonRecordingSpan]:
+    """
+    在当前追踪上下文中开始一个子 span，没有父 span 时开始新的追踪
+
+    只能在普通函数或协程中使用，不要跨越异步生成器的 yield。
+    """
+    processor = _processor
+    if processor is None:
+        yield NON_RECORDING_SPAN
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+        kind=kind,
+    )
+    if attributes:
+        current.set_attributes(attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        processor.on_end(current)
+
+
+def traced(name: str):
+    """把整个函数调用记录为一个 span，支持普通函数和协程函数"""
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class _RemoteParent:
+    """请求头 traceparent 中的父 span，只用于继承 trace_id 和 parent_id"""
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class TracingMiddleware:
+    """
+    为每个 HTTP 请求创建根 span，接受 W3C traceparent 请求头以接入调用方的追踪
+
+    响应带 traceparent 头，客户端可以据此在导出的追踪中找到本次请求。流式响应的
+    span 在最后一帧发送完毕后结束，期间创建的运行任务都是它的子 span。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or _processor is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                parent = _parse_traceparent(value.decode("latin-1"))
+                if parent:
+                    token = _current_span.set(_RemoteParent(*parent))
+                break
+
+        try:
+            with span(
+                f'{scope["method"]} {scope["path"]}',
+                {"http.method": scope["method"], "http.target": scope["path"]},
+                kind=_SPAN_KIND_SERVER,
+            ) as request_span:
+
+                async def send_wrapper(message: Message):
+                    if message["type"] == "http.response.start":
+                        request_span.set_attribute(
+                            "http.status_code", message["status"]
+                        )
+                        headers = MutableHeaders(scope=message)
+                        headers["traceparent"] = request_span.traceparent
+                    await send(message)
+
+                await self.app(scope, receive, send_wrapper)
+
+                # 路由匹配后以路由模板命名，与指标的标签一致
+                route = scope.get("route")
+                if route is not None:
+                    request_span.name = f'{scope["method"]} {route.path}'
+                    request_span.set_attribute("http.route", route.path)
+        finally:
+            if token is not None:
+                _current_span.reset(token)
+
+
+def _attribute_value(value: dict):
+    for key in ["stringValue", "boolValue", "doubleValue"]:
+        if key in value:
+            return value[key]
+    return int(value.get("intValue", 0))
+
+
+def load_spans(path: Path) -> list[dict]:
+    """读取导出文件中的所有 span"""
+    spans = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line)["resourceSpans"]:
+                for scope_spans in resource_spans["scopeSpans"]:
+                    spans.extend(scope_spans["spans"])
+    return spans
+
+
+def format_waterfall(spans: list[dict], width: int = 40) -> str:
+    """把一个追踪的 span 按父子关系和开始时间排列为文本瀑布图"""
+    start = min(int(s["startTimeUnixNano"]) for s in spans)
+    end = max(int(s["endTimeUnixNano"]) for s in spans)
+    total = max(end - start, 1)
+    span_ids = {s["spanId"] for s in spans}
+    children: dict[str | None, list[dict]] = {}
+    for s in spans:
+        parent_id = s.get("parentSpanId")
+        children.setdefault(parent_id if parent_id in span_ids else None, []).append(s)
+
+    lines = [f'trace {spans[0]["traceId"]}  {total / 1e6:.1f} ms']
+
+    def visit(parent_id: str | None, depth: int):
+        for s in sorted(
+            children.get(parent_id, []), key=lambda s: int(s["startTimeUnixNano"])
+        ):
+            offset = int(s["startTimeUnixNano"]) - start
+            duration = int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])
+            bar_start = offset * width // total
+            bar_width = max(duration * width // total, 1)
+            bar = ' ' * bar_start + '█' * bar_width
+            attributes = ' '.join(
+                f'{a["key"]}={_attribute_value(a["value"])}' for a in s["attributes"]
+            )
+            status = ' ERROR' if s["status"].get("code") == _STATUS_ERROR else ''
+            name = '  ' * depth + s["name"]
+            lines.append(
+                f'{offset / 1e6:>9.1f} {duration / 1e6:>9.1f} ms  '
+                f'{name:<36} |{bar:<{width}}|{status} {attributes}'
+            )
+            visit(s["spanId"], depth + 1)
+
+    visit(None, 0)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以瀑布图查看导出的追踪")
+    parser.add_argument("path", type=Path, help="SYNPHORA_TRACE_PATH 导出的 JSONL 文件")
+    parser.add_argument("--trace-id", help="追踪 ID，默认为最近的一次 HTTP 请求")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    if not spans:
+        print("no spans found")
+        return
+    # 默认查看最近的一次 HTTP 请求，没有请求时查看最近开始的追踪
+    requests = [s for s in spans if s["kind"] == _SPAN_KIND_SERVER] or spans
+    trace_id = (
+        args.trace_id
+        or max(requests, key=lambda s: int(s["startTimeUnixNano"]))["traceId"]
+    )
+    print(format_waterfall([s for s in spans if s["traceId"] == trace_id]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+from contextvars import ContextVar
+from functools import lru_cache
+
+from pydantic import BaseModel
+
+from synphora.llm import LlmTask
+from synphora.sse import RunUsageEvent, TokenUsageData
+from synphora.tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+
+class LlmUsage(BaseModel):
+    """单次或累计的 LLM 词元用量"""
+
+    input_tokens: int = 0
+    # 命中上游提示词前缀缓存的输入词元数
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+    # 按价格表估算的费用，未配置价格的模型计为 0
+    cost: float = 0.0
+
+    @property
+    def uncached_input_tokens(self) -> int:
+        return self.input_tokens - self.cached_input_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    @classmethod
+    def from_metadata(cls, usage_metadata: dict | None) -> "LlmUsage":
+        """从 LangChain 消息的 usage_metadata 解析用量"""
+        if not usage_metadata:
+            return cls()
+        input_token_details = usage_metadata.get("input_token_details") or {}
+        return cls(
+            input_tokens=usage_metadata.get("input_tokens", 0),
+            cached_input_tokens=input_token_details.get("cache_read", 0),
+            output_tokens=usage_metadata.get("output_tokens", 0),
+        )
+
+    def __add__(self, other: "LlmUsage") -> "LlmUsage":
+        return LlmUsage(
+            input_tokens=self.input_tokens + other.input_tokens,
+            cached_input_tokens=self.cached_input_tokens + other.cached_input_tokens,
+            output_tokens=self.output_tokens + other.output_tokens,
+            cost=self.cost + other.cost,
+        )
+
+    def to_data(self) -> TokenUsageData:
+        return TokenUsageData(**self.model_dump())
+
+
+class ModelPrice(BaseModel):
+    """模型单价，单位为每百万词元的费用"""
+
+    input: float = 0.0
+    # 未配置时按普通输入价格计算
+    cached_input: float | None = None
+    output: float = 0.0
+
+    def cost(self, usage: LlmUsage) -> float:
+        cached_input = self.input if self.cached_input is None else self.cached_input
+        return (
+            usage.uncached_input_tokens * self.input
+            + usage.cached_input_tokens * cached_input
+            + usage.output_tokens * self.output
+        ) / 1_000_000
+
+
+@lru_cache(maxsize=1)
+def _get_price_table() -> dict[str, ModelPrice]:
+    """
+    读取价格表
+
+    SYNPHORA_LLM_PRICES 可以是 JSON 字符串或 JSON 文件路径，格式：
+    {"<model>": {"input": 2.5, "cached_input": 1.25, "output": 10}}
+    """
+    value = os.getenv('SYNPHORA_LLM_PRICES', '').strip()
+    if not value:
+        return {}
+    if not value.startswith("{"):
+        with open(value, encoding='utf-8') as f:
+            value = f.read()
+    return {model: ModelPrice(**price) for model, price in json.loads(value).items()}
+
+
+def estimate_cost(model: str | None, usage: LlmUsage) -> float:
+    price = _get_price_table().get(model) if model else None
+    return price.cost(usage) if price else 0.0
+
+
+class RunUsage:
+    """单次代理运行的用量，按节点、工具和整体汇总"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.nodes: dict[str, LlmUsage] = {}
+        self.tools: dict[str, LlmUsage] = {}
+        self.total = LlmUsage()
+        self.context_tokens_saved = 0
+
+    def record(self, task: LlmTask, usage: LlmUsage):
+        # 推理任务归属 reason 节点；评价任务在 act 节点中由对应工具执行
+        evaluate_type = task.evaluate_type
+        node = "act" if evaluate_type else task.value
+        with self._lock:
+            self.nodes[node] = self.nodes.get(node, LlmUsage()) + usage
+            if evaluate_type:
+                tool = evaluate_type.value
+                self.tools[tool] = self.tools.get(tool, LlmUsage()) + usage
+            self.total += usage
+
+    def record_context_compaction(self, tokens_saved: int):
+        with self._lock:
+            self.context_tokens_saved += tokens_saved
+
+    def to_event(self) -> RunUsageEvent:
+        with self._lock:
+            return RunUsageEvent.new(
+                total=self.total.to_data(),
+                nodes={name: usage.to_data() for name, usage in self.nodes.items()},
+                tools={name: usage.to_data() for name, usage in self.tools.items()},
+                context_tokens_saved=self.context_tokens_saved,
+            )
+
+
+# 当前代理运行的用量，由运行任务设置，图中的节点和工具继承该上下文
+current_run_usage: ContextVar[RunUsage | None] = ContextVar(
+    'current_run_usage', default=None
+)
+
+
+class UsageStats:
+    """按任务累计的 LLM 用量，以及已完成运行的汇总"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: dict[LlmTask, LlmUsage] = {}
+        self.runs = 0
+        self.run_total = LlmUsage()
+        self.context_tokens_saved = 0
+
+    def record(self, task: LlmTask, usage: LlmUsage):
+        with self._lock:
+            self._usage[task] = self._usage.get(task, LlmUsage()) + usage
+
+    def record_run(self, run_usage: RunUsage):
+        with self._lock:
+            self.runs += 1
+            self.run_total += run_usage.total
+            self.context_tokens_saved += run_usage.context_tokens_saved
+
+    def snapshot(self) -> dict[LlmTask, LlmUsage]:
+        with self._lock:
+            return dict(self._usage)
+
+
+usage_stats = UsageStats()
+
+
+def record_llm_usage(
+    task: LlmTask, usage_metadata: dict | None, model: str | None = None
+) -> LlmUsage:
+    """记录一次 LLM 调用的用量，区分命中缓存与未命中缓存的输入词元"""
+    usage = LlmUsage.from_metadata(usage_metadata)
+    usage.cost = estimate_cost(model, usage)
+
+    usage_stats.record(task, usage)
+    run_usage = current_run_usage.get()
+    if run_usage is not None:
+        run_usage.record(task, usage)
+
+    current_span().set_attributes(
+        {
+            "llm.task": task.value,
+            "llm.model": model,
+            "llm.input_tokens": usage.input_tokens,
+            "llm.cached_input_tokens": usage.cached_input_tokens,
+            "llm.output_tokens": usage.output_tokens,
+        }
+    )
+
+    logger.info(
+        'llm usage, task: %s, model: %s, input_tokens: %d, cached_input_tokens: %d, '
+        'output_tokens: %d, cost: %.6f',
+        task.value,
+        model,
+        usage.input_tokens,
+        usage.cached_input_tokens,
+        usage.output_tokens,
+        usage.cost,
+    )
+    return usage
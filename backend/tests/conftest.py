@@ -0,0 +1,78 @@
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from synphora.fake_llm import FakeLlmConfig, create_app
+from synphora.llm import clear_llm_cache
+from synphora.tracing import SpanExporter, configure_tracing, stop_tracing
+
+
+class FakeLlmServer:
+    """在后台线程中运行的本地 fake LLM 服务"""
+
+    def __init__(self, config: FakeLlmConfig):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self.base_url = f"http://127.0.0.1:{self._sock.getsockname()[1]}/v1"
+        self._server = uvicorn.Server(
+            uvicorn.Config(create_app(config), log_level="warning")
+        )
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._sock]}, daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+@pytest.fixture
+def fake_llm(request, monkeypatch):
+    """启动 fake LLM 服务，并通过环境变量将代理指向它
+
+    可通过 @pytest.mark.fake_llm(ttft_ms=..., ...) 覆盖服务配置。
+    """
+    marker = request.node.get_closest_marker("fake_llm")
+    overrides = {"ttft_ms": 0, "tokens_per_second": 1000}
+    if marker:
+        overrides.update(marker.kwargs)
+    config = FakeLlmConfig(**overrides)
+    server = FakeLlmServer(config)
+    server.start()
+
+    monkeypatch.setenv("LLM_BASE_URL", server.base_url)
+    monkeypatch.setenv("LLM_API_KEY", "fake")
+    monkeypatch.setenv("LLM_MODEL", "fake")
+    clear_llm_cache()
+
+    yield server
+
+    server.stop()
+    clear_llm_cache()
+
+
+class ListSpanExporter(SpanExporter):
+    """把导出的 span 以 OTLP/JSON 格式保存在列表中"""
+
+    def __init__(self):
+        self.spans: list[dict] = []
+
+    def export(self, spans):
+        self.spans.extend(span.to_otlp() for span in spans)
+
+
+@pytest.fixture
+def span_exporter():
+    """启用追踪，导出到内存中的列表"""
+    exporter = ListSpanExporter()
+    configure_tracing(path=None, endpoint=None, exporters=[exporter])
+    yield exporter
+    stop_tracing()
@@ -0,0 +1,345 @@
+"""
+Agent 接口端到端测试，使用本地 fake LLM 服务
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import SystemMessage, ToolMessage
+
+from synphora import agent, tool
+from synphora.agent import get_agent_graph
+from synphora.artifact_manager import artifact_manager
+from synphora.llm import LlmTask
+from synphora.models import AgentRequest
+from synphora.router import router_stats
+from synphora.server import app
+from synphora.tracing import flush_tracing
+from synphora.usage import LlmUsage, _get_price_table, usage_stats
+
+
+def read_sse_events(response) -> list[dict]:
+    return [
+        json.loads(line.removeprefix("data: "))
+        for line in response.iter_lines()
+        if line.startswith("data: ")
+    ]
+
+
+class TestAgent:
+    """Agent SSE 接口测试"""
+
+    @pytest.fixture
+    def client(self, fake_llm):
+        """FastAPI 测试客户端，多次请求共用同一个事件循环，启动预热连接 fake LLM"""
+        with TestClient(app) as client:
+            yield client
+
+    @pytest.fixture
+    def original_artifact(self):
+        artifact = artifact_manager.create_artifact(
+            title="测试文章.md", content="这是一篇用于测试的文章。"
+        )
+        yield artifact
+        artifact_manager.clear_all()
+
+    def test_agent_tool_call_flow(self, client, fake_llm, original_artifact):
+        """较长的请求经 LLM 推理后调用工具并生成 artifact"""
+        message = "我刚写完这篇文章，准备发到公众号上，麻烦帮我想几个吸引人的候选标题"
+        with client.stream("POST", "/agent", json={"message": message}) as response:
+            assert response.status_code == 200
+            events = read_sse_events(response)
+
+        types = [event["type"] for event in events]
+        assert types[0] == "RUN_STARTED"
+        assert types[-1] == "RUN_FINISHED"
+        assert "ARTIFACT_CONTENT_START" in types
+        assert "ARTIFACT_CONTENT_COMPLETE" in types
+
+        list_updated = next(e for e in events if e["type"] == "ARTIFACT_LIST_UPDATED")
+        artifact = artifact_manager.get_artifact(list_updated["data"]["artifact_id"])
+        assert artifact.title == "候选标题"
+        chunks = "".join(
+            e["data"]["content"]
+            for e in events
+            if e["type"] == "ARTIFACT_CONTENT_CHUNK"
+        )
+        assert artifact.content == chunks
+
+    def test_agent_metrics_cover_each_stage(self, client, fake_llm, original_artifact):
+        """一次带工具调用的运行之后，/metrics 包含各阶段的耗时"""
+        message = "我刚写完这篇文章，准备发到公众号上，麻烦帮我想几个吸引人的候选标题"
+        with client.stream("POST", "/agent", json={"message": message}) as response:
+            read_sse_events(response)
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert (
+            'synphora_http_requests_total{method="POST",route="/agent",status="200"}'
+            in text
+        )
+        assert 'synphora_llm_time_to_first_token_seconds_count{task="reason"}' in text
+        assert (
+            'synphora_llm_output_tokens_per_second_count{task="evaluate_title"}' in text
+        )
+        assert 'synphora_node_duration_seconds_count{node="reason"}' in text
+        assert (
+            'synphora_tool_duration_seconds_count{evaluate_type="title",status="completed"}'
+            in text
+        )
+        assert (
+            'synphora_storage_operation_duration_seconds_count{operation="create"}'
+            in text
+        )
+        assert "synphora_sse_active_connections 0" in text
+        assert 'synphora_router_decisions_total{path="fallback"}' in text
+
+    def test_agent_trace_covers_each_stage(
+        self, client, fake_llm, original_artifact, span_exporter
+    ):
+        """一次运行的 span 属于同一个追踪：请求、节点、工具、LLM 调用和存储操作"""
+        message = "我刚写完这篇文章，准备发到公众号上，麻烦帮我想几个吸引人的候选标题"
+        with client.stream("POST", "/agent", json={"message": message}) as response:
+            read_sse_events(response)
+            traceparent = response.headers["traceparent"]
+        flush_tracing()
+
+        trace_id = traceparent.split("-")[1]
+        spans = [s for s in span_exporter.spans if s["traceId"] == trace_id]
+        by_id = {s["spanId"]: s for s in spans}
+        names = {s["name"] for s in spans}
+        assert {
+            "POST /agent",
+            "agent.run",
+            "agent.prepare_input",
+            "prompt.render",
+            "node.reason",
+            "tool.evaluate",
+            "llm.generate",
+            "storage.create",
+        } <= names
+
+        tool_span = next(s for s in spans if s["name"] == "tool.evaluate")
+        attributes = {a["key"]: a["value"] for a in tool_span["attributes"]}
+        assert attributes["tool.evaluate_type"] == {"stringValue": "title"}
+        assert attributes["tool.status"] == {"stringValue": "completed"}
+        storage_span = next(s for s in spans if s["name"] == "storage.create")
+        assert by_id[storage_span["parentSpanId"]]["name"] == "tool.evaluate"
+        reason_span = next(s for s in spans if s["name"] == "node.reason")
+        assert "llm.output_tokens" in {a["key"] for a in reason_span["attributes"]}
+
+    @pytest.mark.fake_llm(tokens_per_second=20, response_tokens=100)
+    def test_agent_tool_timeout_saves_partial_content(
+        self, client, fake_llm, original_artifact, monkeypatch
+    ):
+        """工具调用超时时，保存已生成的部分内容"""
+        monkeypatch.setattr(tool, "TOOL_TIMEOUT_SECONDS", 0.5)
+
+        with client.stream(
+            "POST", "/agent", json={"message": "请评价这篇文章"}
+        ) as response:
+            events = read_sse_events(response)
+
+        assert events[-1]["type"] == "RUN_FINISHED"
+        list_updated = next(e for e in events if e["type"] == "ARTIFACT_LIST_UPDATED")
+        artifact = artifact_manager.get_artifact(list_updated["data"]["artifact_id"])
+        assert artifact.description == tool.PARTIAL_ARTIFACT_DESCRIPTION
+        assert 0 < len(artifact.content) < len("".join(["这篇"] * 100))
+
+    @pytest.mark.fake_llm(tool_calls="none")
+    def test_agent_fast_path_skips_reasoning(self, client, fake_llm, original_artifact):
+        """明确的常见请求由路由节点直接调用工具，不依赖 LLM 的工具选择"""
+        before = router_stats.snapshot()
+
+        with client.stream(
+            "POST", "/agent", json={"message": "撰写介绍语"}
+        ) as response:
+            events = read_sse_events(response)
+
+        messages = [e["data"]["content"] for e in events if e["type"] == "TEXT_MESSAGE"]
+        assert messages == ["我将为你生成介绍语。", "介绍语已生成。"]
+        assert any(e["type"] == "ARTIFACT_LIST_UPDATED" for e in events)
+        assert router_stats.snapshot()["fast_path"] == before["fast_path"] + 1
+
+    @pytest.mark.fake_llm(tool_calls="none")
+    def test_agent_low_confidence_falls_back_to_llm(
+        self, client, fake_llm, original_artifact
+    ):
+        """含糊的请求交给 LLM 推理"""
+        before = router_stats.snapshot()
+
+        with client.stream(
+            "POST", "/agent", json={"message": "这个标题怎么改会更好？"}
+        ) as response:
+            events = read_sse_events(response)
+
+        assert events[-1]["type"] == "RUN_FINISHED"
+        assert not any(e["type"] == "ARTIFACT_CONTENT_START" for e in events)
+        assert router_stats.snapshot()["fallback"] == before["fallback"] + 1
+
+    def test_agent_prompt_prefix_is_cacheable(
+        self, client, fake_llm, original_artifact
+    ):
+        """同一评价类型的重复请求命中提示词前缀缓存"""
+        task = LlmTask.EVALUATE_INTRODUCTION
+        before = usage_stats.snapshot().get(task, LlmUsage())
+
+        for _ in range(2):
+            with client.stream(
+                "POST", "/agent", json={"message": "撰写介绍语"}
+            ) as response:
+                read_sse_events(response)
+
+        usage = usage_stats.snapshot()[task]
+        assert usage.input_tokens > before.input_tokens
+        assert usage.cached_input_tokens > before.cached_input_tokens
+
+    def test_agent_reports_run_usage(
+        self, client, fake_llm, original_artifact, monkeypatch
+    ):
+        """运行结束前发送用量汇总，并按价格表估算费用"""
+        monkeypatch.setenv(
+            "SYNPHORA_LLM_PRICES", '{"fake": {"input": 1000000, "output": 2000000}}'
+        )
+        _get_price_table.cache_clear()
+
+        message = "我刚写完这篇文章，准备发到公众号上，麻烦帮我想几个吸引人的候选标题"
+        with client.stream("POST", "/agent", json={"message": message}) as response:
+            events = read_sse_events(response)
+        _get_price_table.cache_clear()
+
+        assert [e["type"] for e in events[-2:]] == ["RUN_USAGE", "RUN_FINISHED"]
+        usage = events[-2]["data"]
+        assert set(usage["nodes"]) == {"reason", "act"}
+        assert set(usage["tools"]) == {"title"}
+        total = usage["total"]
+        assert total["input_tokens"] == sum(
+            node["input_tokens"] for node in usage["nodes"].values()
+        )
+        assert total["cost"] == total["input_tokens"] + 2 * total["output_tokens"]
+
+    def test_agent_thread_keeps_conversation(self, client, fake_llm, original_artifact):
+        """同一线程的多轮对话基于检查点延续，工具结果只引用 artifact ID"""
+        config = {"configurable": {"thread_id": "thread-multi-turn"}}
+        for message in ["撰写介绍语", "帮我取几个标题"]:
+            with client.stream(
+                "POST",
+                "/agent",
+                json={"message": message, "thread_id": "thread-multi-turn"},
+            ) as response:
+                events = read_sse_events(response)
+            assert events[-1]["type"] == "RUN_FINISHED"
+
+        messages = (
+            get_agent_graph(checkpointed=True).get_state(config).values["messages"]
+        )
+        assert sum(isinstance(m, SystemMessage) for m in messages) == 1
+        tool_results = [
+            json.loads(m.content) for m in messages if isinstance(m, ToolMessage)
+        ]
+        assert len(tool_results) == 2
+        assert all("artifact_id" in r and "content" not in r for r in tool_results)
+
+    @pytest.mark.fake_llm(tokens_per_second=20, response_tokens=10)
+    def test_agent_resumes_interrupted_run(
+        self, client, fake_llm, original_artifact, monkeypatch
+    ):
+        """被中断的运行从最后完成的节点继续，不重复已完成的路由"""
+        thread_id = "thread-resume"
+        monkeypatch.setattr(agent, "AGENT_TIMEOUT_SECONDS", 0.2)
+        with client.stream(
+            "POST", "/agent", json={"message": "撰写介绍语", "thread_id": thread_id}
+        ) as response:
+            events = read_sse_events(response)
+        assert not any(e["type"] == "ARTIFACT_LIST_UPDATED" for e in events)
+
+        monkeypatch.setattr(agent, "AGENT_TIMEOUT_SECONDS", 300)
+        with client.stream(
+            "POST", "/agent", json={"thread_id": thread_id, "resume": True}
+        ) as response:
+            events = read_sse_events(response)
+
+        types = [e["type"] for e in events]
+        assert types[0] == "RUN_STARTED"
+        assert types[-1] == "RUN_FINISHED"
+        assert "ARTIFACT_LIST_UPDATED" in types
+        messages = [e["data"]["content"] for e in events if e["type"] == "TEXT_MESSAGE"]
+        assert messages == ["介绍语已生成。"]
+
+    def test_agent_resume_requires_thread(self, client):
+        response = client.post("/agent", json={"resume": True})
+        assert response.status_code == 422
+
+    def test_agent_reconnect_replays_after_last_event_id(
+        self, client, fake_llm, original_artifact
+    ):
+        """每帧带有递增 id，重连时从 Last-Event-ID 之后补发"""
+        with client.stream(
+            "POST", "/agent", json={"message": "撰写介绍语"}
+        ) as response:
+            run_id = response.headers["X-Run-Id"]
+            lines = list(response.iter_lines())
+
+        ids = [
+            int(line.removeprefix("id: ")) for line in lines if line.startswith("id: ")
+        ]
+        assert ids == list(range(len(ids)))
+        data = [line for line in lines if line.startswith("data: ")]
+
+        with client.stream(
+            "GET", f"/agent/runs/{run_id}/events", headers={"Last-Event-ID": "1"}
+        ) as response:
+            replayed = [
+                line for line in response.iter_lines() if line.startswith("data: ")
+            ]
+        assert replayed == data[2:]
+
+        info = client.get(f"/agent/runs/{run_id}").json()
+        assert info["finished"] and info["events"] == len(ids)
+        assert client.get("/agent/runs/unknown/events").status_code == 404
+
+    def test_agent_cancel_with_full_queue(
+        self, client, fake_llm, original_artifact, monkeypatch
+    ):
+        """消费方停止读取、队列已满时取消运行，不会在发送结束标记时卡住"""
+        monkeypatch.setattr(agent, "SSE_QUEUE_SIZE", 2)
+
+        async def main():
+            events = agent.generate_agent_response(AgentRequest(message="撰写介绍语"))
+            await anext(events)
+            # 代理图继续产生事件直到队列满
+            await asyncio.sleep(0.5)
+            start_time = asyncio.get_running_loop().time()
+            await asyncio.wait_for(events.aclose(), timeout=5)
+            return asyncio.get_running_loop().time() - start_time
+
+        assert client.portal.call(main) < 1
+
+
+@pytest.mark.fake_llm(ttft_ms=200)
+def test_llm_message_does_not_block_event_loop(fake_llm):
+    """流式读取 LLM 回复时事件循环仍能调度其他任务"""
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        events = [
+            event async for event in agent.generate_llm_message([SystemMessage("你好")])
+        ]
+        ticker.cancel()
+        return events, ticks
+
+    events, ticks = asyncio.run(main())
+    assert events
+    assert ticks >= 5
@@ -0,0 +1,64 @@
+"""
+批量文章评价测试
+"""
+
+import asyncio
+
+from synphora.artifact_manager import artifact_manager
+from synphora.batch import load_articles, load_results, run_batch
+from synphora.models import EvaluateType
+
+
+def write_articles(directory):
+    directory.mkdir()
+    (directory / "a.md").write_text("第一篇文章的内容。", encoding="utf-8")
+    (directory / "b.txt").write_text("第二篇文章的内容。", encoding="utf-8")
+    (directory / "ignored.json").write_text("{}", encoding="utf-8")
+
+
+def test_batch_evaluate_and_resume(fake_llm, tmp_path):
+    """批量评价结果写入 JSONL，重新运行时跳过已完成的评价"""
+    write_articles(tmp_path / "articles")
+    articles = load_articles(tmp_path / "articles")
+    assert [article.id for article in articles] == ["a.md", "b.txt"]
+
+    output = tmp_path / "results.jsonl"
+    types = [EvaluateType.TITLE, EvaluateType.INTRODUCTION]
+    progress = asyncio.run(run_batch(articles, types, output, concurrency=2))
+    assert (progress.total, progress.failed) == (4, 0)
+
+    results = load_results(output)
+    assert {(r.article_id, r.evaluate_type) for r in results} == {
+        (article.id, evaluate_type) for article in articles for evaluate_type in types
+    }
+    assert all(r.status == "completed" and r.content for r in results)
+
+    progress = asyncio.run(run_batch(articles, types, output, concurrency=2))
+    assert progress.total == 0
+    assert len(load_results(output)) == 4
+
+
+def test_batch_save_artifacts(fake_llm, tmp_path):
+    articles_path = tmp_path / "articles.jsonl"
+    articles_path.write_text(
+        '{"id": "x", "title": "文章", "content": "文章内容。"}\n', encoding="utf-8"
+    )
+
+    try:
+        asyncio.run(
+            run_batch(
+                load_articles(articles_path),
+                [EvaluateType.COMMENT],
+                tmp_path / "results.jsonl",
+                save_artifacts=True,
+            )
+        )
+        [result] = load_results(tmp_path / "results.jsonl")
+        artifact = artifact_manager.get_artifact(result.artifact_id)
+        assert artifact.title == "文章评价"
+        assert artifact.content == result.content
+        assert (
+            artifact_manager.get_artifact(result.original_artifact_id).title == "文章"
+        )
+    finally:
+        artifact_manager.clear_all()
@@ -0,0 +1,53 @@
+"""
+SSE 分片合并测试
+"""
+
+from synphora.coalesce import SseCoalescer
+from synphora.sse import (
+    ArtifactContentChunkEvent,
+    ArtifactContentCompleteEvent,
+    ArtifactContentStartEvent,
+    EventType,
+    TextMessageEvent,
+)
+
+
+def test_coalesce_merges_consecutive_chunks_in_order():
+    coalescer = SseCoalescer(window_ms=1000, max_bytes=1024)
+    events = [
+        TextMessageEvent.new(message_id="m1", content="你"),
+        TextMessageEvent.new(message_id="m1", content="好"),
+        ArtifactContentStartEvent.new(artifact_id="a1", title="t", artifact_type="c"),
+        ArtifactContentChunkEvent.new(artifact_id="a1", content="第一"),
+        ArtifactContentChunkEvent.new(artifact_id="a1", content="段"),
+        ArtifactContentCompleteEvent.new(artifact_id="a1"),
+        TextMessageEvent.new(message_id="m2", content="完成"),
+    ]
+
+    output = [out for event in events for out in coalescer.add(event)]
+    output += coalescer.flush()
+
+    assert [(e.type, getattr(e.data, "content", None)) for e in output] == [
+        (EventType.TEXT_MESSAGE, "你好"),
+        (EventType.ARTIFACT_CONTENT_START, None),
+        (EventType.ARTIFACT_CONTENT_CHUNK, "第一段"),
+        (EventType.ARTIFACT_CONTENT_COMPLETE, None),
+        (EventType.TEXT_MESSAGE, "完成"),
+    ]
+    assert (coalescer.events_in, coalescer.events_out) == (7, 5)
+
+
+def test_coalesce_flushes_at_size_threshold():
+    coalescer = SseCoalescer(window_ms=1000, max_bytes=4)
+    first = coalescer.add(TextMessageEvent.new(message_id="m", content="ab"))
+    second = coalescer.add(TextMessageEvent.new(message_id="m", content="cd"))
+    assert first == []
+    assert [e.data.content for e in second] == ["abcd"]
+    assert coalescer.timeout() is None
+
+
+def test_coalesce_disabled_passes_events_through():
+    coalescer = SseCoalescer(window_ms=0)
+    event = TextMessageEvent.new(message_id="m", content="a")
+    assert coalescer.add(event) == [event]
+    assert coalescer.timeout() is None
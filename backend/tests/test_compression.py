@@ -0,0 +1,80 @@
+"""
+响应压缩测试
+"""
+
+import asyncio
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from synphora.compression import CompressionMiddleware, choose_encoding
+
+
+def test_choose_encoding_honours_server_preference_and_q_values():
+    assert choose_encoding("gzip, deflate", ["zstd", "br", "gzip"]) == "gzip"
+    assert choose_encoding("gzip;q=0, deflate", ["gzip"]) is None
+    assert choose_encoding("*", ["gzip"]) == "gzip"
+    assert choose_encoding("", ["gzip"]) is None
+    assert choose_encoding("gzip", []) is None
+
+
+def test_sse_frames_are_flushed_individually():
+    """每个压缩后的数据块都能立即解压出完整的帧"""
+    frames = [f"id: {i}\ndata: {{\"content\": \"第{i}段\"}}\n\n" for i in range(3)]
+
+    async def sse_app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            }
+        )
+        for frame in frames:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": frame.encode(),
+                    "more_body": True,
+                }
+            )
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(sse_app)(scope, None, send))
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    bodies = [message["body"] for message in messages[1:]]
+    for frame, body in zip(frames, bodies, strict=False):
+        assert decompressor.decompress(body).decode() == frame
+    assert decompressor.decompress(bodies[-1]) == b""
+    assert decompressor.eof
+
+
+def test_only_large_responses_are_compressed():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/text/{size}")
+    def text(size: int):
+        return PlainTextResponse("文" * size)
+
+    with TestClient(app) as client:
+        small = client.get("/text/10", headers={"Accept-Encoding": "gzip"})
+        large = client.get("/text/1000", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in small.headers
+    assert large.headers["content-encoding"] == "gzip"
+    assert int(large.headers["content-length"]) < 3000
+    assert large.text == "文" * 1000
@@ -0,0 +1,121 @@
+"""
+上下文预算压缩测试
+"""
+
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from synphora.context import compact_messages, estimate_tokens
+
+
+def make_turn(index: int, content: str) -> list:
+    call_id = f"call_{index}"
+    return [
+        HumanMessage(content=f"第{index}轮请求"),
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "write_comment", "args": {}, "id": call_id}],
+        ),
+        ToolMessage(
+            content=json.dumps(
+                {"artifact_id": f"a{index}", "status": "completed", "content": content},
+                ensure_ascii=False,
+            ),
+            tool_call_id=call_id,
+        ),
+        AIMessage(content="结果已生成。"),
+    ]
+
+
+def test_compact_within_budget_keeps_messages():
+    messages = [SystemMessage(content="系统提示词"), *make_turn(1, "内容")]
+    compacted, saved = compact_messages(messages, budget=10_000)
+    assert compacted is messages
+    assert saved == 0
+
+
+def test_compact_elides_old_tool_results_and_keeps_recent_turns():
+    system = SystemMessage(content="系统提示词")
+    turns = [make_turn(i, "很长的工具输出" * 200) for i in range(4)]
+    messages = [system] + [m for turn in turns for m in turn]
+    recent = turns[-2][0:] + turns[-1]
+    budget = estimate_tokens([system, *recent]) + 50
+
+    compacted, saved = compact_messages(messages, budget)
+
+    assert compacted[0] is system
+    assert compacted[-len(recent) :] == recent
+    assert estimate_tokens(compacted) <= budget
+    assert saved == estimate_tokens(messages) - estimate_tokens(compacted)
+    # 保留下来的较早轮次只剩工具结果的引用信息，工具调用与结果成对出现
+    older = compacted[1 : -len(recent)]
+    for message in older:
+        if isinstance(message, ToolMessage):
+            assert json.loads(message.content).keys() == {"artifact_id", "status"}
+    assert sum(isinstance(m, ToolMessage) for m in older) == sum(
+        len(m.tool_calls) for m in older if isinstance(m, AIMessage)
+    )
+
+
+def make_tool_heavy_turn(iterations: int, content: str) -> list:
+    """一次运行中多次推理与工具调用的循环，尚未产生最终回复"""
+    messages: list = [HumanMessage(content="评价这篇文章，再起几个标题")]
+    for index in range(iterations):
+        call_id = f"call_{index}"
+        messages += [
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "write_comment", "args": {}, "id": call_id}],
+            ),
+            ToolMessage(
+                content=json.dumps(
+                    {
+                        "artifact_id": f"a{index}",
+                        "status": "completed",
+                        "content": content,
+                    },
+                    ensure_ascii=False,
+                ),
+                tool_call_id=call_id,
+            ),
+        ]
+    return messages
+
+
+def test_compact_elides_tool_iterations_within_current_turn():
+    """当前轮次中的工具调用循环超出预算时，除最后一次外省略工具结果"""
+    system = SystemMessage(content="系统提示词")
+    messages = [system, *make_tool_heavy_turn(4, "很长的工具输出" * 200)]
+    last_iteration = messages[-2:]
+    budget = estimate_tokens([system, messages[1], *last_iteration]) + 200
+
+    compacted, saved = compact_messages(messages, budget)
+
+    assert compacted[:2] == messages[:2]
+    assert compacted[-2:] == last_iteration
+    assert len(compacted) == len(messages)
+    for message in compacted[2:-2]:
+        if isinstance(message, ToolMessage):
+            assert json.loads(message.content).keys() == {"artifact_id", "status"}
+    assert estimate_tokens(compacted) <= budget
+    assert saved == estimate_tokens(messages) - estimate_tokens(compacted)
+
+
+def test_compact_drops_oldest_tool_iterations_within_current_turn():
+    """省略工具结果后仍超出预算时，从最早的一次开始丢弃整次工具调用"""
+    system = SystemMessage(content="系统提示词")
+    messages = [system, *make_tool_heavy_turn(20, "很长的工具输出" * 200)]
+    last_iteration = messages[-2:]
+    budget = estimate_tokens([system, messages[1], *last_iteration]) + 100
+
+    compacted, _ = compact_messages(messages, budget)
+
+    assert compacted[:2] == messages[:2]
+    assert compacted[-2:] == last_iteration
+    assert len(compacted) < len(messages)
+    assert estimate_tokens(compacted) <= budget
+    # 丢弃的是整次调用，工具调用与结果仍成对出现
+    assert sum(isinstance(m, ToolMessage) for m in compacted) == sum(
+        len(m.tool_calls) for m in compacted if isinstance(m, AIMessage)
+    )
@@ -0,0 +1,45 @@
+"""
+fake LLM 服务配置测试
+"""
+
+import httpx
+import pytest
+from pydantic import ValidationError
+
+from synphora.fake_llm import FakeLlmConfig
+
+
+@pytest.mark.fake_llm(tokens_per_second=0)
+@pytest.mark.parametrize("stream", [True, False])
+def test_zero_tokens_per_second_has_no_delay(fake_llm, stream):
+    response = httpx.post(
+        f"{fake_llm.base_url}/chat/completions",
+        json={
+            "model": "fake",
+            "messages": [{"role": "user", "content": "你好"}],
+            "stream": stream,
+        },
+    )
+    assert response.status_code == 200
+    assert response.elapsed.total_seconds() < 1
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"ttft_ms": -1},
+        {"tokens_per_second": float("inf")},
+        {"error_rate": 1.5},
+        {"response_tokens": -1},
+    ],
+)
+def test_invalid_config_rejected(overrides):
+    with pytest.raises(ValidationError):
+        FakeLlmConfig(**overrides)
+
+
+def test_config_from_env_validated(monkeypatch):
+    """启动时从环境变量读取配置，非法值直接报错"""
+    monkeypatch.setenv("FAKE_LLM_ERROR_RATE", "2")
+    with pytest.raises(ValidationError):
+        FakeLlmConfig.from_env()
@@ -0,0 +1,143 @@
+"""
+后台任务测试
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from synphora.artifact_manager import artifact_manager
+from synphora.jobs import JobManager, JobStatus
+from synphora.server import app
+
+
+@pytest.fixture
+def client(fake_llm):
+    with TestClient(app) as client:
+        yield client
+    artifact_manager.clear_all()
+
+
+def test_generate_sample_job(client):
+    """提交后立即返回任务 ID，通过事件流获取进度直到完成"""
+    response = client.post(
+        "/jobs/generate-sample", json={}, headers={"Idempotency-Key": "sample-1"}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        jobs = [
+            json.loads(line.removeprefix("data: "))
+            for line in response.iter_lines()
+            if line.startswith("data: ")
+        ]
+    assert jobs[-1]["status"] == "succeeded"
+    assert any(job["status"] == "running" and job["progress"] > 0 for job in jobs)
+
+    job = client.get(f"/jobs/{job_id}").json()
+    artifact = artifact_manager.get_artifact(job["result"]["artifact_id"])
+    assert artifact.title == "示例文章.md"
+
+    # 重试提交返回同一个任务，不重复生成
+    response = client.post(
+        "/jobs/generate-sample", json={}, headers={"Idempotency-Key": "sample-1"}
+    )
+    assert response.json()["id"] == job_id
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_evaluate_job(client):
+    original = artifact_manager.create_artifact(title="文章.md", content="文章内容。")
+    response = client.post(
+        "/jobs/evaluate",
+        json={"artifact_ids": [original.id], "types": ["title", "introduction"]},
+    )
+    job_id = response.json()["id"]
+
+    with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        for _ in response.iter_lines():
+            pass
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    results = job["result"]["results"]
+    assert {r["evaluate_type"] for r in results} == {"title", "introduction"}
+    assert all(r["status"] == "completed" for r in results)
+
+
+def test_evaluate_job_missing_artifacts(client):
+    """不存在的文章 ID 列在结果中，全部不存在时任务失败"""
+    original = artifact_manager.create_artifact(title="文章.md", content="文章内容。")
+
+    def evaluate(artifact_ids: list[str]) -> dict:
+        response = client.post(
+            "/jobs/evaluate", json={"artifact_ids": artifact_ids, "types": ["title"]}
+        )
+        job_id = response.json()["id"]
+        with client.stream("GET", f"/jobs/{job_id}/events") as response:
+            for _ in response.iter_lines():
+                pass
+        return client.get(f"/jobs/{job_id}").json()
+
+    job = evaluate([original.id, "unknown"])
+    assert job["status"] == "succeeded"
+    assert len(job["result"]["results"]) == 1
+    assert job["result"]["missing_artifact_ids"] == ["unknown"]
+
+    job = evaluate(["unknown"])
+    assert job["status"] == "failed"
+    assert "unknown" in job["error"]
+
+
+def test_unfinished_jobs_survive_restart(tmp_path):
+    """启用持久化时，未完成的任务在重启后重新执行"""
+    store_path = tmp_path / "jobs.json"
+
+    async def slow(params, context):
+        await asyncio.sleep(10)
+
+    async def fast(params, context):
+        return {"value": params["value"]}
+
+    async def first_run() -> str:
+        manager = JobManager(workers=1, store_path=str(store_path))
+        manager.register("work", slow)
+        await manager.start()
+        job = manager.submit("work", {"value": 1})
+        await asyncio.sleep(0.05)
+        await manager.stop()
+        return job.id
+
+    async def second_run(job_id: str):
+        manager = JobManager(workers=1, store_path=str(store_path))
+        manager.register("work", fast)
+        await manager.start()
+        job = await manager.wait(job_id)
+        await manager.stop()
+        return job
+
+    job_id = asyncio.run(first_run())
+    job = asyncio.run(second_run(job_id))
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.result == {"value": 1}
+
+
+def test_wait_for_missing_job():
+    """任务不存在或已被清理时，订阅不产出状态，等待返回 None"""
+
+    async def main():
+        manager = JobManager(workers=1, store_path=None)
+        events = [job async for job in manager.subscribe("unknown")]
+        return events, await manager.wait("unknown")
+
+    assert asyncio.run(main()) == ([], None)
+
+
+def test_generate_sample_artifact_missing(client, monkeypatch):
+    """任务完成后 artifact 已被删除或尚不可见时返回 404"""
+    monkeypatch.setattr(artifact_manager, "get_artifact", lambda artifact_id: None)
+    response = client.post("/artifacts/generate-sample", json={})
+    assert response.status_code == 404
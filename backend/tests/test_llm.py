@@ -0,0 +1,43 @@
+"""
+LLM 模型 profile 与 fallback 测试
+"""
+
+import pytest
+
+from synphora.llm import LlmTask, clear_llm_cache, create_llm_client
+
+
+@pytest.fixture
+def llm_env(monkeypatch):
+    monkeypatch.setenv("LLM_BASE_URL", "http://llm.example.com/v1")
+    monkeypatch.setenv("LLM_API_KEY", "default-key")
+    monkeypatch.setenv("LLM_MODEL", "large-model")
+    clear_llm_cache()
+    yield monkeypatch
+    clear_llm_cache()
+
+
+def test_profile_inherits_default_fields(llm_env):
+    llm_env.setenv("LLM_PROFILE_FAST_MODEL", "small-model")
+    llm_env.setenv("LLM_PROFILE_FAST_MAX_TOKENS", "256")
+    llm_env.setenv("LLM_TASK_EVALUATE_TITLE", "fast")
+
+    llm = create_llm_client(LlmTask.EVALUATE_TITLE)
+    assert llm.model_name == "small-model"
+    assert llm.max_tokens == 256
+    assert llm.openai_api_base == "http://llm.example.com/v1"
+    assert llm.openai_api_key.get_secret_value() == "default-key"
+
+    # 未配置的任务使用默认 profile
+    assert create_llm_client(LlmTask.EVALUATE_COMMENT).model_name == "large-model"
+
+
+def test_fallback_chain_on_primary_error(llm_env, fake_llm):
+    llm_env.setenv("LLM_PROFILE_BROKEN_BASE_URL", "http://127.0.0.1:9/v1")
+    llm_env.setenv("LLM_PROFILE_BROKEN_MAX_RETRIES", "0")
+    llm_env.setenv("LLM_PROFILE_BROKEN_FALLBACKS", "default")
+    llm_env.setenv("LLM_TASK_SAMPLE", "broken")
+    clear_llm_cache()
+
+    response = create_llm_client(LlmTask.SAMPLE).invoke("你好")
+    assert response.content
@@ -0,0 +1,76 @@
+"""
+压测驱动测试：参数解析、分位数与 SLO 检查，以及对进程内服务的一次短压测
+"""
+
+import argparse
+import asyncio
+
+import httpx
+import pytest
+
+from synphora.artifact_manager import artifact_manager
+from synphora.loadtest import (
+    LoadRunner,
+    LoadStage,
+    check_slos,
+    parse_slo,
+    parse_stages,
+    percentile,
+)
+from synphora.server import app
+
+
+def test_parse_stages_and_slo():
+    assert parse_stages("10:30,50:60:20") == [
+        LoadStage(users=10, duration=30),
+        LoadStage(users=50, duration=60, ramp_up=20),
+    ]
+    thresholds = parse_slo("first_token.p95=1.5,error_rate=0.01")
+    assert [t.name for t in thresholds] == ["first_token.p95", "error_rate"]
+    assert thresholds[0].limit == 1.5
+
+    for value in ["10", "first_token=1", "error_rate.p95=0.1", "ttft.p95=1"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            (parse_stages if value == "10" else parse_slo)(value)
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile([float(i) for i in range(101)], 95) == 95.0
+
+
+def test_load_runner_against_app(fake_llm):
+    """两个虚拟用户加后台 CRUD，每次运行都读到 RUN_FINISHED，SLO 按阶段检查"""
+    artifact_manager.create_artifact(
+        title="测试文章.md", content="这是一篇用于测试的文章。"
+    )
+
+    async def main():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                runner = LoadRunner(
+                    client, [LoadStage(users=2, duration=0.5)], crud_rate=20
+                )
+                return await runner.run()
+
+    try:
+        (stats,) = asyncio.run(main())
+    finally:
+        artifact_manager.clear_all()
+
+    summary = stats.summary()
+    assert summary["runs"] >= 2
+    assert summary["run_errors"] == 0
+    assert summary["crud_requests"] > 0
+    assert summary["crud_errors"] == 0
+    assert summary["latencies"]["duration"]["count"] == summary["runs"]
+    assert summary["latencies"]["first_token"]["count"] == summary["runs"]
+
+    assert check_slos([summary], [stats], parse_slo("error_rate=0")) == []
+    (violation,) = check_slos([summary], [stats], parse_slo("duration.p50=0"))
+    assert violation.startswith("stage 1 (2 users): duration.p50")
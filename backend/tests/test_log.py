@@ -0,0 +1,41 @@
+"""
+日志测试
+"""
+
+import io
+import json
+import logging
+
+from langchain_core.messages import HumanMessage
+
+from synphora.log import configure_logging, stop_logging, truncated
+
+
+def test_truncated_bounds_large_payloads():
+    article = "文章内容" * 10000
+    state = {"messages": [HumanMessage(content=article)], "request": article}
+
+    for value in [article, state]:
+        text = str(truncated(value, max_chars=100))
+        assert len(text) == 103
+        assert text.endswith("...")
+    assert str(truncated("short")) == "short"
+
+
+def test_json_logging_with_levels_and_extra_fields():
+    stream = io.StringIO()
+    configure_logging(level="INFO", log_format="json", stream=stream)
+    try:
+        logger = logging.getLogger("synphora.test")
+        logger.debug("hidden %s", "debug")
+        logger.info("run finished, frames: %d", 3, extra={"run_id": "r1"})
+    finally:
+        stop_logging()
+        configure_logging()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(records) == 1
+    assert records[0]["level"] == "INFO"
+    assert records[0]["logger"] == "synphora.test"
+    assert records[0]["message"] == "run finished, frames: 3"
+    assert records[0]["run_id"] == "r1"
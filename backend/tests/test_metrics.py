@@ -0,0 +1,29 @@
+"""
+Prometheus 指标测试
+"""
+
+from synphora.metrics import Histogram, MetricsRegistry, format_metric
+
+
+def test_histogram_renders_cumulative_buckets(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr("synphora.metrics.registry", registry)
+    histogram = Histogram("test_seconds", "Test.", ["stage"], buckets=(0.1, 1))
+
+    child = histogram.labels("reason")
+    assert histogram.labels("reason") is child
+    for value in [0.05, 0.1, 0.5, 3]:
+        child.observe(value)
+
+    text = registry.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{stage="reason",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{stage="reason",le="1"} 3' in text
+    assert 'test_seconds_bucket{stage="reason",le="+Inf"} 4' in text
+    assert 'test_seconds_sum{stage="reason"} 3.65' in text
+    assert 'test_seconds_count{stage="reason"} 4' in text
+
+
+def test_label_values_are_escaped():
+    text = format_metric("test_total", "counter", "Test.", [({"path": 'a"b\\'}, 1)])
+    assert 'test_total{path="a\\"b\\\\"} 1' in text
@@ -0,0 +1,83 @@
+"""
+按需剖析测试
+"""
+
+import asyncio
+import json
+import pstats
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from synphora import server
+from synphora.profiling import (
+    PROFILE_ID_HEADER,
+    ProfileManager,
+    ProfileMode,
+    ProfilingMiddleware,
+)
+
+
+def busy_work():
+    return sum(i * i for i in range(20000))
+
+
+def create_client(manager: ProfileManager) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        busy_work()
+        await asyncio.sleep(0.03)
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, manager=manager)
+    return TestClient(app)
+
+
+def test_profile_requested_by_header(tmp_path):
+    manager = ProfileManager(tmp_path)
+    client = create_client(manager)
+
+    response = client.get("/work")
+    assert PROFILE_ID_HEADER not in response.headers
+    assert manager.list_profiles() == []
+
+    response = client.get("/work", headers={"X-Synphora-Profile": "cprofile"})
+    name = response.headers[PROFILE_ID_HEADER]
+    assert [profile.name for profile in manager.list_profiles()] == [name]
+    stats = pstats.Stats(str(manager.get_path(name)))
+    assert any(function == "busy_work" for _, _, function in stats.stats)
+
+    response = client.get("/work", headers={"X-Synphora-Profile": "sample"})
+    profile = json.loads(
+        manager.get_path(response.headers[PROFILE_ID_HEADER]).read_text()
+    )
+    assert profile["profiles"][0]["type"] == "sampled"
+    assert profile["profiles"][0]["samples"]
+
+
+def test_armed_profiles_next_requests(tmp_path):
+    manager = ProfileManager(tmp_path)
+    client = create_client(manager)
+    manager.arm(ProfileMode.CPROFILE, 2)
+
+    names = [client.get("/work").headers.get(PROFILE_ID_HEADER) for _ in range(3)]
+    assert names[0] and names[1] and names[2] is None
+    assert manager.armed() == (ProfileMode.CPROFILE, 0)
+    assert manager.get_path("../metadata.json") is None
+
+
+def test_profile_endpoints_require_config(tmp_path, monkeypatch):
+    client = TestClient(server.app)
+    assert client.get("/profiles").status_code == 404
+
+    monkeypatch.setattr(server, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(server.profile_manager, "directory", tmp_path)
+    (tmp_path / "saved.prof").write_bytes(b"profile")
+    assert [p["name"] for p in client.get("/profiles").json()] == ["saved.prof"]
+    assert client.get("/profiles/saved.prof").content == b"profile"
+    assert client.get("/profiles/missing.prof").status_code == 404
+
+    response = client.post("/profiles/arm", json={"mode": "sample", "count": 0})
+    assert response.json() == {"mode": "sample", "count": 0}
@@ -0,0 +1,50 @@
+"""
+快速路径路由规则测试
+"""
+
+import pytest
+
+from synphora.router import classify
+
+
+@pytest.mark.parametrize(
+    "message, tool_names",
+    [
+        ("撰写介绍语", ["write_introduction"]),
+        ("请评价这篇文章", ["write_comment"]),
+        ("帮我取几个标题", ["write_candidate_titles"]),
+        ("给这篇文章起个名字吧", ["write_candidate_titles"]),
+        (
+            "帮我点评一下这篇文章，再写一段简介",
+            ["write_comment", "write_introduction"],
+        ),
+    ],
+)
+def test_explicit_request_takes_fast_path(message, tool_names):
+    decision = classify(message)
+    assert decision.is_fast_path()
+    assert decision.tool_names == tool_names
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "介绍一下你自己",
+        "这个标题不错",
+        "你能简单介绍下你能做什么吗",
+        "标题",
+        "好的，谢谢你的评价",
+        "这个标题怎么改会更好？",
+        "别写标题",
+        "我刚写完这篇文章，准备发到公众号上，麻烦帮我想几个吸引人的候选标题",
+    ],
+)
+def test_other_messages_fall_back_to_llm(message):
+    assert not classify(message).is_fast_path()
+
+
+def test_negation_matches_whole_word():
+    """“特别”“分别”中的“别”不是否定"""
+    assert classify("别写介绍语").confidence == 0.0
+    assert classify("分别写介绍语和起标题").confidence > 0.0
+    assert classify("写一段特别的介绍语").confidence > 0.0
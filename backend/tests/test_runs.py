@@ -0,0 +1,222 @@
+"""
+可重连的代理运行事件流测试
+"""
+
+import asyncio
+
+import pytest
+
+from synphora import runs
+from synphora.broker import (
+    BackpressurePolicy,
+    MemoryRunBroker,
+    ReplayUnavailableError,
+)
+from synphora.runs import (
+    RUN_ERROR_MESSAGE,
+    AgentRun,
+    RunRegistry,
+    RunRegistryDrainingError,
+)
+from synphora.sse import TextMessageEvent
+
+
+async def generate_events(count: int, delay: float = 0.0):
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield TextMessageEvent.new(message_id="m", content=str(i))
+
+
+def test_run_continues_after_client_disconnects():
+    """订阅者断开后运行继续，重连时从 Last-Event-ID 之后继续接收"""
+
+    async def main():
+        run = AgentRun(generate_events(5, delay=0.01))
+
+        first = []
+        async for frame in run.subscribe():
+            first.append(frame)
+            if len(first) == 2:
+                break
+
+        await run.wait()
+        assert run.finished
+        rest = [frame async for frame in run.subscribe(last_event_id=1)]
+        return first, rest
+
+    first, rest = asyncio.run(main())
+    frames = first + rest
+    assert [frame.split("\n")[0] for frame in frames] == [f"id: {i}" for i in range(5)]
+    assert '"content":"4"' in frames[-1]
+
+
+def test_run_replay_outside_buffer():
+    async def main():
+        run = AgentRun(generate_events(5), broker=MemoryRunBroker(replay_size=2))
+        await run.wait()
+        with pytest.raises(ReplayUnavailableError):
+            run.check_replay(last_event_id=0)
+        return [frame async for frame in run.subscribe(last_event_id=2)]
+
+    assert len(asyncio.run(main())) == 2
+
+
+def test_run_fans_out_to_multiple_subscribers():
+    """多个订阅者收到相同的帧，事件只产生一次"""
+    produced = []
+
+    async def events():
+        async for event in generate_events(5, delay=0.01):
+            produced.append(event)
+            yield event
+
+    async def main():
+        run = AgentRun(events())
+        first, second = await asyncio.gather(
+            collect(run.subscribe()), collect(run.subscribe())
+        )
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert len(produced) == 5
+    assert first == second
+    assert len(first) == 5
+
+
+def test_slow_subscriber_is_disconnected_without_blocking_others():
+    async def main():
+        run = AgentRun(
+            generate_events(10, delay=0.01),
+            broker=MemoryRunBroker(
+                subscriber_buffer_size=2, policy=BackpressurePolicy.DISCONNECT
+            ),
+        )
+        slow_frames = []
+
+        async def slow():
+            async for frame in run.subscribe():
+                slow_frames.append(frame)
+                await asyncio.sleep(0.1)
+
+        fast_frames, _ = await asyncio.gather(collect(run.subscribe()), slow())
+        # 断开的订阅者可以带 Last-Event-ID 重连补发
+        rest = await collect(run.subscribe(last_event_id=len(slow_frames) - 1))
+        return fast_frames, slow_frames, rest
+
+    fast_frames, slow_frames, rest = asyncio.run(main())
+    assert len(fast_frames) == 10
+    assert len(slow_frames) < 10
+    assert slow_frames + rest == fast_frames
+
+
+def slow_subscriber_frames(policy: BackpressurePolicy) -> tuple[list[str], int]:
+    """缓冲上限为 2 的慢订阅者收到的帧，以及运行耗时（毫秒）"""
+
+    async def main():
+        run = AgentRun(
+            generate_events(10),
+            broker=MemoryRunBroker(
+                subscriber_buffer_size=2, policy=policy, block_timeout=1
+            ),
+        )
+        frames = []
+        start_time = asyncio.get_running_loop().time()
+        async for frame in run.subscribe():
+            frames.append(frame)
+            await asyncio.sleep(0.01)
+        await run.wait()
+        elapsed = asyncio.get_running_loop().time() - start_time
+        return frames, elapsed * 1000
+
+    return asyncio.run(main())
+
+
+def test_merge_policy_merges_chunks_for_slow_subscriber():
+    frames, _ = slow_subscriber_frames(BackpressurePolicy.MERGE)
+    assert len(frames) < 10
+    # 合并后的帧带有最后一个事件的 id，内容完整且有序
+    assert frames[-1].startswith("id: 9\n")
+    contents = "".join(frame.split('"content":"')[1].split('"')[0] for frame in frames)
+    assert contents == "0123456789"
+
+
+def test_block_policy_waits_for_slow_subscriber():
+    frames, elapsed_ms = slow_subscriber_frames(BackpressurePolicy.BLOCK)
+    assert len(frames) == 10
+    # 运行被慢订阅者拖慢，而不是一次性产生全部事件
+    assert elapsed_ms >= 50
+
+
+def test_drain_waits_for_active_runs():
+    """停止时不再接受新的运行，进行中的运行正常结束"""
+
+    async def main():
+        registry = RunRegistry()
+        run = registry.start(generate_events(5, delay=0.01))
+        frames = asyncio.create_task(collect(run.subscribe()))
+        await registry.drain(timeout=5)
+        with pytest.raises(RunRegistryDrainingError):
+            registry.start(generate_events(1))
+        return await frames
+
+    assert len(asyncio.run(main())) == 5
+
+
+def test_drain_cancels_runs_after_timeout():
+    async def main():
+        registry = RunRegistry()
+        run = registry.start(generate_events(100, delay=0.1))
+        await registry.drain(timeout=0.05)
+        return run
+
+    run = asyncio.run(main())
+    assert run.finished
+    assert run._task.cancelled()
+
+
+def test_run_without_subscriber_is_cancelled(monkeypatch):
+    """客户端在开始订阅之前断开时，运行同样在超时后取消"""
+    monkeypatch.setattr(runs, "RUN_DETACHED_TIMEOUT_SECONDS", 0.05)
+
+    async def main():
+        run = AgentRun(generate_events(100, delay=0.1))
+        await run.wait()
+        return run
+
+    run = asyncio.run(main())
+    assert run._task.cancelled()
+    assert run.info().events < 100
+
+
+def test_subscriber_keeps_run_alive(monkeypatch):
+    monkeypatch.setattr(runs, "RUN_DETACHED_TIMEOUT_SECONDS", 0.05)
+
+    async def main():
+        run = AgentRun(generate_events(5, delay=0.03))
+        return await collect(run.subscribe())
+
+    assert len(asyncio.run(main())) == 5
+
+
+def test_failed_run_ends_with_run_finished():
+    """运行出错时发送错误提示和 RUN_FINISHED，重连的客户端同样能收到"""
+
+    async def events():
+        yield TextMessageEvent.new(message_id="m", content="0")
+        raise RuntimeError("boom")
+
+    async def main():
+        run = AgentRun(events())
+        live = await collect(run.subscribe())
+        replayed = await collect(run.subscribe(last_event_id=0))
+        return live, replayed
+
+    live, replayed = asyncio.run(main())
+    assert len(live) == 3
+    assert RUN_ERROR_MESSAGE in live[1]
+    assert '"type":"RUN_FINISHED"' in live[2]
+    assert replayed == live[1:]
+
+
+async def collect(frames):
+    return [frame async for frame in frames]
@@ -0,0 +1,112 @@
+"""
+生产服务测试：worker 共享存储目录，停止时等待请求结束后退出
+"""
+
+import copy
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from synphora.file_storage import FileStorage
+from synphora.runs import run_registry
+from synphora.server import app
+
+
+def test_storage_shared_between_workers():
+    """fork 出的 worker 各自持有元数据副本，读写前发现其他 worker 的修改"""
+    storage = FileStorage()
+    worker = copy.deepcopy(storage)
+    try:
+        created = storage.create_artifact(title="a", content="hello")
+        assert worker.get_artifact(created.id).content == "hello"
+
+        worker.create_artifact(title="b", content="world")
+        storage.update_artifact(created.id, title="a2")
+        assert sorted(a.title for a in worker.list_artifacts()) == ["a2", "b"]
+        assert sorted(a.title for a in storage.list_artifacts()) == ["a2", "b"]
+
+        assert worker.delete_artifact(created.id)
+        assert storage.get_artifact(created.id) is None
+    finally:
+        storage.cleanup_temp_storage()
+
+
+def test_draining_rejects_new_runs():
+    """收到停止信号后健康检查报告 draining，新的代理运行返回 503"""
+    with TestClient(app) as client:
+        run_registry.start_draining()
+        response = client.get("/health")
+        assert response.status_code == 503
+        assert response.json()["status"] == "draining"
+
+        response = client.post("/agent", json={"message": "你好"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(url)
+
+
+def serve_command(port: int, *args: str) -> list[str]:
+    return [
+        sys.executable,
+        "-m",
+        "synphora.serve",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        *args,
+    ]
+
+
+def test_serve_rejects_multiple_workers():
+    """代理运行和后台任务保存在 worker 内存中，不能启动多个 worker"""
+    result = subprocess.run(
+        serve_command(free_port(), "--workers", "2"),
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert result.returncode == 2
+    assert "--workers" in result.stderr
+
+
+def test_serve_worker_stops_on_sigterm():
+    port = free_port()
+    process = subprocess.Popen(
+        serve_command(port, "--drain-timeout", "1"),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_healthy(f"{base_url}/health")
+        artifact = httpx.post(
+            f"{base_url}/artifacts", json={"title": "t", "content": "c"}
+        ).json()
+        response = httpx.get(f"{base_url}/artifacts/{artifact['id']}")
+        assert response.status_code == 200
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
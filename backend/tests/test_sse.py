@@ -0,0 +1,45 @@
+"""
+SSE 事件编码测试
+"""
+
+import pytest
+
+from synphora.sse import (
+    ArtifactContentChunkData,
+    ArtifactContentChunkEvent,
+    SseEvent,
+    TextMessageData,
+    TextMessageEvent,
+)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "",
+        "普通文本",
+        'quote " and \\ backslash',
+        "换行\n制表\t回车\r",
+        "\x00\x1f\x7f",
+        "😀 /",
+    ],
+)
+def test_fast_encoding_matches_model_dump(content):
+    """快速编码路径与通用的 SseEvent 序列化逐字节一致"""
+    for event in [
+        TextMessageEvent.new(message_id='id"1', content=content),
+        ArtifactContentChunkEvent.new(artifact_id="a1", content=content),
+    ]:
+        assert event.to_data() == SseEvent.to_data(event)
+
+
+def test_chunk_events_match_validated_events():
+    """跳过校验创建的分片事件与经过校验创建的事件相同"""
+    assert TextMessageEvent.new(message_id="m1", content="hi") == TextMessageEvent(
+        data=TextMessageData(message_id="m1", content="hi")
+    )
+    assert ArtifactContentChunkEvent.new(
+        artifact_id="a1", content="hi"
+    ) == ArtifactContentChunkEvent(
+        data=ArtifactContentChunkData(artifact_id="a1", content="hi")
+    )
@@ -0,0 +1,36 @@
+"""
+冷启动测试：导入服务模块时不导入重量级依赖，也不创建存储等全局状态
+"""
+
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["langchain_core", "langchain_openai", "langgraph", "openai", "jinja2"]
+
+CHECK_SCRIPT = f"""
+import json
+import sys
+
+import synphora.server
+from synphora.artifact_manager import artifact_manager
+from synphora.checkpoint import checkpoint_store
+
+print(json.dumps({{
+    "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+    "storage_created": artifact_manager._file_storage is not None,
+    "saver_created": checkpoint_store._saver is not None,
+}}))
+"""
+
+
+def test_server_import_is_lazy():
+    """langchain / langgraph / openai / jinja2 在启动预热或首次使用时才导入"""
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_SCRIPT],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    state = json.loads(result.stdout.splitlines()[-1])
+    assert state == {"heavy": [], "storage_created": False, "saver_created": False}
@@ -0,0 +1,47 @@
+"""
+追踪测试
+"""
+
+import asyncio
+
+import pytest
+
+from synphora.tracing import flush_tracing, format_waterfall, span, stop_tracing, traced
+
+
+def test_spans_propagate_into_tasks(span_exporter):
+    @traced("child")
+    async def child():
+        await asyncio.sleep(0)
+
+    async def run():
+        with span("root", {"run.id": "r1"}):
+            await asyncio.create_task(child())
+            with pytest.raises(ValueError), span("failed"):
+                raise ValueError("boom")
+
+    asyncio.run(run())
+    flush_tracing()
+
+    spans = {s["name"]: s for s in span_exporter.spans}
+    root = spans["root"]
+    assert "parentSpanId" not in root
+    assert root["attributes"] == [{"key": "run.id", "value": {"stringValue": "r1"}}]
+    assert spans["child"]["parentSpanId"] == root["spanId"]
+    assert spans["child"]["traceId"] == root["traceId"]
+    assert spans["failed"]["status"] == {"code": 2, "message": "ValueError: boom"}
+
+    waterfall = format_waterfall(span_exporter.spans).splitlines()
+    assert waterfall[0].startswith(f'trace {root["traceId"]}')
+    assert [line.split("ms")[1].split()[0] for line in waterfall[1:]] == [
+        "root",
+        "child",
+        "failed",
+    ]
+
+
+def test_span_is_not_recorded_without_exporter():
+    stop_tracing()
+    with span("noop") as current:
+        current.set_attribute("key", "value")
+    assert not current.is_recording
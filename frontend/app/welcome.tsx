@@ -136,20 +136,9 @@ export default function WelcomePage({ onWelcomeComplete }: WelcomePageProps) {
 
       setUploadedFile(generatingFile);
 
-      // 模拟进度增长
-      const progressInterval = setInterval(() => {
-        setUploadedFile((prev) =>
-          prev && prev.status === "uploading"
-            ? {
-                ...prev,
-                progress: Math.min(prev.progress + Math.random() * 5, 98),
-              }
-            : prev
-        );
-      }, 800);
-
+      // 提交后台任务，立即返回任务 ID
       const response = await fetch(
-        "http://127.0.0.1:8000/artifacts/generate-sample",
+        "http://127.0.0.1:8000/jobs/generate-sample",
         {
           method: "POST",
           headers: {
@@ -161,16 +150,45 @@ export default function WelcomePage({ onWelcomeComplete }: WelcomePageProps) {
         }
       );
 
-      // 清除进度更新
-      clearInterval(progressInterval);
-
       if (!response.ok) {
         throw new Error(`Failed to generate article: ${response.statusText}`);
       }
 
-      const artifact = await response.json();
+      const { id: jobId } = await response.json();
+
+      // 订阅任务进度，直到任务结束
+      const job = await new Promise<{
+        status: string;
+        result?: { artifact_id: string };
+        error?: string;
+      }>((resolve, reject) => {
+        const events = new EventSource(
+          `http://127.0.0.1:8000/jobs/${jobId}/events`
+        );
+        events.onmessage = (event) => {
+          const job = JSON.parse(event.data);
+          setUploadedFile((prev) =>
+            prev && prev.status === "uploading"
+              ? { ...prev, progress: Math.min(job.progress * 100, 98) }
+              : prev
+          );
+          if (job.status === "succeeded" || job.status === "failed") {
+            events.close();
+            resolve(job);
+          }
+        };
+        events.onerror = () => {
+          events.close();
+          reject(new Error("Lost connection to job progress stream"));
+        };
+      });
+
+      if (job.status !== "succeeded") {
+        throw new Error(`Failed to generate article: ${job.error}`);
+      }
+
       console.log(
-        `✅ Sample article generated successfully, artifact ID: ${artifact.id}`
+        `✅ Sample article generated successfully, artifact ID: ${job.result?.artifact_id}`
       );
 
       // 更新进度到100%并标记完成